@@ -0,0 +1,399 @@
+"""
+Автопилот: змейка, которая играет сама.
+
+`Autopilot` выбирает ход змейки на каждом такте вместо игрока. Путь до
+яблока ищется алгоритмом A* на торе (переход через край поля такой же,
+как в `Snake.move`) в обход тела змейки и камней. Найденный путь
+переиспользуется между тактами: пока на него не встал новый камень, ход
+берётся из готового пути за O(1). Если камень перекрыл путь, чинится
+только перекрытый участок - короткий обход до ближайшей клетки пути за
+камнем.
+
+Когда змейка занимает больше `DENSE_FRACTION` поля, автопилот идёт по
+гамильтонову циклу, обходящему все клетки, и сворачивает с него, только
+если следующая клетка цикла занята. Если безопасного пути нет, выбирается
+ход в клетку с наибольшим числом свободных соседей.
+
+Запуск замера: `python autopilot.py --size 100 --ticks 20000`.
+"""
+
+import argparse
+from collections import deque
+from heapq import heappop, heappush
+from time import perf_counter
+
+from simulation import (DENSE_BOARD_LIMIT, DIRECTION_INDEX, OPPOSITE,
+                        SnakeSimulation)
+
+DENSE_FRACTION = 0.5
+SEARCH_LIMIT = 150
+FIELD_BUDGET = 150
+HEURISTIC_WEIGHT = 2
+
+
+class Autopilot:
+    """Контроллер змейки для игры `SnakeSimulation`.
+
+    Экземпляр вызывается раз в такт и возвращает индекс направления в
+    `DIRECTIONS` (или `None`), поэтому подходит и как политика для
+    `selfplay.play_episode`, и как замена вводу с клавиатуры.
+
+    Атрибуты:
+        path (deque): клетки пути до цели, первая - следующий ход.
+        searches (int): число полных поисков пути.
+        repairs (int): число починок пути после появления камня.
+    """
+
+    def __init__(self, game, dense_fraction=DENSE_FRACTION,
+                 search_limit=SEARCH_LIMIT):
+        self.game = game
+        self.dense_fraction = dense_fraction
+        self.search_limit = search_limit
+        self.width = game.snake.width
+        self.height = game.snake.height
+        self.cells = self.width * self.height
+        self.path = deque()
+        self.searches = 0
+        self.repairs = 0
+        self._path_cells = set()
+        self._stones = set()
+        self._stone_list = None
+        self._cycle = None
+        self._table = (
+            [self.neighbours(cell) for cell in range(self.cells)]
+            if self.cells <= DENSE_BOARD_LIMIT else None
+        )
+        self._field = None
+        self._axes = ([min(delta, self.width - delta)
+                       for delta in range(self.width + 1)],
+                      [min(delta, self.height - delta)
+                       for delta in range(self.height + 1)])
+
+    def __call__(self, game=None):
+        """Ход на текущий такт: индекс направления или `None`."""
+        return self.decide()
+
+    def neighbours(self, cell):
+        """Соседи клетки в порядке `DIRECTIONS` с переходом через край."""
+        width, cells = self.width, self.cells
+        row = cell - cell % width
+        column = cell - row
+        return ((cell - width) % cells, (cell + width) % cells,
+                row + (column - 1) % width, row + (column + 1) % width)
+
+    def distance(self, first, second):
+        """Манхэттенское расстояние между клетками на торе."""
+        first_y, first_x = divmod(first, self.width)
+        second_y, second_x = divmod(second, self.width)
+        distance_x = abs(first_x - second_x)
+        distance_y = abs(first_y - second_y)
+        return (min(distance_x, self.width - distance_x)
+                + min(distance_y, self.height - distance_y))
+
+    def decide(self):
+        """Выбирает ход змейки на текущий такт."""
+        game = self.game
+        snake = game.snake
+        head = snake.positions[0]
+        path = self.path
+        if path and path[0] == head:
+            self._path_cells.discard(path.popleft())
+        elif path:
+            self._drop_path()
+        self._sync_stones()
+        if snake.length >= self.dense_fraction * self.cells:
+            cell = self._follow_cycle(head)
+            if cell is not None:
+                return self._direction_to(head, cell)
+        apple = game.apple.position
+        if path and path[-1] != apple:
+            self._drop_path()
+        if not path and apple is not None:
+            self._plan(head, apple)
+        if path:
+            return self._direction_to(head, path[0])
+        return self._approach(head, apple)
+
+    def _plan(self, head, apple):
+        """Ищет путь до яблока, не выходя за бюджет одного такта.
+
+        Сначала A* от головы с лимитом `search_limit` раскрытий. Если его
+        не хватило, путь достраивается поиском в ширину от яблока по
+        `FIELD_BUDGET` клеток за такт (см. `_grow_field`).
+        """
+        if self._field is None or self._field[0] != apple:
+            self._field = None
+            self.searches += 1
+            found = self._search(head, apple)
+            if found is None:
+                self._field = (apple, {apple: None}, deque((apple,)))
+        else:
+            found = self._grow_field(head)
+        if found is not None:
+            self._field = None
+            self._set_path(found)
+
+    def _grow_field(self, head):
+        """Продолжает поиск в ширину от яблока на `FIELD_BUDGET` клеток.
+
+        Дерево поиска растёт от яблока и не зависит от положения головы,
+        поэтому его можно строить по частям в течение нескольких тактов,
+        пока змейка идёт к яблоку. Как только дерево дошло до соседа
+        головы, путь по нему проверяется на текущие тело и камни.
+
+        Returns:
+            list | None: путь от соседа головы до яблока.
+        """
+        _, parents, frontier = self._field
+        blocked = self._blocked()
+        neighbours = self._table
+        for _ in range(FIELD_BUDGET):
+            if not frontier:
+                break
+            cell = frontier.popleft()
+            for neighbour in (neighbours[cell] if neighbours
+                              else self.neighbours(cell)):
+                if neighbour not in parents and not blocked(neighbour):
+                    parents[neighbour] = cell
+                    frontier.append(neighbour)
+        banned = DIRECTION_INDEX[OPPOSITE[self.game.snake.direction]]
+        for index, cell in enumerate(self.neighbours(head)):
+            if index == banned or cell not in parents:
+                continue
+            path = []
+            while cell is not None and not blocked(cell):
+                path.append(cell)
+                cell = parents[cell]
+            if cell is None:
+                return path
+        if not frontier:
+            self._field = None
+        return None
+
+    def _drop_path(self):
+        """Забывает текущий путь."""
+        self.path.clear()
+        self._path_cells.clear()
+
+    def _set_path(self, cells):
+        """Запоминает новый путь."""
+        self._drop_path()
+        if cells:
+            self.path.extend(cells)
+            self._path_cells.update(cells)
+
+    def _sync_stones(self):
+        """Обновляет множество камней и чинит путь под новыми камнями."""
+        positions = self.game.stone.positions
+        if positions is not self._stone_list or len(positions) < len(
+                self._stones):
+            self._stone_list = positions
+            self._stones = set(positions)
+            self._drop_path()
+            return
+        for stone in positions[len(self._stones):]:
+            self._stones.add(stone)
+            if stone in self._path_cells:
+                self._repair(stone)
+
+    def _blocked(self, extra=()):
+        """Функция проверки клетки на занятость телом, камнем или `extra`.
+
+        Хвост свободен, если змейка не растёт: к следующему такту он
+        уйдёт со своей клетки.
+        """
+        snake = self.game.snake
+        body, stones = snake.positions, self._stones
+        tail = body[-1] if 1 < len(body) == snake.length else None
+
+        def blocked(cell):
+            return (cell in stones or cell in extra
+                    or (cell in body and cell != tail))
+        return blocked
+
+    def _search(self, start, target, goals=None, extra=(), first=True):
+        """A* от `start` до `target` или любой клетки из `goals`.
+
+        Эвристика - расстояние на торе с весом `HEURISTIC_WEIGHT`: путь
+        может быть чуть длиннее кратчайшего, зато поиск раскрывает в разы
+        меньше клеток. Занятые клетки заранее кладутся в словарь
+        посещённых, поэтому проверка соседа - один поиск в словаре. Если
+        `first`, из `start` нельзя идти в сторону, противоположную
+        движению змейки (разворот игнорируется правилами).
+
+        Returns:
+            list | None: клетки пути без `start` или `None`, если путь не
+            найден за `search_limit` раскрытий.
+        """
+        goals = goals or (target,)
+        snake = self.game.snake
+        positions = snake.positions
+        parents = dict.fromkeys(positions.cells())
+        if 1 < len(positions) == snake.length:
+            del parents[positions[-1]]
+        parents.update(dict.fromkeys(self._stones))
+        parents.update(dict.fromkeys(extra))
+        neighbours = self._table or self.neighbours
+        near = list(neighbours(start) if callable(neighbours)
+                    else neighbours[start])
+        if first:
+            near[DIRECTION_INDEX[OPPOSITE[snake.direction]]] = start
+        parents[start] = None
+        columns, rows = self._axes
+        width = self.width
+        target_y, target_x = divmod(target, width)
+        # При равной оценке первым раскрывается более длинный путь: на
+        # открытом поле поиск идёт прямо к цели, а не заливает
+        # прямоугольник между змейкой и яблоком.
+        heap = []
+        cell, depth = start, 0
+        for expanded in range(self.search_limit):
+            for neighbour in near:
+                if neighbour in parents:
+                    continue
+                parents[neighbour] = cell
+                if neighbour in goals:
+                    path = [neighbour]
+                    while cell != start:
+                        path.append(cell)
+                        cell = parents[cell]
+                    path.reverse()
+                    return path
+                y, x = divmod(neighbour, width)
+                heappush(heap, (
+                    1 - depth + HEURISTIC_WEIGHT
+                    * (columns[abs(x - target_x)] + rows[abs(y - target_y)]),
+                    depth - 1, neighbour))
+            if not heap:
+                return None
+            _, depth, cell = heappop(heap)
+            near = (neighbours(cell) if callable(neighbours)
+                    else neighbours[cell])
+        return None
+
+    def _repair(self, stone):
+        """Обходит камень, вставший на путь, не пересчитывая путь целиком."""
+        path = list(self.path)
+        index = path.index(stone)
+        tail = path[index + 1:]
+        if not tail:
+            self._drop_path()
+            return
+        start = path[index - 1] if index else self.game.snake.positions[0]
+        detour = self._search(start, tail[0], goals=set(tail),
+                              extra=set(path[:index]), first=not index)
+        self.repairs += 1
+        if detour is None:
+            self._drop_path()
+            return
+        rejoin = tail.index(detour[-1])
+        self._set_path(path[:index] + detour + tail[rejoin + 1:])
+
+    def _direction_to(self, head, cell):
+        """Индекс направления хода из `head` в соседнюю клетку `cell`."""
+        return self.neighbours(head).index(cell)
+
+    def _approach(self, head, apple):
+        """Безопасный ход, пока пути нет.
+
+        Предпочитаются клетки хотя бы с двумя свободными соседями, среди
+        них - ближайшая к яблоку.
+        """
+        blocked = self._blocked()
+        banned = DIRECTION_INDEX[OPPOSITE[self.game.snake.direction]]
+        best, best_key = None, None
+        for index, cell in enumerate(self.neighbours(head)):
+            if index == banned or blocked(cell):
+                continue
+            room = sum(not blocked(near) for near in self.neighbours(cell))
+            distance = self.distance(cell, apple) if apple is not None else 0
+            key = (min(room, 2), -distance, room)
+            if best_key is None or key > best_key:
+                best, best_key = index, key
+        return best
+
+    def hamiltonian_cycle(self):
+        """Следующая клетка гамильтонова цикла для каждой клетки поля.
+
+        Цикл строится на прямоугольнике без перехода через край, поэтому
+        существует, только если ширина или высота поля чётная.
+
+        Returns:
+            list[int] | None: `cycle[cell]` - следующая клетка цикла.
+        """
+        if self._cycle is not None:
+            return self._cycle or None
+        width, height = self.width, self.height
+        transpose = height % 2
+        if transpose:
+            width, height = height, width
+        if height % 2 or width < 2:
+            self._cycle = []
+            return None
+        order = [(x, 0) for x in range(width)]
+        for y in range(1, height):
+            columns = range(width - 1, 0, -1) if y % 2 else range(1, width)
+            order.extend((x, y) for x in columns)
+        order.extend((0, y) for y in range(height - 1, 0, -1))
+        if transpose:
+            order = [(y, x) for x, y in order]
+        cells = [y * self.width + x for x, y in order]
+        cycle = [0] * self.cells
+        for cell, following in zip(cells, cells[1:] + cells[:1]):
+            cycle[cell] = following
+        self._cycle = cycle
+        return cycle
+
+    def _follow_cycle(self, head):
+        """Следующая клетка цикла, если она безопасна, иначе `None`."""
+        cycle = self.hamiltonian_cycle()
+        if cycle is None:
+            return None
+        cell = cycle[head]
+        if self._blocked()(cell) or cell not in self.neighbours(head) or (
+                self._direction_to(head, cell)
+                == DIRECTION_INDEX[OPPOSITE[self.game.snake.direction]]):
+            return None
+        self._drop_path()
+        return cell
+
+
+def measure_latency(game, pilot, ticks):
+    """Играет `ticks` тактов под автопилотом и замеряет время решений.
+
+    Returns:
+        dict: p50, p99 и максимум времени решения в мс, число тактов и
+        набранные очки.
+    """
+    timings = []
+    score = 0
+    step = game.step
+    for _ in range(ticks):
+        start = perf_counter()
+        action = pilot()
+        timings.append((perf_counter() - start) * 1000)
+        _, reward, _ = step(action)
+        score += reward > 0
+    timings.sort()
+    last = len(timings) - 1
+    return {'p50': timings[last // 2], 'p99': timings[last * 99 // 100],
+            'max': timings[last], 'ticks': ticks, 'score': score}
+
+
+def main():
+    """Замер задержки решений автопилота из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--ticks', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    game = SnakeSimulation(seed=args.seed, width=args.size, height=args.size)
+    pilot = Autopilot(game)
+    report = measure_latency(game, pilot, args.ticks)
+    print('Решение, мс: p50={p50:.3f}, p99={p99:.3f}, max={max:.3f}; '
+          '{ticks} тактов, очки {score}'.format(**report))
+    print(f'поисков {pilot.searches}, починок {pilot.repairs}')
+
+
+if __name__ == '__main__':
+    main()
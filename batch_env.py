@@ -0,0 +1,223 @@
+"""
+Векторизованное окружение "Змейки" на NumPy.
+
+`BatchSnakeEnv` хранит N независимых игр в массивах и делает такт во всех
+сразу одним вызовом `step`. Правила совпадают с `simulation.SnakeSimulation`:
+перемещение с переходом через край поля, рост при съедании яблока,
+смерть при ударе о собственное тело (`positions[4:]`) или о камень и
+появление камня в свободной клетке каждые `STONE_EVERY` очков. Если
+после съедания яблоку негде появиться, игра окончена
+(`OUTCOME_BOARD_FULL`) и начинается заново.
+
+Клетка поля кодируется одним числом `y * width + x`.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from simulation import (DIRECTIONS, GRID_HEIGHT, GRID_WIDTH, OPPOSITE,
+                        OUTCOME_BOARD_FULL, OUTCOME_NONE, OUTCOME_SELF_HIT,
+                        OUTCOME_STONE_HIT, REWARD_APPLE, REWARD_DEATH,
+                        SELF_HIT_FROM, STONE_EVERY)
+
+_DX = np.array([dx for dx, _ in DIRECTIONS], dtype=np.int64)
+_DY = np.array([dy for _, dy in DIRECTIONS], dtype=np.int64)
+_OPPOSITE = np.array(
+    [DIRECTIONS.index(OPPOSITE[direction]) for direction in DIRECTIONS],
+    dtype=np.int64,
+)
+NO_CELL = -1
+
+
+class BatchState(NamedTuple):
+    """Состояние всех игр пакета (массивы длиной `num_envs`, без копий)."""
+
+    head: np.ndarray
+    last: np.ndarray
+    direction: np.ndarray
+    length: np.ndarray
+    apple: np.ndarray
+
+
+class BatchSnakeEnv:
+    """Пакет из `num_envs` игр, обновляемых векторизованно.
+
+    Атрибуты:
+        body (ndarray[N, C]): кольцевые буферы клеток тела, голова по
+            индексу `head_index`, всего `body_len` сегментов.
+        body_occupancy (ndarray[N, C]): число сегментов тела в клетке.
+        stones (ndarray[N, C]): число камней в клетке.
+        direction (ndarray[N]): индекс направления в `DIRECTIONS`.
+        outcome (ndarray[N]): причина окончания эпизода на последнем
+            такте, `OUTCOME_*`.
+    """
+
+    def __init__(self, num_envs, width=GRID_WIDTH, height=GRID_HEIGHT,
+                 seed=None):
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.center = (height // 2) * width + width // 2
+        self.rng = np.random.default_rng(seed)
+
+        self._rows = np.arange(num_envs)
+        self._offsets = self._rows * self.cells
+
+        shape = (num_envs, self.cells)
+        self.body = np.zeros(shape, dtype=np.int32)
+        self.body_occupancy = np.zeros(shape, dtype=np.uint8)
+        self.stones = np.zeros(shape, dtype=np.uint8)
+        self.head_index = np.zeros(num_envs, dtype=np.int64)
+        self.body_len = np.zeros(num_envs, dtype=np.int64)
+        self.length = np.zeros(num_envs, dtype=np.int64)
+        self.direction = np.zeros(num_envs, dtype=np.int64)
+        self.head = np.zeros(num_envs, dtype=np.int64)
+        self.last = np.full(num_envs, NO_CELL, dtype=np.int64)
+        self.apple = np.full(num_envs, NO_CELL, dtype=np.int64)
+        self.stone_level = np.zeros(num_envs, dtype=np.int64)
+        self.outcome = np.full(num_envs, OUTCOME_NONE, dtype=np.int64)
+        self.reset()
+
+    def state(self):
+        """Возвращает текущее состояние пакета."""
+        return BatchState(self.head, self.last, self.direction, self.length,
+                          self.apple)
+
+    def reset(self):
+        """Начинает новые игры во всех окружениях."""
+        self._reset_games(np.ones(self.num_envs, dtype=bool))
+        self.outcome.fill(OUTCOME_NONE)
+        return self.state()
+
+    def _reset_games(self, mask):
+        """Начинает заново игры выбранных окружений: без камней, змейка
+        в центре, яблоко в случайной клетке.
+        """
+        self.stones[mask] = 0
+        self.stone_level[mask] = 0
+        self._reset_snakes(mask)
+        self._place_apples(mask)
+
+    def _reset_snakes(self, mask):
+        """Возвращает змейки выбранных окружений в центр поля."""
+        rows = self._rows[mask]
+        self.body_occupancy[rows] = 0
+        self.body[rows, 0] = self.center
+        self.body_occupancy[rows, self.center] = 1
+        self.head_index[rows] = 0
+        self.body_len[rows] = 1
+        self.length[rows] = 1
+        self.head[rows] = self.center
+        self.direction[rows] = self.rng.integers(
+            0, len(DIRECTIONS), size=rows.size
+        )
+
+    def _free_cells(self, rows):
+        """Случайная свободная клетка для каждой из строк `rows`.
+
+        Свободной считается клетка без змейки, камня и яблока, кроме
+        центра поля. Если свободных клеток нет, возвращается `NO_CELL`.
+        """
+        blocked = (self.body_occupancy[rows] > 0) | (self.stones[rows] > 0)
+        blocked[:, self.center] = True
+        apples = self.apple[rows]
+        on_board = apples != NO_CELL
+        blocked[np.flatnonzero(on_board), apples[on_board]] = True
+        scores = self.rng.random(blocked.shape)
+        scores[blocked] = -1.0
+        cells = scores.argmax(axis=1)
+        full = scores[np.arange(rows.size), cells] < 0
+        return np.where(full, NO_CELL, cells)
+
+    def _place_apples(self, mask):
+        """Ставит яблоки в случайные свободные клетки.
+
+        Если свободных клеток нет, яблоко убирается с поля (`NO_CELL`);
+        `step` в этом случае начинает игру заново.
+        """
+        rows = self._rows[mask]
+        if rows.size:
+            self.apple[rows] = NO_CELL
+            self.apple[rows] = self._free_cells(rows)
+
+    def step(self, actions=None):
+        """Выполняет один такт во всех окружениях.
+
+        Args:
+            actions: массив индексов направлений в `DIRECTIONS` длиной
+                `num_envs`; отрицательное значение сохраняет направление,
+                разворот на 180° игнорируется. `None` - без поворотов.
+
+        Returns:
+            tuple: (BatchState, награды, флаги окончания эпизода).
+        """
+        cells, rows, offsets = self.cells, self._rows, self._offsets
+        if actions is not None:
+            actions = np.asarray(actions, dtype=np.int64)
+            turn = (actions >= 0) & (actions != _OPPOSITE[self.direction])
+            self.direction = np.where(turn, actions, self.direction)
+
+        x = (self.head % self.width + _DX[self.direction]) % self.width
+        y = (self.head // self.width + _DY[self.direction]) % self.height
+        head = y * self.width + x
+
+        occupancy = self.body_occupancy.reshape(-1)
+        index = (self.head_index + 1) % cells
+        self.body[rows, index] = head
+        self.head_index = index
+        occupancy[offsets + head] += 1
+        self.body_len += 1
+
+        pop = self.body_len > self.length
+        tail = self.body[rows, (index - self.body_len + 1) % cells]
+        occupancy[offsets[pop] + tail[pop]] -= 1
+        self.body_len[pop] -= 1
+        self.last = np.where(pop, tail, NO_CELL)
+        self.head = head
+
+        # Сегменты 1..SELF_HIT_FROM-1 не считаются столкновением,
+        # как в проверке `head in positions[SELF_HIT_FROM:]`.
+        others = occupancy[offsets + head].astype(np.int64) - 1
+        for segment in range(1, SELF_HIT_FROM):
+            near = self.body[rows, (index - segment) % cells]
+            others -= (segment < self.body_len) & (near == head)
+
+        ate = head == self.apple
+        self_hit = ~ate & (others > 0)
+        stone_hit = (~ate & ~self_hit
+                     & (self.stones.reshape(-1)[offsets + head] > 0))
+
+        self.length[ate] += 1
+        self._place_apples(ate)
+        full = ate & (self.apple == NO_CELL)
+        if full.any():
+            self._reset_games(full)
+        if stone_hit.any():
+            self.stones[stone_hit] = 0
+            self.stone_level[stone_hit] = 0
+        deaths = self_hit | stone_hit
+        if deaths.any():
+            self._reset_snakes(deaths)
+        dones = deaths | full
+
+        rewards = np.zeros(self.num_envs, dtype=np.int64)
+        rewards[ate] = REWARD_APPLE
+        rewards[deaths] = REWARD_DEATH
+        self.outcome = np.select(
+            (full, self_hit, stone_hit),
+            (OUTCOME_BOARD_FULL, OUTCOME_SELF_HIT, OUTCOME_STONE_HIT),
+            OUTCOME_NONE,
+        )
+
+        level = self.length // STONE_EVERY
+        spawn = ((self.length % STONE_EVERY == 0) & (level > self.stone_level)
+                 & ~full)
+        if spawn.any():
+            rows = self._rows[spawn]
+            spots = self._free_cells(rows)
+            placed = spots != NO_CELL
+            self.stones[rows[placed], spots[placed]] = 1
+            self.stone_level[spawn] = level[spawn]
+        return self.state(), rewards, dones
@@ -0,0 +1,243 @@
+"""
+Настройки игры: неизменяемый объект `Config` из TOML и командной строки.
+
+Размер поля, размер клетки, скорость, цвета и шаг появления камней
+хранятся в одном объекте `Config` (именованный кортеж со `__slots__`):
+его нельзя изменить на ходу, и несколько игр в одном процессе могут
+идти с разными настройками. `make_game` создаёт по настройкам
+`SnakeSimulation`.
+
+Настройки собираются `load_config` по слоям, каждый следующий
+перекрывает предыдущий:
+1. значения по умолчанию (`Config()`);
+2. файл TOML (`--config snake.toml`), ключи - имена полей `Config`,
+   цвета - массивы `[r, g, b]`;
+3. переменные окружения `SNAKE_*` (`ENVIRONMENT`);
+4. ключи командной строки (`--speed 20`, `--turbo`, `--board 100x100`).
+
+Лестница сложности: каждые `speed_every` очков скорость растёт на
+`speed_step` тактов в секунду, но не выше `max_speed`. Длины тактов
+всех ступеней считаются один раз (`tick_ladder`).
+
+Режим `turbo` отключает ожидание `clock.tick`: на каждый кадр
+приходится ровно один такт, и игра идёт так быстро, как успевает
+отрисовка. Режим нужен для замеров.
+
+Запуск: `python the_snake.py --config snake.toml --turbo`.
+"""
+
+import os
+from collections import namedtuple
+
+from simulation import (GRID_HEIGHT, GRID_SIZE, GRID_WIDTH, STONE_EVERY,
+                        SnakeSimulation)
+
+DEFAULTS = {
+    'width': GRID_WIDTH,
+    'height': GRID_HEIGHT,
+    'grid_size': GRID_SIZE,
+    'speed': 15,
+    'speed_step': 0,
+    'speed_every': 10,
+    'max_speed': 60,
+    'render_fps': 60,
+    'turbo': False,
+    'interpolate': True,
+    'stone_every': STONE_EVERY,
+    'snake_color': (0, 255, 0),
+    'apple_color': (255, 0, 0),
+    'stone_color': (105, 105, 105),
+    'background_color': (0, 0, 0),
+    'level': None,
+    'autopilot': False,
+    'record': None,
+    'stats': None,
+    'profile': None,
+    'seed': None,
+}
+POSITIVE = ('width', 'height', 'grid_size', 'speed', 'speed_every',
+            'max_speed', 'render_fps', 'stone_every')
+OPTIONAL_TYPES = {'level': str, 'record': str, 'stats': str, 'profile': str,
+                  'seed': int}
+ENVIRONMENT = {
+    'SNAKE_BOARD': 'board',
+    'SNAKE_LEVEL': 'level',
+    'SNAKE_AUTOPILOT': 'autopilot',
+    'SNAKE_RECORD': 'record',
+    'SNAKE_STATS': 'stats',
+    'SNAKE_PROFILE': 'profile',
+}
+
+
+class Config(namedtuple('Config', tuple(DEFAULTS),
+                        defaults=tuple(DEFAULTS.values()))):
+    """Неизменяемые настройки одной игры.
+
+    Атрибуты совпадают с ключами `DEFAULTS`: размер поля `width` x
+    `height` в клетках, размер клетки `grid_size` в пикселях, скорость
+    `speed` и лестница сложности (`speed_step`, `speed_every`,
+    `max_speed`) в тактах в секунду, частота кадров `render_fps`, режимы
+    `turbo` и `interpolate`, шаг появления камней `stone_every`, цвета
+    `*_color` и пути к файлам уровня, записи, статистики и профиля.
+    """
+
+    __slots__ = ()
+
+    def speed_at(self, length):
+        """Тактов в секунду при длине змейки `length`."""
+        rung = max(length - 1, 0) // self.speed_every
+        return min(self.speed + rung * self.speed_step,
+                   max(self.max_speed, self.speed))
+
+    def tick_ladder(self):
+        """Длины тактов в секундах по ступеням лестницы сложности.
+
+        Ступень при длине `length` - `(length - 1) // speed_every`,
+        последняя ступень действует и дальше.
+        """
+        rungs = 1
+        if self.speed_step:
+            gap = self.max_speed - self.speed
+            rungs += max(-(-gap // self.speed_step), 0)
+        return tuple(1 / self.speed_at(rung * self.speed_every + 1)
+                     for rung in range(rungs))
+
+
+def validate(config):
+    """Проверяет значения настроек.
+
+    Raises:
+        ValueError: значение вне допустимых пределов.
+    """
+    for name in POSITIVE:
+        if getattr(config, name) <= 0:
+            raise ValueError(f'Настройка {name} должна быть больше нуля.')
+    if config.speed_step < 0:
+        raise ValueError('Настройка speed_step не может быть меньше нуля.')
+    return config
+
+
+def _convert(name, value):
+    """Приводит значение из TOML или командной строки к типу поля."""
+    default = DEFAULTS[name]
+    if value is None:
+        return None
+    if isinstance(default, tuple):
+        if isinstance(value, str):
+            value = value.split(',')
+        color = tuple(int(channel) for channel in value)
+        if len(color) != 3 or not all(0 <= c <= 255 for c in color):
+            raise ValueError(f'Цвет {name} должен иметь вид r,g,b.')
+        return color
+    if isinstance(default, bool):
+        if isinstance(value, str):
+            return value.lower() not in ('', '0', 'false', 'no')
+        return bool(value)
+    kind = OPTIONAL_TYPES.get(name, type(default))
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Неверное значение настройки {name}: {value!r}.')
+
+
+def _board(value):
+    """Размер поля `ШxВ` в виде словаря настроек."""
+    try:
+        width, height = map(int, value.lower().split('x'))
+    except ValueError:
+        raise ValueError('Размер поля должен иметь вид ШxВ.')
+    return {'width': width, 'height': height}
+
+
+def _layer(values):
+    """Настройки одного слоя с приведением типов.
+
+    Raises:
+        ValueError: неизвестная настройка или неверное значение.
+    """
+    layer = {}
+    for name, value in values.items():
+        if name == 'board':
+            layer.update(_board(value))
+        elif name in DEFAULTS:
+            layer[name] = _convert(name, value)
+        else:
+            raise ValueError(f'Неизвестная настройка: {name}.')
+    return layer
+
+
+def read_toml(path):
+    """Настройки из файла TOML (плоская таблица ключей `Config`).
+
+    На Python 3.10 нет модуля `tomllib`, вместо него читается пакет
+    `tomli` с тем же интерфейсом.
+
+    Raises:
+        ValueError: нет ни `tomllib`, ни `tomli`.
+    """
+    try:
+        import tomllib
+    except ModuleNotFoundError:
+        try:
+            import tomli as tomllib
+        except ModuleNotFoundError:
+            raise ValueError('Для чтения файла настроек на Python 3.10 '
+                             'установите пакет tomli.') from None
+    with open(path, 'rb') as file:
+        return tomllib.load(file)
+
+
+def build_parser():
+    """Разбор ключей командной строки: по ключу на поле `Config`."""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--config', help='файл настроек TOML')
+    parser.add_argument('--board', help='размер поля ШxВ в клетках')
+    for name, default in DEFAULTS.items():
+        option = '--' + name.replace('_', '-')
+        if isinstance(default, bool):
+            parser.add_argument(option, dest=name, default=None,
+                                action=argparse.BooleanOptionalAction)
+        else:
+            parser.add_argument(option, dest=name, default=None)
+    return parser
+
+
+def load_config(argv=None, environ=os.environ):
+    """Собирает настройки из значений по умолчанию, TOML, окружения и
+    командной строки.
+
+    Args:
+        argv: ключи командной строки; `None` - `sys.argv[1:]`.
+        environ: переменные окружения.
+
+    Raises:
+        ValueError: неизвестная настройка или неверное значение.
+    """
+    args = vars(build_parser().parse_args(argv))
+    values = {}
+    path = args.pop('config')
+    if path:
+        values.update(_layer(read_toml(path)))
+    values.update(_layer({name: environ[variable]
+                          for variable, name in ENVIRONMENT.items()
+                          if environ.get(variable)}))
+    values.update(_layer({name: value for name, value in args.items()
+                          if value is not None}))
+    return validate(Config(**values))
+
+
+def make_game(config, **classes):
+    """Создаёт игру по настройкам; уровень читается из `config.level`.
+
+    Args:
+        classes: классы объектов для `SnakeSimulation` (`snake_cls` и
+            другие).
+    """
+    level = None
+    if config.level:
+        from levels import load_level
+        level = load_level(config.level)
+    return SnakeSimulation(seed=config.seed, width=config.width,
+                           height=config.height, level=level,
+                           stone_every=config.stone_every, **classes)
@@ -0,0 +1,275 @@
+"""
+Стресс-проверка правил игры со случайными сценариями.
+
+Сценарий `Case` - зерно игры, размер поля и поток нажатий по байту на
+такт (`press_bytes`): сколько стрелок нажато за такт (0-2), какие, и не
+заменить ли первую стрелкой к яблоку, чтобы змейка росла и доходила до
+плотных полей. Нажатия проходят через тот же путь, что и в игре -
+`the_snake.press_direction` и очередь `TurnQueue`, - затем такт
+`SnakeSimulation.step`.
+
+После каждого такта проверяются инварианты `INVARIANTS` (за O(1)):
+- яблоко не лежит на змейке, на препятствии и в центре поля;
+- `len(snake.positions) <= snake.length`;
+- змейка не развернулась на 180° за такт.
+
+Каждые `DEEP_EVERY` тактов и в конце эпизода индекс свободных клеток
+сверяется с объектами игры, а `choice` на нём (путь
+`randomize_position`) должен вернуть свободную клетку или `BoardFull`,
+если клеток нет. Проба идёт отдельным генератором и не меняет игру.
+
+Снимок для повтора не копирует объекты: сценарий (зерно и байты
+нажатий) детерминирован и повторяется с начала. Упавший сценарий
+уменьшается (`shrink`): обрезается по такту падения, затем куски
+нажатий заменяются пустыми, пока падение того же инварианта
+сохраняется.
+
+Запуск: `python fuzz.py --ticks 1000000`.
+"""
+
+import argparse
+from collections import namedtuple
+from random import Random
+from time import perf_counter
+
+import the_snake
+from selfplay import greedy_policy
+from simulation import (DIRECTIONS, OPPOSITE, BoardFull, SnakeSimulation,
+                        TurnQueue)
+
+DEFAULT_TICKS = 200_000
+EPISODE_TICKS = 5_000
+DEEP_EVERY = 256
+SHRINK_BUDGET = 2_000
+SIZES = ((4, 3), (6, 5), (8, 6), (12, 10), (32, 24))
+GREEDY_FLAG = 0x40
+COUNT_SHIFT = 4
+ACTIONS_PER_TICK = 3
+
+Case = namedtuple('Case', ('seed', 'width', 'height', 'presses'))
+Failure = namedtuple('Failure', ('case', 'tick', 'invariant', 'message'))
+
+
+def apple_is_free(game, previous, done):
+    """Яблоко не на змейке, не на препятствии и не в центре поля."""
+    apple = game.apple.position
+    if apple is None:
+        return None
+    if apple in game.snake.positions:
+        return f'яблоко {apple} на змейке'
+    if apple in game.stone:
+        return f'яблоко {apple} на препятствии'
+    if apple == game.free_cells.center:
+        return f'яблоко {apple} в центре поля'
+    return None
+
+
+def body_fits_length(game, previous, done):
+    """Тело не длиннее `snake.length`."""
+    snake = game.snake
+    if len(snake.positions) > snake.length:
+        return f'{len(snake.positions)} сегментов при длине {snake.length}'
+    return None
+
+
+def no_reversal(game, previous, done):
+    """Направление хода не противоположно предыдущему."""
+    if done or previous is None:
+        return None
+    moved = DIRECTIONS[game.last_action]
+    if moved == OPPOSITE[DIRECTIONS[previous]]:
+        return f'разворот {DIRECTIONS[previous]} -> {moved}'
+    return None
+
+
+INVARIANTS = (apple_is_free, body_fits_length, no_reversal)
+
+
+def free_cells_match(game, probe):
+    """Индекс свободных клеток совпадает с объектами игры, а выбор
+    случайной свободной клетки завершается.
+    """
+    free_cells = game.free_cells
+    taken = set(game.snake.positions) | set(game.stone.positions)
+    taken.add(free_cells.center)
+    if game.apple.position is not None:
+        taken.add(game.apple.position)
+    area = game.width * game.height
+    if len(free_cells) != area - len(taken):
+        return (f'свободных клеток {len(free_cells)}, '
+                f'ожидалось {area - len(taken)}')
+    rng, free_cells.rng = free_cells.rng, probe
+    try:
+        cell = free_cells.choice()
+    except BoardFull:
+        return None if len(taken) == area else 'BoardFull при свободных'
+    finally:
+        free_cells.rng = rng
+    if cell in taken:
+        return f'выбрана занятая клетка {cell}'
+    return None
+
+
+def press_bytes(rng, ticks):
+    """Случайные нажатия на `ticks` тактов: по байту на такт.
+
+    Биты 0-1 и 2-3 - стрелки (индексы `DIRECTIONS`), биты 4-5 - число
+    нажатий (0-2), бит 6 - заменить первую стрелку шагом к яблоку.
+    """
+    return rng.randbytes(ticks)
+
+
+def _presses(game, byte):
+    """Стрелки, нажатые за такт, по байту сценария."""
+    count = (byte >> COUNT_SHIFT & 3) % ACTIONS_PER_TICK
+    if not count:
+        return ()
+    first = byte & 3
+    if byte & GREEDY_FLAG:
+        greedy = greedy_policy(game)
+        first = first if greedy is None else greedy
+    if count == 1:
+        return (DIRECTIONS[first],)
+    return DIRECTIONS[first], DIRECTIONS[byte >> 2 & 3]
+
+
+def run_case(case, invariants=INVARIANTS, queue=True, deep_every=DEEP_EVERY):
+    """Проигрывает сценарий и проверяет инварианты после каждого такта.
+
+    Args:
+        queue: нажатия идут через `TurnQueue`, как в `main`; иначе -
+            сразу в змейку, как `handle_keys` без очереди.
+
+    Returns:
+        Failure | None: первое нарушение.
+    """
+    game = SnakeSimulation(seed=case.seed, width=case.width,
+                           height=case.height)
+    snake, step, press = game.snake, game.step, the_snake.press_direction
+    turns = TurnQueue(clock=int) if queue else None
+    probe = Random(case.seed)
+    previous = None
+    for tick, byte in enumerate(case.presses, 1):
+        for direction in _presses(game, byte):
+            press(snake, direction, turns)
+        _, _, done = step(turns.pop() if queue else None)
+        for invariant in invariants:
+            message = invariant(game, previous, done)
+            if message is not None:
+                return Failure(case, tick, invariant.__name__, message)
+        if done:
+            previous = None
+            if queue:
+                turns.clear()
+        else:
+            previous = game.last_action
+        if done or not tick % deep_every:
+            message = free_cells_match(game, probe)
+            if message is not None:
+                return Failure(case, tick, free_cells_match.__name__,
+                               message)
+    return None
+
+
+def shrink(failure, budget=SHRINK_BUDGET, **options):
+    """Уменьшает сценарий, сохраняя падение того же инварианта.
+
+    Returns:
+        Failure: падение минимального найденного сценария.
+    """
+    def attempt(presses):
+        nonlocal budget
+        budget -= 1
+        result = run_case(failure.case._replace(presses=presses), **options)
+        if result is not None and result.invariant == failure.invariant:
+            return result
+        return None
+
+    best = run_case(failure.case._replace(
+        presses=failure.case.presses[:failure.tick]
+    ), **options) or failure
+    size = len(best.case.presses) // 2
+    while size and budget > 0:
+        start = 0
+        while start < len(best.case.presses) and budget > 0:
+            presses = best.case.presses
+            chunk = presses[start:start + size]
+            if any(chunk):
+                result = attempt(presses[:start] + bytes(len(chunk))
+                                 + presses[start + size:])
+                if result is not None:
+                    best = result._replace(case=result.case._replace(
+                        presses=result.case.presses[:result.tick]
+                    ))
+            start += size
+        size //= 2
+    return best
+
+
+class FuzzReport:
+    """Итоги прогона."""
+
+    def __init__(self, ticks, cases, failures, seconds):
+        self.ticks = ticks
+        self.cases = cases
+        self.failures = failures
+        self.seconds = seconds
+
+    def __str__(self):
+        """Краткая сводка для печати."""
+        rate = self.ticks / self.seconds if self.seconds else 0.0
+        lines = [f'{self.ticks} тактов в {self.cases} сценариях за '
+                 f'{self.seconds:.2f} с ({rate:.0f} тактов/с), '
+                 f'нарушений {len(self.failures)}']
+        for failure in self.failures:
+            case = failure.case
+            lines.append(
+                f'  {failure.invariant}: {failure.message} - зерно '
+                f'{case.seed}, поле {case.width}x{case.height}, '
+                f'{failure.tick} тактов, нажатия {case.presses.hex()}'
+            )
+        return '\n'.join(lines)
+
+
+def fuzz(ticks=DEFAULT_TICKS, seed=0, sizes=SIZES,
+         episode_ticks=EPISODE_TICKS, **options):
+    """Прогоняет случайные сценарии на `ticks` тактов в сумме.
+
+    Нажатия каждого сценария порождаются одним вызовом `press_bytes`.
+    Упавшие сценарии уменьшаются `shrink`.
+
+    Returns:
+        FuzzReport: итоги.
+    """
+    rng = Random(seed)
+    failures = []
+    done = cases = 0
+    start = perf_counter()
+    while done < ticks:
+        width, height = sizes[cases % len(sizes)]
+        length = min(episode_ticks, ticks - done)
+        case = Case(rng.getrandbits(32), width, height,
+                    press_bytes(rng, length))
+        failure = run_case(case, **options)
+        done += length if failure is None else failure.tick
+        cases += 1
+        if failure is not None:
+            failures.append(shrink(failure, **options))
+    return FuzzReport(done, cases, failures, perf_counter() - start)
+
+
+def main():
+    """Запуск из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--ticks', type=int, default=DEFAULT_TICKS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-queue', action='store_true',
+                        help='нажатия сразу в змейку, без TurnQueue')
+    args = parser.parse_args()
+    report = fuzz(args.ticks, args.seed, queue=not args.no_queue)
+    print(report)
+    raise SystemExit(1 if report.failures else 0)
+
+
+if __name__ == '__main__':
+    main()
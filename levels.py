@@ -0,0 +1,116 @@
+"""
+Уровни: размер поля и расположение стен.
+
+Формат файла уровня - текст в UTF-8:
+
+    snake-level 1
+    40x30
+    40#
+    #38.#
+    ...
+
+Первая строка - сигнатура и версия, вторая - размер поля `ШxВ` в
+клетках, далее строки поля сверху вниз. Клетка обозначается символом
+(`WALL` - стена, `EMPTY` - пусто), повторы сжимаются счётчиком перед
+символом (`38.` - 38 пустых клеток). Пустой хвост строки и пустые строки
+в конце поля можно опускать, поэтому большое поле с редкими стенами
+занимает несколько строк. Строки, начинающиеся с `;`, - комментарии.
+
+Клетка появления змейки (центр поля) должна быть свободна.
+"""
+
+import re
+from collections import namedtuple
+
+from simulation import board_center
+
+LEVEL_MAGIC = 'snake-level'
+LEVEL_VERSION = 1
+WALL = '#'
+EMPTY = '.'
+_TOKEN = re.compile(r'(\d*)(.)')
+
+
+class Level(namedtuple('Level', ('width', 'height', 'walls'))):
+    """Уровень: размер поля и клетки стен (`y * width + x`)."""
+
+    __slots__ = ()
+
+
+def _parse_row(line, width, y):
+    """Клетки стен одной строки поля."""
+    walls = []
+    x = 0
+    for count, symbol in _TOKEN.findall(line):
+        count = int(count) if count else 1
+        if symbol not in (WALL, EMPTY) or x + count > width:
+            raise ValueError(f'Строка {y + 1} поля уровня повреждена.')
+        if symbol == WALL:
+            walls.extend(range(y * width + x, y * width + x + count))
+        x += count
+    return walls
+
+
+def parse_level(text):
+    """Разбирает текст уровня.
+
+    Raises:
+        ValueError: текст не является уровнем или поле повреждено.
+    """
+    lines = [line.strip() for line in text.splitlines()
+             if not line.startswith(';')]
+    if (len(lines) < 2
+            or lines[0].split() != [LEVEL_MAGIC, str(LEVEL_VERSION)]):
+        raise ValueError('Неизвестный формат файла уровня.')
+    try:
+        width, height = map(int, lines[1].lower().split('x'))
+    except ValueError:
+        raise ValueError('Размер поля уровня должен иметь вид ШxВ.')
+    rows = lines[2:]
+    while rows and not rows[-1]:
+        rows.pop()
+    if len(rows) > height:
+        raise ValueError('Строк поля больше, чем высота уровня.')
+    walls = []
+    for y, line in enumerate(rows):
+        walls.extend(_parse_row(line, width, y))
+    if board_center(width, height) in walls:
+        raise ValueError('Клетка появления змейки занята стеной.')
+    return Level(width, height, walls)
+
+
+def format_level(level):
+    """Текст уровня в сжатом виде (обратное к `parse_level`)."""
+    walls = set(level.walls)
+    lines = [f'{LEVEL_MAGIC} {LEVEL_VERSION}',
+             f'{level.width}x{level.height}']
+    for y in range(level.height):
+        row = ''.join(WALL if y * level.width + x in walls else EMPTY
+                      for x in range(level.width)).rstrip(EMPTY)
+        lines.append(''.join(
+            (str(len(run)) if len(run) > 1 else '') + run[0]
+            for run in re.findall(r'(#+|\.+)', row)
+        ))
+    while lines[-1] == '':
+        lines.pop()
+    return '\n'.join(lines) + '\n'
+
+
+def load_level(path):
+    """Читает уровень из файла."""
+    with open(path, encoding='utf-8') as file:
+        return parse_level(file.read())
+
+
+def save_level(level, path):
+    """Записывает уровень в файл."""
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(format_level(level))
+
+
+def border_level(width, height):
+    """Уровень со стеной по краю поля."""
+    walls = [cell for cell in range(width * height)
+             if cell < width or cell >= width * (height - 1)
+             or cell % width in (0, width - 1)]
+    return Level(width, height, walls)
@@ -0,0 +1,158 @@
+"""
+Поиск с заглядыванием вперёд: ходы по случайным продолжениям игры.
+
+`Lookahead` выбирает ход так же, как поиск по дереву Монте-Карло на
+один уровень: для каждого допустимого хода разыгрываются случайные
+продолжения на `depth` тактов, а какой ход проверять следующим, решает
+правило UCB1 по средней дисконтированной награде. Каждое продолжение
+начинается с возврата к снимку корня (`SnakeSimulation.restore`), а не с
+глубокой копии объектов игры, поэтому стоимость продолжения - это
+стоимость его тактов.
+
+Перебор идёт на копии игры (`SnakeSimulation.fork`): сама игра только
+снимается, её генератор и индекс свободных клеток не меняются, и
+записанная игра (`replay`) повторяется без планировщика.
+
+Запуск замера: `python lookahead.py --rollouts 200 --depth 20`.
+"""
+
+import argparse
+import copy
+from math import log, sqrt
+from random import Random
+from time import perf_counter
+
+from simulation import DIRECTIONS, OPPOSITE, SnakeSimulation
+
+DEFAULT_ROLLOUTS = 64
+DEFAULT_DEPTH = 16
+EXPLORATION = 1.4
+DISCOUNT = 0.95
+
+
+class Lookahead:
+    """Планировщик ходов для игры `SnakeSimulation`.
+
+    Как и `autopilot.Autopilot`, экземпляр вызывается раз в такт и
+    возвращает индекс направления в `DIRECTIONS`.
+
+    Атрибуты:
+        model (SnakeSimulation): копия игры, на которой идёт перебор.
+        ticks (int): смоделировано тактов за всё время.
+        rollouts_done (int): разыграно продолжений за всё время.
+    """
+
+    def __init__(self, game, rollouts=DEFAULT_ROLLOUTS, depth=DEFAULT_DEPTH,
+                 exploration=EXPLORATION, discount=DISCOUNT, seed=None):
+        self.game = game
+        self.rollouts = rollouts
+        self.depth = depth
+        self.exploration = exploration
+        self.discount = discount
+        self.rng = Random(seed)
+        self.model = game.fork()
+        self.ticks = 0
+        self.rollouts_done = 0
+
+    def __call__(self, game=None):
+        """Ход на текущий такт: индекс направления."""
+        return self.decide()
+
+    def decide(self):
+        """Выбирает ход по `rollouts` продолжениям из текущего состояния."""
+        model = self.model
+        root = self.game.snapshot(rng=False)
+        model.restore(root, rng=False)
+        reverse = OPPOSITE[model.snake.direction]
+        actions = [index for index, direction in enumerate(DIRECTIONS)
+                   if direction != reverse]
+        visits = [0] * len(actions)
+        totals = [0.0] * len(actions)
+        for played in range(self.rollouts):
+            choice = self._select(visits, totals, played)
+            model.restore(root, rng=False)
+            totals[choice] += self._rollout(actions[choice])
+            visits[choice] += 1
+        self.rollouts_done += self.rollouts
+        best = max(range(len(actions)),
+                   key=lambda index: (totals[index] / visits[index]
+                                      if visits[index] else float('-inf')))
+        return actions[best]
+
+    def _select(self, visits, totals, played):
+        """Ход для следующего продолжения по правилу UCB1."""
+        for index, count in enumerate(visits):
+            if not count:
+                return index
+        spread = self.exploration * sqrt(log(played))
+        return max(range(len(visits)),
+                   key=lambda index: (totals[index] / visits[index]
+                                      + spread / sqrt(visits[index])))
+
+    def _rollout(self, action):
+        """Дисконтированная награда продолжения, начатого ходом `action`.
+
+        Дальше ходы выбираются случайно; продолжение обрывается на
+        окончании эпизода.
+        """
+        step, randrange = self.model.step, self.rng.randrange
+        _, value, done = step(action)
+        weight, ticks = 1.0, 1
+        while not done and ticks < self.depth:
+            weight *= self.discount
+            _, reward, done = step(randrange(len(DIRECTIONS)))
+            value += weight * reward
+            ticks += 1
+        self.ticks += ticks
+        return value
+
+
+def measure_clone_step(game, repeats):
+    """Средняя стоимость возврата к снимку и одного такта в мкс и, для
+    сравнения, глубокой копии игры.
+
+    Returns:
+        dict: `restore_step` и `deepcopy` в мкс.
+    """
+    root = game.snapshot(rng=False)
+    restore, step = game.restore, game.step
+    start = perf_counter()
+    for _ in range(repeats):
+        restore(root, rng=False)
+        step()
+    restore_step = (perf_counter() - start) / repeats * 1e6
+    copies = max(repeats // 1000, 1)
+    start = perf_counter()
+    for _ in range(copies):
+        copy.deepcopy(game)
+    deep = (perf_counter() - start) / copies * 1e6
+    game.restore(root)
+    return {'restore_step': restore_step, 'deepcopy': deep}
+
+
+def main():
+    """Замер стоимости продолжений и решений из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rollouts', type=int, default=DEFAULT_ROLLOUTS)
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH)
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    game = SnakeSimulation(seed=args.seed)
+    print('Возврат к снимку и такт: {restore_step:.2f} мкс, глубокая '
+          'копия: {deepcopy:.0f} мкс'.format(
+              **measure_clone_step(game.fork(), 100_000)))
+    planner = Lookahead(game, args.rollouts, args.depth, seed=args.seed)
+    score = 0
+    start = perf_counter()
+    for _ in range(args.ticks):
+        _, reward, _ = game.step(planner())
+        score += reward > 0
+    seconds = perf_counter() - start
+    print(f'{args.ticks} решений по {args.rollouts} продолжений: '
+          f'{seconds / args.ticks * 1000:.2f} мс на решение, '
+          f'{planner.ticks / seconds:.0f} тактов модели/с, очки {score}')
+
+
+if __name__ == '__main__':
+    main()
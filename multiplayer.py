@@ -0,0 +1,734 @@
+"""
+Сетевая игра нескольких змеек на одном поле.
+
+`MultiplayerGame` - правила для нескольких змеек поверх моделей
+`simulation`: змейки, яблоко и камни ведут себя как в одиночной игре
+(камни ставит тот же `Stone.add_new_stone` с шагом `stone_every`, а
+пройденные уровни у каждой змейки свои), а голова, въехавшая в другую
+змейку, приводит к её гибели (`OUTCOME_SNAKE_HIT`; при лобовом
+столкновении гибнут обе).
+
+`GameServer` принимает клиентов по TCP (asyncio) и ведёт сотни игр -
+комнат - в одном процессе: все комнаты продвигает одна задача тактов.
+Клиент получает полный снимок поля один раз, при входе, а затем только
+изменения такта (`Delta`): новую голову и снятый хвост каждой змейки
+(то, что одиночная игра хранит в `Snake.last`), гибели, входы и выходы,
+новое место яблока и новые камни. Клиент восстанавливает поле по
+изменениям, см. `BoardMirror`.
+
+Если погибшей змейке негде появиться (поле заполнено), она ждёт вне
+поля: гибель приходит с головой `NO_CELL`, а когда клетка освободится,
+змейка появляется снова событием `EVENT_JOIN`.
+
+Ввод клиента помечен номером такта, к которому он относится. Ввод на
+будущий такт ждёт своего такта (не дальше `INPUT_WINDOW` тактов вперёд),
+опоздавший применяется на ближайшем такте; из нескольких вводов на такт
+действует последний по номеру.
+
+Протокол: сообщение - заголовок `HEADER` (тип `MSG_*`, 32-битная длина,
+чтобы снимок большого поля помещался в одно сообщение), затем
+данные в порядке little-endian:
+- `MSG_JOIN` (клиент): номер комнаты `JOIN`;
+- `MSG_INPUT` (клиент): такт и индекс направления `INPUT`;
+- `MSG_WELCOME` (сервер): снимок поля, см. `encode_snapshot`;
+- `MSG_DELTA` (сервер): изменения такта, см. `encode_delta`.
+
+Сообщения клиента не длиннее `MAX_CLIENT_MESSAGE` байт: сервер закрывает
+соединение, получив заголовок с большей длиной, не читая данных.
+
+Запуск: `python multiplayer.py serve --port 8765`; нагрузочный клиент с
+сервером в том же процессе - `python multiplayer.py load --games 200`.
+"""
+
+import argparse
+import asyncio
+import struct
+from collections import deque, namedtuple
+from random import Random
+from time import perf_counter
+
+from simulation import (DIRECTIONS, GRID_HEIGHT, GRID_WIDTH,
+                        OBSTACLE_WALL, OPPOSITE, OUTCOME_NONE,
+                        OUTCOME_SELF_HIT, OUTCOME_STONE_HIT,
+                        OUTCOME_WALL_HIT, STONE_EVERY, Apple, BoardFull,
+                        Snake, SnakeBody, Stone, make_board)
+
+OUTCOME_SNAKE_HIT = OUTCOME_WALL_HIT + 1
+DEFAULT_PORT = 8765
+DEFAULT_TICK_RATE = 15
+MAX_PLAYERS = 8
+INPUT_WINDOW = 16
+MAX_WRITE_BUFFER = 1 << 16
+
+MSG_JOIN = 1
+MSG_INPUT = 2
+MSG_WELCOME = 3
+MSG_DELTA = 4
+HEADER = struct.Struct('<BI')
+JOIN = struct.Struct('<I')
+INPUT = struct.Struct('<IB')
+SNAPSHOT_HEADER = struct.Struct('<IHHBiIB')
+SNAPSHOT_SNAKE = struct.Struct('<BI')
+DELTA_HEADER = struct.Struct('<IBBB')
+DELTA_APPLE = struct.Struct('<i')
+DELTA_SNAKE = struct.Struct('<BiiB')
+MAX_CLIENT_MESSAGE = max(JOIN.size, INPUT.size)
+
+EVENT_MOVE = 0
+EVENT_JOIN = 1
+EVENT_LEAVE = 2
+EVENT_DEATH = 0x10
+FLAG_APPLE = 1
+FLAG_STONES_CLEARED = 2
+NO_CELL = -1
+
+
+class GameFull(Exception):
+    """В комнате нет свободных мест."""
+
+
+Delta = namedtuple('Delta', ('tick', 'apple_moved', 'apple', 'stones_cleared',
+                             'stones', 'snakes'))
+Delta.__doc__ = """Изменения одного такта.
+
+`snakes` - список `(место, голова, хвост, событие)`: для `EVENT_MOVE`
+голова добавлена, хвост (или `NO_CELL`) снят; для `EVENT_JOIN` и гибели
+(`EVENT_DEATH | OUTCOME_*`) тело змейки заменено одной клеткой головы;
+для `EVENT_LEAVE` змейка убрана. Камни сначала убираются
+(`stones_cleared`), затем добавляются `stones`.
+"""
+
+
+class MultiplayerGame:
+    """Правила игры нескольких змеек на общем поле.
+
+    Места змеек (`0..max_players-1`) назначает `join`. Все случайные
+    решения принимает генератор, инициализированный `seed`.
+
+    Пройденные уровни камней (`Stone.levels` одиночной игры) хранятся
+    для каждой змейки отдельно в `levels` и подставляются в `stone`
+    перед `add_new_stone`: рост одной змейки не тратит уровни другой.
+    Когда камни убираются, уровни сбрасываются у всех змеек, как
+    `Stone.clear` в одиночной игре.
+    """
+
+    def __init__(self, seed=None, width=GRID_WIDTH, height=GRID_HEIGHT,
+                 max_players=MAX_PLAYERS, stone_every=STONE_EVERY):
+        self.rng = Random(seed)
+        self.width = width
+        self.height = height
+        self.max_players = max_players
+        self.free_cells = make_board(width, height, self.rng)
+        self.apple = Apple(free_cells=self.free_cells, rng=self.rng)
+        self.stone = Stone(free_cells=self.free_cells, rng=self.rng)
+        self.stone.every = stone_every
+        self.levels = {}
+        self.snakes = {}
+        self.waiting = set()
+        self.tick = 0
+        self._inputs = {}
+        self._events = []
+
+    def join(self):
+        """Добавляет змейку в случайную свободную клетку.
+
+        Returns:
+            int: место змейки.
+
+        Raises:
+            GameFull: все места заняты.
+            BoardFull: на поле нет свободной клетки для змейки.
+        """
+        slot = next((slot for slot in range(self.max_players)
+                     if slot not in self.snakes), None)
+        if slot is None:
+            raise GameFull('В комнате нет свободных мест.')
+        snake = Snake(free_cells=self.free_cells, rng=self.rng)
+        try:
+            self._respawn(snake)
+        except BoardFull:
+            self._remove_body(snake)
+            raise
+        self.snakes[slot] = snake
+        self.levels[slot] = set()
+        self._inputs[slot] = {}
+        self._events.append((slot, snake.position, NO_CELL, EVENT_JOIN))
+        return slot
+
+    def leave(self, slot):
+        """Убирает змейку с поля."""
+        snake = self.snakes.pop(slot)
+        del self._inputs[slot], self.levels[slot]
+        self.waiting.discard(slot)
+        self._remove_body(snake)
+        self._events.append((slot, NO_CELL, NO_CELL, EVENT_LEAVE))
+
+    def submit(self, slot, tick, action):
+        """Принимает ввод змейки `slot` для такта `tick`.
+
+        Returns:
+            bool: `False`, если ввод отброшен (неизвестное направление или
+            такт дальше `INPUT_WINDOW`).
+        """
+        if (slot not in self._inputs or not 0 <= action < len(DIRECTIONS)
+                or tick > self.tick + INPUT_WINDOW):
+            return False
+        self._inputs[slot][tick] = action
+        return True
+
+    def _respawn(self, snake):
+        """Сбрасывает змейку в случайную свободную клетку.
+
+        Raises:
+            BoardFull: свободных клеток нет; змейка не меняется.
+        """
+        snake.position = snake._free_position()
+        snake.reset()
+
+    def _remove_body(self, snake):
+        """Убирает тело змейки с поля."""
+        for position in snake.positions:
+            self.free_cells.release(position)
+        snake.positions = SnakeBody()
+
+    def _kill(self, slot, snake, outcome):
+        """Возрождает погибшую змейку или, если поле заполнено,
+        убирает её с поля до освобождения клетки.
+        """
+        try:
+            self._respawn(snake)
+        except BoardFull:
+            self._remove_body(snake)
+            self.waiting.add(slot)
+            return NO_CELL
+        return snake.position
+
+    def _return_waiting(self, events):
+        """Возвращает на поле ждущие змейки, если есть свободные клетки;
+        ввод змеек, оставшихся ждать, отбрасывается.
+        """
+        for slot in sorted(self.waiting):
+            try:
+                self._respawn(self.snakes[slot])
+            except BoardFull:
+                break
+            self.waiting.discard(slot)
+            events.append((slot, self.snakes[slot].position, NO_CELL,
+                           EVENT_JOIN))
+        for slot in self.waiting:
+            self._inputs[slot].clear()
+
+    def _steer(self, slot, snake):
+        """Применяет последний наступивший ввод змейки."""
+        pending = self._inputs[slot]
+        due = [tick for tick in pending if tick <= self.tick]
+        if not due:
+            return
+        direction = DIRECTIONS[pending[max(due)]]
+        for tick in due:
+            del pending[tick]
+        if direction != OPPOSITE[snake.direction]:
+            snake.update_direction(direction)
+
+    def _collision(self, slot, snake):
+        """Причина гибели змейки после хода или `OUTCOME_NONE`."""
+        head = snake.get_head_position()
+        if snake.hits_self():
+            return OUTCOME_SELF_HIT
+        if head in self.stone:
+            return (OUTCOME_WALL_HIT if self.stone.kind(head) == OBSTACLE_WALL
+                    else OUTCOME_STONE_HIT)
+        for other_slot, other in self.snakes.items():
+            if other_slot != slot and head in other.positions:
+                return OUTCOME_SNAKE_HIT
+        return OUTCOME_NONE
+
+    def step(self):
+        """Выполняет такт для всех змеек.
+
+        Сначала ходят все змейки, затем проверяются столкновения, поэтому
+        результат не зависит от порядка мест.
+
+        Returns:
+            Delta: изменения такта.
+        """
+        self.tick += 1
+        events, self._events = self._events, []
+        self._return_waiting(events)
+        snakes = {slot: snake for slot, snake in self.snakes.items()
+                  if slot not in self.waiting}
+        for slot, snake in snakes.items():
+            self._steer(slot, snake)
+            snake.move()
+        deaths = {slot: self._collision(slot, snake)
+                  for slot, snake in snakes.items()}
+        stones_cleared = OUTCOME_STONE_HIT in deaths.values()
+        if stones_cleared:
+            self.stone.clear()
+            for levels in self.levels.values():
+                levels.clear()
+        for slot, outcome in deaths.items():
+            snake = snakes[slot]
+            if outcome == OUTCOME_NONE:
+                events.append((slot, snake.get_head_position(),
+                               NO_CELL if snake.last is None else snake.last,
+                               EVENT_MOVE))
+            else:
+                events.append((slot, self._kill(slot, snake, outcome),
+                               NO_CELL, EVENT_DEATH | outcome))
+        eaten, stones = self._eat(deaths)
+        return Delta(self.tick, eaten, self.apple.position, stones_cleared,
+                     stones, events)
+
+    def _eat(self, deaths):
+        """Отдаёт яблоко первой выжившей змейке на его клетке.
+
+        Яблоко, которому не хватило места на заполненном поле, снова
+        ищет клетку на каждом такте.
+
+        Returns:
+            tuple: (сдвинулось ли яблоко, клетки новых камней). Камень
+            ставит `Stone.add_new_stone` с уровнями съевшей змейки.
+        """
+        apple = self.apple.position
+        if apple is None:
+            try:
+                self.apple.randomize_position()
+            except BoardFull:
+                return False, []
+            return True, []
+        slot = next((slot for slot, outcome in deaths.items()
+                     if outcome == OUTCOME_NONE
+                     and self.snakes[slot].get_head_position() == apple),
+                    None)
+        if slot is None:
+            return False, []
+        eater, stone = self.snakes[slot], self.stone
+        eater.length += 1
+        count = len(stone.positions)
+        stone.levels = self.levels[slot]
+        stone.add_new_stone(eater.length)
+        try:
+            self.apple.randomize_position()
+        except BoardFull:
+            self.apple.place(None)
+        return True, stone.positions[count:]
+
+    def snapshot(self, slot=0):
+        """Полный снимок поля для игрока `slot`, см. `encode_snapshot`."""
+        return encode_snapshot(
+            self.tick, self.width, self.height, slot, self.apple.position,
+            self.stone.positions,
+            {slot: list(snake.positions)
+             for slot, snake in self.snakes.items()},
+        )
+
+
+def _cells(cells):
+    """Упаковывает клетки в массив uint32."""
+    return struct.pack(f'<{len(cells)}I', *cells)
+
+
+def encode_snapshot(tick, width, height, slot, apple, stones, snakes):
+    """Снимок: заголовок `SNAPSHOT_HEADER` (такт, размер поля, место
+    получателя, яблоко, число камней, число змеек), клетки камней, затем
+    для каждой змейки `SNAPSHOT_SNAKE` (место, длина) и клетки тела.
+    """
+    chunks = [
+        SNAPSHOT_HEADER.pack(tick, width, height, slot,
+                             NO_CELL if apple is None else apple,
+                             len(stones), len(snakes)),
+        _cells(stones),
+    ]
+    for snake_slot, body in snakes.items():
+        chunks.append(SNAPSHOT_SNAKE.pack(snake_slot, len(body)))
+        chunks.append(_cells(body))
+    return b''.join(chunks)
+
+
+def decode_snapshot(data):
+    """Разбирает снимок.
+
+    Returns:
+        tuple: (такт, ширина, высота, место, яблоко или `None`, камни,
+        словарь тел змеек по местам).
+    """
+    tick, width, height, slot, apple, stone_count, snake_count = (
+        SNAPSHOT_HEADER.unpack_from(data)
+    )
+    offset = SNAPSHOT_HEADER.size
+    stones = list(struct.unpack_from(f'<{stone_count}I', data, offset))
+    offset += 4 * stone_count
+    snakes = {}
+    for _ in range(snake_count):
+        snake_slot, length = SNAPSHOT_SNAKE.unpack_from(data, offset)
+        offset += SNAPSHOT_SNAKE.size
+        snakes[snake_slot] = list(struct.unpack_from(f'<{length}I', data,
+                                                     offset))
+        offset += 4 * length
+    return (tick, width, height, slot, None if apple == NO_CELL else apple,
+            stones, snakes)
+
+
+def encode_delta(delta):
+    """Изменения такта: `DELTA_HEADER` (такт, флаги `FLAG_*`, число
+    записей змеек, число новых камней), яблоко `DELTA_APPLE` (если
+    `FLAG_APPLE`), записи `DELTA_SNAKE` и клетки новых камней.
+    """
+    flags = ((FLAG_APPLE if delta.apple_moved else 0)
+             | (FLAG_STONES_CLEARED if delta.stones_cleared else 0))
+    chunks = [DELTA_HEADER.pack(delta.tick, flags, len(delta.snakes),
+                                len(delta.stones))]
+    if delta.apple_moved:
+        chunks.append(DELTA_APPLE.pack(
+            NO_CELL if delta.apple is None else delta.apple
+        ))
+    chunks.extend(DELTA_SNAKE.pack(*entry) for entry in delta.snakes)
+    chunks.append(_cells(delta.stones))
+    return b''.join(chunks)
+
+
+def decode_delta(data):
+    """Разбирает изменения такта в `Delta` (яблоко `None`, если не
+    сдвинулось или пропало).
+    """
+    tick, flags, snake_count, stone_count = DELTA_HEADER.unpack_from(data)
+    offset = DELTA_HEADER.size
+    apple = None
+    if flags & FLAG_APPLE:
+        apple, = DELTA_APPLE.unpack_from(data, offset)
+        offset += DELTA_APPLE.size
+        apple = None if apple == NO_CELL else apple
+    snakes = [DELTA_SNAKE.unpack_from(data, offset + index * DELTA_SNAKE.size)
+              for index in range(snake_count)]
+    offset += snake_count * DELTA_SNAKE.size
+    stones = list(struct.unpack_from(f'<{stone_count}I', data, offset))
+    return Delta(tick, bool(flags & FLAG_APPLE), apple,
+                 bool(flags & FLAG_STONES_CLEARED), stones, snakes)
+
+
+class BoardMirror:
+    """Копия поля на стороне клиента, собираемая из снимка и изменений.
+
+    Атрибуты:
+        desyncs (int): записей, не совпавших с копией (снятый хвост не
+            был хвостом змейки, такт пришёл не по порядку).
+    """
+
+    def __init__(self, snapshot):
+        (self.tick, self.width, self.height, self.slot, self.apple,
+         stones, snakes) = decode_snapshot(snapshot)
+        self.stones = stones
+        self.snakes = {slot: deque(body) for slot, body in snakes.items()}
+        self.desyncs = 0
+
+    def apply(self, delta):
+        """Применяет изменения такта."""
+        if delta.tick != self.tick + 1:
+            self.desyncs += 1
+        self.tick = delta.tick
+        for slot, head, tail, event in delta.snakes:
+            if event == EVENT_MOVE:
+                body = self.snakes[slot]
+                body.appendleft(head)
+                if tail != NO_CELL and body.pop() != tail:
+                    self.desyncs += 1
+            elif event == EVENT_LEAVE:
+                self.snakes.pop(slot, None)
+            else:
+                self.snakes[slot] = deque(() if head == NO_CELL else (head,))
+        if delta.stones_cleared:
+            self.stones = []
+        self.stones.extend(delta.stones)
+        if delta.apple_moved:
+            self.apple = delta.apple
+
+
+def frame(kind, payload=b''):
+    """Сообщение протокола: заголовок и данные."""
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader, max_size=None):
+    """Читает одно сообщение.
+
+    Args:
+        max_size: наибольшая допустимая длина данных; `None` - без
+            ограничения.
+
+    Returns:
+        tuple: (тип `MSG_*`, данные).
+
+    Raises:
+        asyncio.IncompleteReadError: соединение закрыто.
+        ValueError: длина в заголовке больше `max_size`; данные не
+            читаются.
+    """
+    kind, size = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if max_size is not None and size > max_size:
+        raise ValueError(f'Сообщение длиной {size} байт больше '
+                         f'допустимых {max_size}.')
+    return kind, await reader.readexactly(size) if size else b''
+
+
+class GameServer:
+    """Сервер комнат: одна задача тактов на все игры процесса.
+
+    Изменения такта кодируются один раз на комнату и пишутся в
+    транспорты всех её клиентов без ожидания. Клиент, у которого в
+    буфере отправки накопилось больше `MAX_WRITE_BUFFER` байт, отключается,
+    чтобы медленный клиент не задерживал остальных.
+
+    Атрибуты:
+        ticks (int): выполнено тактов.
+        late_ticks (int): тактов, начатых позже своего срока больше чем
+            на длину такта.
+    """
+
+    def __init__(self, tick_rate=DEFAULT_TICK_RATE, width=GRID_WIDTH,
+                 height=GRID_HEIGHT, max_players=MAX_PLAYERS, seed=None,
+                 stone_every=STONE_EVERY):
+        self.interval = 1 / tick_rate
+        self.width = width
+        self.height = height
+        self.max_players = max_players
+        self.stone_every = stone_every
+        self.rng = Random(seed)
+        self.games = {}
+        self.clients = {}
+        self.ticks = self.late_ticks = 0
+        self._server = None
+        self._ticker = None
+        self._handlers = set()
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """Открывает порт и запускает такты; возвращает адрес сервера."""
+        self._server = await asyncio.start_server(self.handle, host, port)
+        self._ticker = asyncio.create_task(self.run_ticks())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        """Останавливает такты и закрывает соединения."""
+        self._ticker.cancel()
+        self._server.close()
+        for task in self._handlers:
+            task.cancel()
+        await asyncio.gather(self._ticker, *self._handlers,
+                             return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def handle(self, reader, writer):
+        """Обслуживает одного клиента: вход в комнату и ввод."""
+        room = slot = None
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            kind, payload = await read_message(reader, MAX_CLIENT_MESSAGE)
+            if kind != MSG_JOIN:
+                return
+            room, = JOIN.unpack(payload)
+            game = self.games.get(room)
+            if game is None:
+                game = self.games[room] = MultiplayerGame(
+                    self.rng.getrandbits(64), self.width, self.height,
+                    self.max_players, self.stone_every,
+                )
+                self.clients[room] = {}
+            slot = game.join()
+            writer.write(frame(MSG_WELCOME, game.snapshot(slot)))
+            self.clients[room][slot] = writer
+            while True:
+                kind, payload = await read_message(reader,
+                                                   MAX_CLIENT_MESSAGE)
+                if kind == MSG_INPUT:
+                    game.submit(slot, *INPUT.unpack(payload))
+        except (asyncio.IncompleteReadError, ConnectionError, GameFull,
+                BoardFull, struct.error, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # Сервер останавливается (`stop`).
+            pass
+        finally:
+            self._handlers.discard(task)
+            self._disconnect(room, slot, writer)
+            writer.close()
+
+    def _disconnect(self, room, slot, writer):
+        """Убирает змейку клиента `writer`; пустая комната закрывается.
+
+        Если клиент уже отключён (например, тактом как медленный), а его
+        место занял другой, ничего не меняется.
+        """
+        clients = self.clients.get(room)
+        if clients is None or clients.get(slot) is not writer:
+            return
+        del clients[slot]
+        self.games[room].leave(slot)
+        if not clients:
+            del self.clients[room], self.games[room]
+
+    async def run_ticks(self):
+        """Продвигает все комнаты с постоянной частотой тактов."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            deadline += self.interval
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            if loop.time() - deadline > self.interval:
+                self.late_ticks += 1
+                deadline = loop.time()
+            self.tick()
+
+    def tick(self):
+        """Один такт всех комнат с рассылкой изменений."""
+        self.ticks += 1
+        for room, game in list(self.games.items()):
+            message = frame(MSG_DELTA, encode_delta(game.step()))
+            for slot, writer in list(self.clients[room].items()):
+                if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                    self._disconnect(room, slot, writer)
+                    writer.close()
+                else:
+                    writer.write(message)
+
+
+class LoadReport:
+    """Итоги нагрузочного прогона."""
+
+    def __init__(self, clients, seconds, deltas, received, intervals,
+                 desyncs, server=None):
+        self.clients = clients
+        self.seconds = seconds
+        self.deltas = deltas
+        self.received = received
+        self.intervals = sorted(intervals)
+        self.desyncs = desyncs
+        self.server = server
+
+    def interval_percentile(self, fraction):
+        """Перцентиль интервала между изменениями у клиента, мс."""
+        if not self.intervals:
+            return 0.0
+        return self.intervals[int((len(self.intervals) - 1) * fraction)]
+
+    def __str__(self):
+        """Краткая сводка для печати."""
+        per_delta = self.received / self.deltas if self.deltas else 0.0
+        text = (f'{self.clients} клиентов за {self.seconds:.1f} с: '
+                f'{self.deltas} изменений, {per_delta:.1f} байт на '
+                f'изменение, интервал p50 '
+                f'{self.interval_percentile(0.5):.1f} / p99 '
+                f'{self.interval_percentile(0.99):.1f} мс, '
+                f'рассинхронизаций {self.desyncs}')
+        if self.server is not None:
+            text += (f'; сервер: {self.server.ticks} тактов, '
+                     f'опоздало {self.server.late_ticks}')
+        return text
+
+
+async def play_client(host, port, room, seconds, seed=None, stats=None):
+    """Клиент нагрузочного теста: случайный ввод на следующий такт.
+
+    Собирает копию поля `BoardMirror` и добавляет в словарь `stats`
+    число изменений, байты, интервалы между изменениями (мс) и
+    рассинхронизации.
+    """
+    rng = Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(frame(MSG_JOIN, JOIN.pack(room)))
+        kind, payload = await read_message(reader)
+        if kind != MSG_WELCOME:
+            return
+        mirror = BoardMirror(payload)
+        finish = perf_counter() + seconds
+        last = None
+        while perf_counter() < finish:
+            kind, payload = await read_message(reader)
+            if kind != MSG_DELTA:
+                continue
+            now = perf_counter()
+            mirror.apply(decode_delta(payload))
+            stats['deltas'] += 1
+            stats['received'] += HEADER.size + len(payload)
+            if last is not None:
+                stats['intervals'].append((now - last) * 1000)
+            last = now
+            if rng.random() < 0.3:
+                writer.write(frame(MSG_INPUT, INPUT.pack(
+                    mirror.tick + 1, rng.randrange(len(DIRECTIONS))
+                )))
+        stats['desyncs'] += mirror.desyncs
+    except asyncio.IncompleteReadError:
+        pass
+    finally:
+        writer.close()
+
+
+async def load_test(games, players, seconds, host='127.0.0.1', port=None,
+                    seed=0, **server_options):
+    """Нагрузочный прогон: `games` комнат по `players` клиентов.
+
+    Если порт не задан, сервер запускается в этом же процессе на
+    свободном порту.
+
+    Returns:
+        LoadReport: итоги прогона.
+    """
+    server = None
+    if port is None:
+        server = GameServer(seed=seed, **server_options)
+        host, port = await server.start(host, 0)
+    stats = {'deltas': 0, 'received': 0, 'intervals': [], 'desyncs': 0}
+    start = perf_counter()
+    try:
+        await asyncio.gather(*(
+            play_client(host, port, room, seconds, seed + room * players
+                        + player, stats)
+            for room in range(games) for player in range(players)
+        ))
+    finally:
+        if server is not None:
+            await server.stop()
+    return LoadReport(games * players, perf_counter() - start,
+                      stats['deltas'], stats['received'], stats['intervals'],
+                      stats['desyncs'], server)
+
+
+async def serve(host, port, **server_options):
+    """Запускает сервер до прерывания."""
+    server = GameServer(**server_options)
+    host, port = await server.start(host, port)
+    print(f'Сервер слушает {host}:{port}')
+    await asyncio.Event().wait()
+
+
+def main():
+    """Запуск сервера или нагрузочного теста из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('mode', choices=('serve', 'load'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None,
+                        help='для load - адрес внешнего сервера')
+    parser.add_argument('--tick-rate', type=int, default=DEFAULT_TICK_RATE)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--stone-every', type=int, default=STONE_EVERY)
+    args = parser.parse_args()
+    options = {'tick_rate': args.tick_rate, 'stone_every': args.stone_every}
+    try:
+        if args.mode == 'serve':
+            asyncio.run(serve(args.host, args.port or DEFAULT_PORT,
+                              **options))
+        else:
+            print(asyncio.run(load_test(
+                args.games, args.players, args.seconds, args.host, args.port,
+                **options,
+            )))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
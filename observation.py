@@ -0,0 +1,227 @@
+"""
+Наблюдения для агентов: плоскости занятости поля на NumPy.
+
+`ObservationEncoder` держит заранее выделенные плоскости `uint8`
+формы `(len(PLANES), высота, ширина)`: тело, голова, яблоко, камни.
+После такта плоскости не строятся заново из `snake.positions` и
+`stone.positions`, а правятся по изменениям из `simulation.State`:
+новая голова, снятый хвост (`State.last`), новое место яблока и новые
+камни. Целиком плоскости пересобираются только в конце эпизода, когда
+змейка (и камни) сбрасываются.
+
+Наблюдение отдаётся как представление только для чтения поверх буферов
+кодировщика, без копирования: на следующем такте его содержимое
+изменится, и если наблюдение нужно сохранить, копию делает вызывающий.
+
+Режимы:
+- `crop=r` - эгоцентрическое окно `(2r+1) x (2r+1)` с головой в центре
+  (с переходом через край поля), собирается `np.take` в готовый буфер;
+- `stack=k` - последние `k` кадров формы `(k, ...)`. Кадры лежат в
+  кольцевом буфере двойной длины: кадр пишется в ячейки `i` и `i + k`,
+  поэтому последние `k` кадров всегда образуют непрерывный срез, и
+  стопка отдаётся представлением, без сборки.
+
+`SnakeEnv` оборачивает `SnakeSimulation` в API в стиле Gymnasium
+(`reset` / `step`). Пространства `observation_space` и `action_space`
+требуют установленного пакета `gymnasium`; остальное работает без него.
+"""
+
+import numpy as np
+
+from simulation import (DIRECTIONS, GRID_HEIGHT, GRID_WIDTH,
+                        SnakeSimulation)
+
+PLANES = ('body', 'head', 'apple', 'stones')
+PLANE_BODY, PLANE_HEAD, PLANE_APPLE, PLANE_STONES = range(len(PLANES))
+
+
+def read_only(array):
+    """Представление массива, запрещающее запись."""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class ObservationEncoder:
+    """Плоскости занятости поля, обновляемые по изменениям такта.
+
+    Атрибуты:
+        planes (ndarray[P, H, W]): текущие плоскости `PLANES`.
+        shape (tuple): форма наблюдения.
+    """
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, stack=1,
+                 crop=None):
+        self.width = width
+        self.height = height
+        self.stack = stack
+        self.crop = crop
+        self.planes = np.zeros((len(PLANES), height, width), dtype=np.uint8)
+        self._flat = self.planes.reshape(len(PLANES), -1)
+        self._head = self._apple = None
+        self._stones = 0
+        frame = self.planes.shape
+        if crop is not None:
+            size = 2 * crop + 1
+            frame = (len(PLANES), size, size)
+            offsets = np.arange(-crop, crop + 1)
+            self._crop_dy = offsets[:, None]
+            self._crop_dx = offsets[None, :]
+            self._crop_y = np.empty((size, 1), dtype=np.intp)
+            self._crop_x = np.empty((1, size), dtype=np.intp)
+            self._crop_cells = np.empty((size, size), dtype=np.intp)
+            self._window = np.empty(frame, dtype=np.uint8)
+        self.shape = frame if stack == 1 else (stack,) + frame
+        if stack > 1:
+            self._frames = np.zeros((2 * stack,) + frame, dtype=np.uint8)
+            self._views = [read_only(self._frames[slot + 1:slot + 1 + stack])
+                           for slot in range(stack)]
+            self._slot = stack - 1
+        else:
+            self._view = read_only(self.planes if crop is None
+                                   else self._window)
+
+    def reset(self, game):
+        """Строит плоскости заново по игре; кадры стопки заполняются
+        начальным кадром.
+        """
+        self._rebuild(game)
+        if self.stack > 1:
+            self._frames[:] = self._frame()
+        return self._observe()
+
+    def update(self, game, state, done=False):
+        """Правит плоскости по состоянию после такта и возвращает
+        наблюдение.
+        """
+        if done:
+            self._rebuild(game)
+        else:
+            self._apply(game, state)
+        return self._observe()
+
+    def _rebuild(self, game):
+        """Заполняет плоскости по полным спискам клеток игры."""
+        self.planes.fill(0)
+        body, head, apple, stones = self._flat
+        body[list(game.snake.positions)] = 1
+        self._head = game.snake.get_head_position()
+        head[self._head] = 1
+        self._apple = game.apple.position
+        if self._apple is not None:
+            apple[self._apple] = 1
+        stones[game.stone.positions] = 1
+        self._stones = len(game.stone.positions)
+
+    def _apply(self, game, state):
+        """Обновление по изменениям такта: O(число изменившихся клеток)."""
+        body, head, apple, stones = self._flat
+        head[self._head] = 0
+        head[state.head] = 1
+        body[state.head] = 1
+        self._head = state.head
+        if state.last is not None and not game.snake.positions.count(
+                state.last):
+            body[state.last] = 0
+        if state.apple != self._apple:
+            if self._apple is not None:
+                apple[self._apple] = 0
+            if state.apple is not None:
+                apple[state.apple] = 1
+            self._apple = state.apple
+        if state.stones != self._stones:
+            if state.stones < self._stones:
+                stones.fill(0)
+                self._stones = 0
+            stones[game.stone.positions[self._stones:]] = 1
+            self._stones = state.stones
+
+    def _frame(self):
+        """Текущий кадр: плоскости или окно вокруг головы."""
+        if self.crop is None:
+            return self.planes
+        row, column = divmod(self._head, self.width)
+        np.add(self._crop_dy, row, out=self._crop_y)
+        np.remainder(self._crop_y, self.height, out=self._crop_y)
+        np.multiply(self._crop_y, self.width, out=self._crop_y)
+        np.add(self._crop_dx, column, out=self._crop_x)
+        np.remainder(self._crop_x, self.width, out=self._crop_x)
+        np.add(self._crop_y, self._crop_x, out=self._crop_cells)
+        return np.take(self._flat, self._crop_cells, axis=1,
+                       out=self._window)
+
+    def _observe(self):
+        """Наблюдение только для чтения без копирования."""
+        if self.stack == 1:
+            if self.crop is not None:
+                self._frame()
+            return self._view
+        self._slot = (self._slot + 1) % self.stack
+        frame = self._frame()
+        self._frames[self._slot] = frame
+        self._frames[self._slot + self.stack] = frame
+        return self._views[self._slot]
+
+
+class SnakeEnv:
+    """Окружение в стиле Gymnasium поверх `SnakeSimulation`.
+
+    Действие - индекс направления в `DIRECTIONS`. Эпизод завершается
+    (`terminated`) гибелью змейки или заполнением поля и обрывается
+    (`truncated`) через `max_steps` тактов, если предел задан.
+    """
+
+    metadata = {'render_modes': []}
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, stack=1,
+                 crop=None, max_steps=None, seed=None):
+        self.width = width
+        self.height = height
+        self.max_steps = max_steps
+        self.encoder = ObservationEncoder(width, height, stack, crop)
+        self.game = None
+        self.steps = 0
+        self._seed = seed
+
+    @property
+    def observation_space(self):
+        """`gymnasium.spaces.Box` наблюдений (нужен `gymnasium`)."""
+        from gymnasium import spaces
+        return spaces.Box(0, 1, self.encoder.shape, np.uint8)
+
+    @property
+    def action_space(self):
+        """`gymnasium.spaces.Discrete` действий (нужен `gymnasium`)."""
+        from gymnasium import spaces
+        return spaces.Discrete(len(DIRECTIONS))
+
+    def reset(self, seed=None, options=None):
+        """Начинает эпизод; `seed` пересоздаёт игру с этим зерном.
+
+        Returns:
+            tuple: (наблюдение, словарь сведений).
+        """
+        if seed is not None or self.game is None:
+            self.game = SnakeSimulation(
+                seed=self._seed if seed is None else seed,
+                width=self.width, height=self.height,
+            )
+        else:
+            self.game.reset()
+        self.steps = 0
+        return self.encoder.reset(self.game), {'seed': self.game.seed}
+
+    def step(self, action):
+        """Выполняет такт.
+
+        Returns:
+            tuple: (наблюдение, награда, `terminated`, `truncated`,
+            сведения с длиной змейки и причиной окончания `OUTCOME_*`).
+        """
+        state, reward, done = self.game.step(action)
+        self.steps += 1
+        observation = self.encoder.update(self.game, state, done)
+        truncated = (not done and self.max_steps is not None
+                     and self.steps >= self.max_steps)
+        return (observation, reward, done, truncated,
+                {'length': state.length, 'outcome': self.game.outcome})
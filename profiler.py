@@ -0,0 +1,130 @@
+"""
+Профилировщик времени кадра.
+
+`FrameProfiler` замеряет, сколько времени занимает каждая фаза кадра
+(обработка ввода, ход змейки, столкновения, отрисовка, вывод на экран), и
+хранит замеры последних `capacity` кадров в заранее выделенных кольцевых
+буферах. Замер устроен как "круг": `lap(phase)` записывает время с
+предыдущего круга в текущий кадр, `end_frame()` фиксирует кадр.
+
+Когда профилирование выключено, используется `NULL_PROFILER` с пустыми
+методами, поэтому инструментированный код почти ничего не теряет.
+"""
+
+from array import array
+from time import perf_counter
+
+PHASES = ('input', 'move', 'collisions', 'draw', 'hud', 'display')
+FRAME = 'frame'
+DEFAULT_CAPACITY = 600
+
+
+class NullProfiler:
+    """Профилировщик-заглушка: все методы ничего не делают."""
+
+    enabled = False
+
+    def begin_frame(self):
+        """Ничего не делает."""
+
+    def lap(self, phase):
+        """Ничего не делает."""
+
+    def end_frame(self):
+        """Ничего не делает."""
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class FrameProfiler:
+    """Замеры фаз кадра в кольцевых буферах.
+
+    Атрибуты:
+        samples (dict[str, array]): миллисекунды по фазам и кадру целиком,
+            по `capacity` последних кадров.
+        frames (int): число зафиксированных кадров за всё время.
+    """
+
+    enabled = True
+
+    def __init__(self, phases=PHASES, capacity=DEFAULT_CAPACITY,
+                 clock=perf_counter):
+        self.phases = tuple(phases)
+        self.capacity = capacity
+        self.clock = clock
+        self.samples = {name: array('d', [0.0]) * capacity
+                        for name in self.phases + (FRAME,)}
+        self.frames = 0
+        self._current = dict.fromkeys(self.phases, 0.0)
+        self._frame_start = self._last = clock()
+
+    def begin_frame(self):
+        """Начинает новый кадр."""
+        self._frame_start = self._last = self.clock()
+
+    def lap(self, phase):
+        """Добавляет к фазе время, прошедшее с предыдущего круга."""
+        now = self.clock()
+        self._current[phase] += now - self._last
+        self._last = now
+
+    def end_frame(self):
+        """Фиксирует кадр в кольцевых буферах."""
+        slot = self.frames % self.capacity
+        samples = self.samples
+        current = self._current
+        for phase in self.phases:
+            samples[phase][slot] = current[phase] * 1000
+            current[phase] = 0.0
+        samples[FRAME][slot] = (self.clock() - self._frame_start) * 1000
+        self.frames += 1
+
+    def _recent(self, name):
+        """Замеры последних кадров в порядке записи."""
+        buffer = self.samples[name]
+        if self.frames <= self.capacity:
+            return buffer[:self.frames]
+        slot = self.frames % self.capacity
+        return buffer[slot:] + buffer[:slot]
+
+    def percentiles(self, name=FRAME):
+        """p50 и p99 (мс) по последним кадрам или `None`."""
+        values = sorted(self._recent(name))
+        if not values:
+            return None
+        last = len(values) - 1
+        return values[last // 2], values[last * 99 // 100]
+
+    def summary(self):
+        """p50/p99 по всем фазам и кадру целиком."""
+        return {name: self.percentiles(name)
+                for name in self.phases + (FRAME,)}
+
+    def dump(self, path):
+        """Сохраняет трассу последних кадров в CSV или JSON.
+
+        Формат выбирается по расширению файла: `.csv` - таблица с кадром
+        в каждой строке, иначе JSON со сводкой и замерами по фазам.
+        Модули `csv` и `json` импортируются здесь, чтобы не замедлять
+        импорт игровых модулей.
+        """
+        import csv
+        import json
+
+        names = self.phases + (FRAME,)
+        columns = [self._recent(name) for name in names]
+        path = str(path)
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(names)
+                writer.writerows(zip(*columns))
+            return
+        with open(path, 'w') as file:
+            json.dump({
+                'frames': self.frames,
+                'summary': self.summary(),
+                'samples': {name: list(column)
+                            for name, column in zip(names, columns)},
+            }, file)
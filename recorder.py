@@ -0,0 +1,357 @@
+"""
+Запись игры в GIF или файл сырых кадров без задержки игрового цикла.
+
+`Recorder.capture` вызывается в игровом цикле после отрисовки кадра и
+копирует из буфера поверхности (`Surface.get_buffer`, без промежуточных
+преобразований) только изменившиеся области - те же `dirty_rects`, что
+уходят на экран. Копия неизбежна: в следующем кадре игра перерисует ту же
+поверхность. Копии уходят в ограниченную очередь, а кодирование и запись
+на диск идут в фоновом потоке. Если кодировщик не успевает и очередь
+полна, кадр отбрасывается, а следующий записывается целиком, чтобы
+запись осталась согласованной.
+
+Форматы выбираются по расширению файла:
+- `.gif` - потоковый GIF: каждый кадр - прямоугольник, охватывающий
+  изменения, поверх предыдущих кадров; LZW-поток собирается из кодов
+  фиксированной ширины с помощью NumPy, без побайтового цикла Python;
+- иначе - файл сырых кадров `RAW_MAGIC`: заголовок (сигнатура, версия,
+  ширина, высота), затем записи кадров `RAW_FRAME` (время в секундах,
+  число областей) и областей `RAW_REGION` (x, y, ширина, высота) с
+  пикселями RGB.
+
+Работает и со скрытым окном (`SDL_VIDEODRIVER=dummy`).
+"""
+
+import struct
+import threading
+from queue import Full, Queue
+from time import perf_counter
+
+import numpy as np
+
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_FPS = 15
+POLL_SECONDS = 0.1
+
+RAW_MAGIC = b'SNKV'
+RAW_VERSION = 1
+RAW_HEADER = struct.Struct('<4sBxHH')
+RAW_FRAME = struct.Struct('<dH')
+RAW_REGION = struct.Struct('<HHHH')
+
+GIF_CODE_SIZE = 8
+GIF_CLEAR = 1 << GIF_CODE_SIZE
+GIF_END = GIF_CLEAR + 1
+GIF_CODE_BITS = GIF_CODE_SIZE + 1
+# Коды без сжатия: после `GIF_RUN` литералов словарь декодера
+# сбрасывается, чтобы ширина кода не выросла больше 9 бит.
+GIF_RUN = 250
+GIF_BLOCK = 255
+GIF_MIN_DELAY = 2
+GIF_CUBE = 216
+GIF_TRANSPARENT = 255
+GIF_MAX_COLORS = GIF_TRANSPARENT - GIF_CUBE
+
+
+def rgb_palette(colors=()):
+    """Палитра GIF: куб 6x6x6, затем точные цвета `colors`.
+
+    Последний индекс `GIF_TRANSPARENT` оставлен под прозрачность, поэтому
+    точных цветов не больше `GIF_MAX_COLORS`.
+
+    Returns:
+        ndarray[256, 3]: цвета палитры.
+    """
+    levels = np.arange(6, dtype=np.uint8) * 51
+    cube = np.stack(np.meshgrid(levels, levels, levels, indexing='ij'),
+                    axis=-1).reshape(-1, 3)
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    palette[:GIF_CUBE] = cube
+    colors = unique_colors(colors)
+    if colors:
+        palette[GIF_CUBE:GIF_CUBE + len(colors)] = colors
+    return palette
+
+
+def unique_colors(colors):
+    """Первые `GIF_MAX_COLORS` различных цветов."""
+    return list(dict.fromkeys(tuple(color) for color in colors))[
+        :GIF_MAX_COLORS]
+
+
+class GifEncoder:
+    """Потоковый кодировщик GIF.
+
+    Кадр записывается, когда приходит следующий: только тогда известно,
+    сколько он показывался на экране.
+    """
+
+    def __init__(self, path, size, colors=()):
+        self.size = size
+        self.palette = rgb_palette(colors)
+        self._exact = {color: GIF_CUBE + index
+                       for index, color in enumerate(unique_colors(colors))}
+        self._file = open(path, 'wb')
+        self._pending = None
+        width, height = size
+        self._file.write(
+            b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, 0, 0)
+            + self.palette.tobytes()
+            + b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00'
+        )
+
+    def write(self, timestamp, regions):
+        """Принимает кадр: время и список областей `(x, y, пиксели RGB)`."""
+        if self._pending is not None:
+            self._write_frame(*self._pending, timestamp)
+        self._pending = (timestamp, regions)
+
+    def close(self):
+        """Дописывает последний кадр и закрывает файл."""
+        if self._pending is not None:
+            timestamp = self._pending[0]
+            self._write_frame(*self._pending, timestamp + 1 / DEFAULT_FPS)
+            self._pending = None
+        self._file.write(b'\x3b')
+        self._file.close()
+
+    def _write_frame(self, timestamp, regions, until):
+        """Пишет кадр как один прямоугольник, охватывающий все области."""
+        left = min(x for x, _, _ in regions)
+        top = min(y for _, y, _ in regions)
+        right = max(x + pixels.shape[1] for x, _, pixels in regions)
+        bottom = max(y + pixels.shape[0] for _, y, pixels in regions)
+        if len(regions) == 1:
+            image = regions[0][2]
+        else:
+            image = np.zeros((bottom - top, right - left, 3), dtype=np.uint8)
+            for x, y, pixels in regions:
+                height, width = pixels.shape[:2]
+                image[y - top:y - top + height,
+                      x - left:x - left + width] = pixels
+            # Пиксели между областями не менялись: берём их из прошлого
+            # кадра, сделав прозрачными.
+            covered = np.zeros(image.shape[:2], dtype=bool)
+            for x, y, pixels in regions:
+                height, width = pixels.shape[:2]
+                covered[y - top:y - top + height,
+                        x - left:x - left + width] = True
+        indices = self._indices(image)
+        transparent = 0
+        if len(regions) > 1:
+            transparent = 1
+            indices[~covered] = GIF_TRANSPARENT
+        delay = max(GIF_MIN_DELAY, round((until - timestamp) * 100))
+        self._file.write(
+            struct.pack('<BBBBHBB', 0x21, 0xF9, 4, 0x04 | transparent,
+                        delay, GIF_TRANSPARENT, 0)
+            + struct.pack('<BHHHHB', 0x2C, left, top, right - left,
+                          bottom - top, 0)
+            + bytes((GIF_CODE_SIZE,)) + _lzw_blocks(indices.ravel())
+        )
+
+    def _indices(self, image):
+        """Индексы палитры: точные цвета игры или ближайший цвет куба."""
+        scaled = (image.astype(np.uint16) * 5 + 127) // 255
+        indices = (scaled[..., 0] * 36 + scaled[..., 1] * 6
+                   + scaled[..., 2]).astype(np.uint8)
+        for color, index in self._exact.items():
+            indices[(image == color).all(axis=-1)] = index
+        return indices
+
+
+def _lzw_blocks(indices):
+    """LZW-поток GIF из литералов фиксированной ширины, по блокам."""
+    count = len(indices)
+    runs = -(-count // GIF_RUN)
+    codes = np.full(count + runs + 1, GIF_CLEAR, dtype=np.uint16)
+    positions = np.arange(count)
+    codes[positions + positions // GIF_RUN + 1] = indices
+    codes[-1] = GIF_END
+    bits = (codes[:, None] >> np.arange(GIF_CODE_BITS)) & 1
+    data = np.packbits(bits.astype(np.uint8).ravel(),
+                       bitorder='little').tobytes()
+    blocks = [bytes((len(data[start:start + GIF_BLOCK]),))
+              + data[start:start + GIF_BLOCK]
+              for start in range(0, len(data), GIF_BLOCK)]
+    return b''.join(blocks) + b'\x00'
+
+
+class RawEncoder:
+    """Файл сырых кадров: области изменений с пикселями RGB."""
+
+    def __init__(self, path, size, colors=()):
+        self.size = size
+        self._file = open(path, 'wb')
+        self._file.write(RAW_HEADER.pack(RAW_MAGIC, RAW_VERSION, *size))
+
+    def write(self, timestamp, regions):
+        """Записывает кадр."""
+        chunks = [RAW_FRAME.pack(timestamp, len(regions))]
+        for x, y, pixels in regions:
+            height, width = pixels.shape[:2]
+            chunks.append(RAW_REGION.pack(x, y, width, height))
+            chunks.append(pixels.tobytes())
+        self._file.write(b''.join(chunks))
+
+    def close(self):
+        """Закрывает файл."""
+        self._file.close()
+
+
+def read_raw(path):
+    """Читает файл сырых кадров.
+
+    Returns:
+        tuple: (ширина, высота, список кадров `(время, области)`).
+
+    Raises:
+        ValueError: файл не является файлом сырых кадров.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    magic, version, width, height = RAW_HEADER.unpack_from(data)
+    if magic != RAW_MAGIC or version != RAW_VERSION:
+        raise ValueError('Неизвестный формат файла кадров.')
+    offset = RAW_HEADER.size
+    frames = []
+    while offset < len(data):
+        timestamp, count = RAW_FRAME.unpack_from(data, offset)
+        offset += RAW_FRAME.size
+        regions = []
+        for _ in range(count):
+            x, y, region_width, region_height = RAW_REGION.unpack_from(
+                data, offset
+            )
+            offset += RAW_REGION.size
+            size = region_width * region_height * 3
+            pixels = np.frombuffer(data, np.uint8, size, offset).reshape(
+                region_height, region_width, 3
+            )
+            offset += size
+            regions.append((x, y, pixels))
+        frames.append((timestamp, regions))
+    return width, height, frames
+
+
+class Recorder:
+    """Захват кадров поверхности с кодированием в фоновом потоке.
+
+    Атрибуты:
+        captured (int): кадров поставлено в очередь.
+        dropped (int): кадров отброшено из-за переполненной очереди.
+        written (int): кадров записано кодировщиком.
+        error (Exception | None): ошибка кодировщика; после неё кадры
+            больше не снимаются, а `close` её поднимает.
+    """
+
+    def __init__(self, path, size, colors=(), fps=DEFAULT_FPS,
+                 queue_size=DEFAULT_QUEUE_SIZE, clock=perf_counter):
+        encoder_cls = GifEncoder if str(path).endswith('.gif') else RawEncoder
+        self.encoder = encoder_cls(path, size, colors)
+        self.size = size
+        self.interval = 1 / fps if fps else 0.0
+        self.clock = clock
+        self.captured = self.dropped = self.written = 0
+        self.error = None
+        self._queue = Queue(queue_size)
+        self._pending = []
+        self._keyframe = True
+        self._last = None
+        self._start = clock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def capture(self, surface, rects=()):
+        """Снимает изменившиеся области кадра.
+
+        Области копятся до очередного снимка (не чаще `fps` раз в
+        секунду). Возвращает `True`, если снимок поставлен в очередь.
+        """
+        if self.error is not None:
+            return False
+        self._pending.extend(rects)
+        now = self.clock()
+        if self._last is not None and now - self._last < self.interval:
+            return False
+        if not self._pending and not self._keyframe:
+            return False
+        if self._queue.full():
+            self.dropped += 1
+            self._keyframe = True
+            return False
+        if self._keyframe:
+            rects = [surface.get_rect()]
+        else:
+            bounds = surface.get_rect()
+            rects = [rect.clip(bounds) for rect in self._pending]
+        self._pending = []
+        self._last = now
+        regions = self._copy_regions(surface, rects)
+        channels = [shift // 8 for shift in surface.get_shifts()[:3]]
+        try:
+            self._queue.put_nowait((now - self._start, regions, channels))
+        except Full:
+            self.dropped += 1
+            self._keyframe = True
+            return False
+        self._keyframe = False
+        self.captured += 1
+        return True
+
+    @staticmethod
+    def _copy_regions(surface, rects):
+        """Копирует области из буфера поверхности (32 бита на пиксель).
+
+        Копируются пиксели как есть, в формате поверхности; порядок
+        каналов меняет фоновый поток. Представление буфера отпускается
+        сразу после копирования, снимая блокировку поверхности.
+        """
+        width, height = surface.get_size()
+        buffer = surface.get_buffer()
+        pixels = np.frombuffer(buffer, np.uint8).reshape(
+            height, surface.get_pitch()
+        )[:, :width * 4].reshape(height, width, 4)
+        regions = [(rect.x, rect.y,
+                    pixels[rect.top:rect.bottom, rect.left:rect.right].copy())
+                   for rect in rects if rect.width and rect.height]
+        del pixels, buffer
+        return regions
+
+    def _run(self):
+        """Фоновый поток: кодирует и пишет кадры из очереди.
+
+        После ошибки кодировщика поток сохраняет её в `error` и только
+        разбирает очередь, чтобы `close` не ждал места в ней вечно.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            timestamp, regions, channels = item
+            if regions and self.error is None:
+                try:
+                    self.encoder.write(timestamp, [
+                        (x, y, pixels[..., channels])
+                        for x, y, pixels in regions
+                    ])
+                except Exception as error:
+                    self.error = error
+                else:
+                    self.written += 1
+
+    def close(self):
+        """Дожидается записи очереди и закрывает файл.
+
+        Raises:
+            RuntimeError: кодировщик не смог записать кадры.
+        """
+        while self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=POLL_SECONDS)
+            except Full:
+                continue
+            self._thread.join()
+        self.encoder.close()
+        if self.error is not None:
+            raise RuntimeError('Не удалось записать кадры.') from self.error
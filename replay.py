@@ -0,0 +1,184 @@
+"""
+Компактные записи игр и их воспроизведение.
+
+Запись хранит только то, что нужно для детерминированного повтора игры:
+зерно генератора, размер поля, стены уровня, шаг появления камней и
+поток действий по 2 бита на такт (индекс направления в `DIRECTIONS`).
+В заголовок также пишется контрольная сумма финального состояния, по
+которой повтор сверяется с живой игрой.
+
+Формат файла (little-endian):
+    заголовок `REPLAY_HEADER` - сигнатура, версия, ширина и высота поля,
+    зерно, число тактов, CRC32 финального состояния, шаг появления камней,
+    длина текста уровня;
+    текст уровня в UTF-8 (`levels.format_level`, пусто - поле без стен);
+    далее упакованные действия, по 4 такта в байте (младшие биты первыми).
+"""
+
+import struct
+import zlib
+from array import array
+
+from levels import Level, format_level, parse_level
+from simulation import GRID_HEIGHT, GRID_WIDTH, STONE_EVERY, SnakeSimulation
+
+REPLAY_MAGIC = b'SNKR'
+REPLAY_VERSION = 4
+REPLAY_HEADER = struct.Struct('<4sBxHHQIIHI')
+ACTIONS_PER_BYTE = 4
+
+
+def state_digest(game):
+    """CRC32 полного состояния игры: змейки, яблока, камней и счётчиков."""
+    snake = game.snake
+    cells = array('i', snake.positions)
+    cells.extend(game.stone.positions)
+    apple = game.apple.position
+    header = struct.pack('<IIiB', game.ticks, snake.length,
+                         -1 if apple is None else apple,
+                         game.last_action or 0)
+    return zlib.crc32(cells.tobytes(), zlib.crc32(header))
+
+
+def game_level(game):
+    """Уровень игры (`levels.Level`) по её стенам или `None`."""
+    stone = game.stone
+    if not stone.walls:
+        return None
+    return Level(game.width, game.height, stone.positions[:stone.walls])
+
+
+class Replay:
+    """Запись одной игры: зерно, размер поля, уровень, шаг появления
+    камней и упакованные действия.
+    """
+
+    __slots__ = ('seed', 'width', 'height', 'digest', 'level',
+                 'stone_every', '_packed', '_length')
+
+    def __init__(self, seed, width=GRID_WIDTH, height=GRID_HEIGHT,
+                 digest=0, level=None, stone_every=STONE_EVERY):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.digest = digest
+        self.level = level
+        self.stone_every = stone_every
+        self._packed = array('B')
+        self._length = 0
+
+    def append(self, action):
+        """Добавляет действие такта (индекс направления 0..3)."""
+        index, slot = divmod(self._length, ACTIONS_PER_BYTE)
+        if not slot:
+            self._packed.append(0)
+        self._packed[index] |= (action & 0b11) << (slot * 2)
+        self._length += 1
+
+    def __len__(self):
+        """Число записанных тактов."""
+        return self._length
+
+    def __iter__(self):
+        """Распакованные действия по порядку."""
+        length = self._length
+        tick = 0
+        for byte in self._packed:
+            for shift in (0, 2, 4, 6):
+                if tick == length:
+                    return
+                yield (byte >> shift) & 0b11
+                tick += 1
+
+    def to_bytes(self):
+        """Сериализует запись."""
+        level = (b'' if self.level is None
+                 else format_level(self.level).encode('utf-8'))
+        return REPLAY_HEADER.pack(
+            REPLAY_MAGIC, REPLAY_VERSION, self.width, self.height,
+            self.seed, self._length, self.digest, self.stone_every,
+            len(level),
+        ) + level + self._packed.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Восстанавливает запись из байтов.
+
+        Raises:
+            ValueError: данные не являются записью поддерживаемой версии.
+        """
+        (magic, version, width, height, seed, length, digest, stone_every,
+         level_size) = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError('Неизвестный формат записи игры.')
+        actions = REPLAY_HEADER.size + level_size
+        level = None
+        if level_size:
+            level = parse_level(
+                data[REPLAY_HEADER.size:actions].decode('utf-8')
+            )
+            if (level.width, level.height) != (width, height):
+                raise ValueError('Размер уровня не совпадает с записью.')
+        replay = cls(seed, width, height, digest, level, stone_every)
+        replay._packed.frombytes(data[actions:])
+        if len(replay._packed) * ACTIONS_PER_BYTE < length:
+            raise ValueError('Запись игры обрезана.')
+        replay._length = length
+        return replay
+
+    def save(self, path):
+        """Записывает запись в файл."""
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        """Читает запись из файла."""
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+
+class ReplayRecorder:
+    """Ведёт запись живой игры `SnakeSimulation`.
+
+    Вызывается после каждого такта и сохраняет направление, с которым
+    змейка фактически сделала ход.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.replay = Replay(game.seed, game.width, game.height,
+                             level=game_level(game),
+                             stone_every=game.stone.every)
+
+    def record(self):
+        """Записывает только что выполненный такт."""
+        self.replay.append(self.game.last_action)
+
+    def finish(self):
+        """Фиксирует контрольную сумму состояния и возвращает запись."""
+        self.replay.digest = state_digest(self.game)
+        return self.replay
+
+
+def fast_forward(replay, simulation_cls=SnakeSimulation):
+    """Проигрывает запись через безголовые правила с полной скоростью.
+
+    Игра создаётся на поле того же размера, с теми же стенами и шагом
+    появления камней, что и в записи.
+
+    Returns:
+        SnakeSimulation: игра в состоянии после последнего такта.
+    """
+    game = simulation_cls(seed=replay.seed, width=replay.width,
+                          height=replay.height, level=replay.level,
+                          stone_every=replay.stone_every)
+    step = game.step
+    for action in replay:
+        step(action)
+    return game
+
+
+def verify(replay):
+    """Проверяет, что повтор совпадает с живой игрой бит в бит."""
+    return state_digest(fast_forward(replay)) == replay.digest
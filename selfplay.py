@@ -0,0 +1,266 @@
+"""
+Ферма самостоятельной игры: много независимых игр на всех ядрах.
+
+Эпизоды раздаются пулом процессов. Каждый процесс гоняет безголовые
+правила `SnakeSimulation` под заданной политикой и пишет результаты
+прямо в общие буферы `multiprocessing.shared_memory`, без сериализации
+списков кортежей:
+
+- результаты: по `len(RESULT_FIELDS)` целых int32 на эпизод
+  (очки, такты, причина окончания `OUTCOME_*` или `OUTCOME_TIMEOUT`);
+- доски (по желанию): по байту на клетку поля на эпизод, коды `CELL_*`,
+  состояние перед последним тактом эпизода.
+
+Зерно эпизода равно `seed + номер эпизода`, поэтому результаты не
+зависят от числа процессов.
+
+Запуск: `python selfplay.py --episodes 10000 --workers 4 --scaling`.
+"""
+
+import argparse
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter
+
+from simulation import (DIRECTIONS, GRID_HEIGHT, GRID_WIDTH, OPPOSITE,
+                        OUTCOME_WALL_HIT, SnakeSimulation)
+
+RESULT_FIELDS = ('score', 'ticks', 'outcome')
+OUTCOME_TIMEOUT = OUTCOME_WALL_HIT + 1
+DEFAULT_MAX_TICKS = 10_000
+CELLS = GRID_WIDTH * GRID_HEIGHT
+
+CELL_EMPTY = 0
+CELL_BODY = 1
+CELL_HEAD = 2
+CELL_APPLE = 3
+CELL_STONE = 4
+
+
+def random_policy(game):
+    """Случайное направление на каждом такте."""
+    return game.rng.randrange(len(DIRECTIONS))
+
+
+def greedy_policy(game):
+    """Кратчайший по тору шаг к яблоку, избегая занятых клеток."""
+    snake = game.snake
+    width, height = snake.width, snake.height
+    apple_y, apple_x = divmod(game.apple.position, width)
+    blocked = OPPOSITE[snake.direction]
+    best, best_distance = None, None
+    for index, direction in enumerate(DIRECTIONS):
+        if direction == blocked:
+            continue
+        cell = snake.next_cell(direction)
+        if cell in snake.positions or cell in game.stone:
+            continue
+        y, x = divmod(cell, width)
+        distance_x = abs(x - apple_x)
+        distance_y = abs(y - apple_y)
+        distance = (min(distance_x, width - distance_x)
+                    + min(distance_y, height - distance_y))
+        if best_distance is None or distance < best_distance:
+            best, best_distance = index, distance
+    return best
+
+
+def encode_board(body, apple, stones, buffer, offset):
+    """Записывает доску в буфер побайтно, начиная с `offset`.
+
+    Клетки игры уже являются индексами `y * GRID_WIDTH + x`, поэтому
+    пишутся в буфер без преобразований.
+    """
+    buffer[offset:offset + CELLS] = bytes(CELLS)
+    for position in stones:
+        buffer[offset + position] = CELL_STONE
+    if apple is not None:
+        buffer[offset + apple] = CELL_APPLE
+    for position in body:
+        buffer[offset + position] = CELL_BODY
+    buffer[offset + body[0]] = CELL_HEAD
+
+
+def play_episode(game, policy, max_ticks=DEFAULT_MAX_TICKS,
+                 keep_board=False):
+    """Играет один эпизод до смерти змейки или `max_ticks` тактов.
+
+    Args:
+        keep_board: перед каждым тактом копировать тело, яблоко и камни,
+            чтобы вернуть доску перед последним тактом.
+
+    Returns:
+        tuple: (очки, такты, причина окончания, доска) - доска
+        `(тело, яблоко, камни)` из кортежей, как она была перед последним
+        тактом, до его хода и сброса игры, или `None` без `keep_board`.
+    """
+    step, snake, apple, stone = game.step, game.snake, game.apple, game.stone
+    score = 0
+    board = None
+    for tick in range(1, max_ticks + 1):
+        if keep_board:
+            board = (tuple(snake.positions), apple.position,
+                     tuple(stone.positions))
+        _, reward, done = step(policy(game))
+        if reward > 0:
+            score += 1
+        if done:
+            return score, tick, game.outcome, board
+    return score, max_ticks, OUTCOME_TIMEOUT, board
+
+
+def _play_chunk(results_name, boards_name, first, count, seed, policy,
+                max_ticks):
+    """Играет эпизоды `first..first+count-1` и пишет итоги в общую память."""
+    results = SharedMemory(name=results_name)
+    boards = SharedMemory(name=boards_name) if boards_name else None
+    rows = results.buf.cast('i')
+    width = len(RESULT_FIELDS)
+    try:
+        for episode in range(first, first + count):
+            game = SnakeSimulation(seed=seed + episode)
+            score, ticks, outcome, board = play_episode(
+                game, policy, max_ticks, boards is not None
+            )
+            rows[episode * width] = score
+            rows[episode * width + 1] = ticks
+            rows[episode * width + 2] = outcome
+            if boards is not None:
+                encode_board(*board, boards.buf, episode * CELLS)
+    finally:
+        rows.release()
+        results.close()
+        if boards is not None:
+            boards.close()
+
+
+class FarmReport:
+    """Итоги прогона фермы."""
+
+    def __init__(self, results, seconds, workers, boards=None):
+        width = len(RESULT_FIELDS)
+        self.episodes = len(results) // width
+        self.seconds = seconds
+        self.workers = workers
+        self.scores = results[0::width]
+        self.ticks = results[1::width]
+        self.outcomes = Counter(results[2::width])
+        self.boards = boards
+
+    @property
+    def games_per_second(self):
+        """Сыграно эпизодов в секунду."""
+        return self.episodes / self.seconds if self.seconds else 0.0
+
+    def score_distribution(self):
+        """Число эпизодов по количеству очков."""
+        return Counter(self.scores)
+
+    def percentile(self, fraction):
+        """Перцентиль очков, `fraction` от 0 до 1."""
+        ordered = sorted(self.scores)
+        return ordered[int((len(ordered) - 1) * fraction)] if ordered else 0
+
+    def board(self, episode):
+        """Доска эпизода (байты с кодами `CELL_*`) или `None`."""
+        if self.boards is None:
+            return None
+        return self.boards[episode * CELLS:(episode + 1) * CELLS]
+
+    def __str__(self):
+        """Краткая сводка для печати."""
+        mean = sum(self.scores) / self.episodes if self.episodes else 0.0
+        return (f'{self.episodes} игр за {self.seconds:.2f} с '
+                f'({self.games_per_second:.0f} игр/с, {self.workers} проц.); '
+                f'очки: среднее {mean:.2f}, p50 {self.percentile(0.5)}, '
+                f'p99 {self.percentile(0.99)}, '
+                f'max {max(self.scores, default=0)}')
+
+
+def run_farm(episodes, workers=None, policy=greedy_policy, seed=0,
+             max_ticks=DEFAULT_MAX_TICKS, keep_boards=False):
+    """Играет `episodes` эпизодов в пуле из `workers` процессов.
+
+    Политика - функция `policy(game) -> индекс направления или None`,
+    доступная для импорта в дочерних процессах.
+    """
+    workers = workers or os.cpu_count() or 1
+    width = len(RESULT_FIELDS)
+    results = SharedMemory(create=True, size=max(1, episodes * width * 4))
+    boards = (SharedMemory(create=True, size=max(1, episodes * CELLS))
+              if keep_boards else None)
+    chunk = max(1, episodes // (workers * 8))
+    try:
+        start = perf_counter()
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [
+                pool.submit(_play_chunk, results.name,
+                            boards.name if boards else None, first,
+                            min(chunk, episodes - first), seed, policy,
+                            max_ticks)
+                for first in range(0, episodes, chunk)
+            ]
+            for future in futures:
+                future.result()
+        seconds = perf_counter() - start
+        rows = results.buf.cast('i')
+        values = rows[:episodes * width].tolist()
+        rows.release()
+        return FarmReport(values, seconds, workers,
+                          bytes(boards.buf[:episodes * CELLS])
+                          if boards else None)
+    finally:
+        results.close()
+        results.unlink()
+        if boards is not None:
+            boards.close()
+            boards.unlink()
+
+
+def measure_scaling(episodes, max_workers=None, **farm_options):
+    """Скорость фермы при 1, 2, 4, ... процессах.
+
+    Returns:
+        list[tuple]: (процессы, игр в секунду, эффективность относительно
+        линейного роста от одного процесса).
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    rows = []
+    for workers in counts:
+        rate = run_farm(episodes, workers, **farm_options).games_per_second
+        base = rows[0][1] if rows else rate
+        rows.append((workers, rate, rate / (workers * base)))
+    return rows
+
+
+def main():
+    """Запуск фермы из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--episodes', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-ticks', type=int, default=DEFAULT_MAX_TICKS)
+    parser.add_argument('--policy', choices=('greedy', 'random'),
+                        default='greedy')
+    parser.add_argument('--scaling', action='store_true',
+                        help='замерить масштабирование от 1 до N процессов')
+    args = parser.parse_args()
+    policy = greedy_policy if args.policy == 'greedy' else random_policy
+    options = dict(policy=policy, seed=args.seed, max_ticks=args.max_ticks)
+    print(run_farm(args.episodes, args.workers, **options))
+    if args.scaling:
+        for workers, rate, efficiency in measure_scaling(
+                args.episodes, args.workers, **options):
+            print(f'{workers:>3} проц.: {rate:8.0f} игр/с, '
+                  f'эффективность {efficiency:.0%}')
+
+
+if __name__ == '__main__':
+    main()
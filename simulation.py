@@ -0,0 +1,956 @@
+"""
+Безголовое ядро игры "Змейка".
+
+Модуль содержит игровые правила без какой-либо зависимости от Pygame:
+константы поля, модели игровых объектов и движок `SnakeSimulation`,
+который принимает действие и возвращает новое состояние, награду и флаг
+окончания эпизода. Графический интерфейс из модуля `the_snake` является
+тонкой надстройкой над этим движком.
+
+Клетка поля в модели - одно целое число `y * width + x` (см. `to_cell`);
+в пиксели клетки переводит только отрисовка.
+"""
+
+import struct
+from collections import Counter, deque, namedtuple
+from random import Random
+from time import perf_counter
+
+from profiler import NULL_PROFILER
+
+SCREEN_WIDTH, SCREEN_HEIGHT = 640, 480
+GRID_SIZE = 20
+GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
+GRID_HEIGHT = SCREEN_HEIGHT // GRID_SIZE
+CENTER_POSTITON = GRID_HEIGHT // 2 * GRID_WIDTH + GRID_WIDTH // 2
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+OPPOSITE = {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}
+STONE_EVERY = 5
+SELF_HIT_FROM = 4
+DIRECTION_INDEX = {direction: index
+                   for index, direction in enumerate(DIRECTIONS)}
+
+CHUNK_SIZE = 64
+DENSE_BOARD_LIMIT = 1 << 16
+RANDOM_PROBES = 64
+
+REWARD_APPLE = 1
+REWARD_DEATH = -1
+
+OUTCOME_NONE = 0
+OUTCOME_SELF_HIT = 1
+OUTCOME_STONE_HIT = 2
+OUTCOME_BOARD_FULL = 3
+OUTCOME_WALL_HIT = 4
+
+OBSTACLE_NONE = 0
+OBSTACLE_STONE = 1
+OBSTACLE_WALL = 2
+
+NO_CELL = -1
+SNAPSHOT_HEADER = struct.Struct('<7q')
+
+
+class BoardFull(Exception):
+    """На поле не осталось свободных клеток."""
+
+
+def to_cell(x, y, width=GRID_WIDTH):
+    """Индекс клетки по её столбцу `x` и строке `y`."""
+    return y * width + x
+
+
+class FreeCells:
+    """Индекс свободных клеток поля.
+
+    Свободные клетки хранятся в списке, а место каждой клетки в нём - в
+    списке `_index` (-1 для занятых), поэтому выбор случайной свободной
+    клетки, занятие и освобождение клетки выполняются за O(1) (удаление -
+    перестановкой с последним элементом). Занятость считается по ссылкам:
+    клетка освобождается, когда её покинули все объекты.
+
+    Клетки из `reserved` (по умолчанию центр поля) никогда не становятся
+    свободными. Случайный выбор идёт через генератор `rng`
+    (`random.Random`), общий для всей игры.
+
+    Индекс хранит все клетки поля, поэтому подходит для полей обычного
+    размера; для больших полей используется `ChunkedCells`.
+    """
+
+    __slots__ = ('_cells', '_index', '_taken', 'rng', 'width', 'height',
+                 'center')
+
+    def __init__(self, occupied=(), reserved=None, rng=None,
+                 width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.rng = rng if rng is not None else Random()
+        self.width = width
+        self.height = height
+        self.center = board_center(width, height)
+        self._cells = list(range(width * height))
+        self._index = list(self._cells)
+        self._taken = [0] * (width * height)
+        for position in (self.center,) if reserved is None else reserved:
+            self.occupy(position)
+        for position in occupied:
+            self.occupy(position)
+
+    def __len__(self):
+        """Число свободных клеток."""
+        return len(self._cells)
+
+    def __contains__(self, position):
+        """Проверяет, свободна ли клетка."""
+        return self._index[position] >= 0
+
+    def occupy(self, position):
+        """Отмечает клетку занятой ещё одним объектом."""
+        taken = self._taken[position]
+        self._taken[position] = taken + 1
+        if taken:
+            return
+        index = self._index[position]
+        self._index[position] = -1
+        last = self._cells.pop()
+        if index < len(self._cells):
+            self._cells[index] = last
+            self._index[last] = index
+
+    def release(self, position):
+        """Снимает одну отметку занятости с клетки."""
+        taken = self._taken[position] - 1
+        self._taken[position] = taken
+        if taken:
+            return
+        self._index[position] = len(self._cells)
+        self._cells.append(position)
+
+    def choice(self):
+        """Случайная свободная клетка.
+
+        Raises:
+            BoardFull: свободных клеток нет.
+        """
+        if not self._cells:
+            raise BoardFull('На поле не осталось свободных клеток.')
+        return self.rng.choice(self._cells)
+
+
+class ChunkedCells:
+    """Разреженный индекс занятых клеток для больших полей.
+
+    Поле делится на квадратные блоки `CHUNK_SIZE` x `CHUNK_SIZE`. Занятость
+    блока хранится битовой маской (`bytearray`, бит на клетку); маска
+    создаётся при первом занятии клетки блока и удаляется, когда блок
+    освобождается. Память растёт с числом занятых блоков, а не с площадью
+    поля. Повторные занятия одной клетки учитываются в отдельном
+    счётчике.
+
+    Случайная свободная клетка ищется пробами (`RANDOM_PROBES` попыток),
+    что на разреженном поле занимает O(1); если все пробы попали в занятые
+    клетки, перебираются блоки в случайном порядке.
+
+    Интерфейс совпадает с `FreeCells`.
+    """
+
+    __slots__ = ('rng', 'width', 'height', 'center', 'occupied', '_chunks',
+                 '_counts', '_extra')
+
+    def __init__(self, occupied=(), reserved=None, rng=None,
+                 width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.rng = rng if rng is not None else Random()
+        self.width = width
+        self.height = height
+        self.center = board_center(width, height)
+        self.occupied = 0
+        self._chunks = {}
+        self._counts = Counter()
+        self._extra = Counter()
+        for position in (self.center,) if reserved is None else reserved:
+            self.occupy(position)
+        for position in occupied:
+            self.occupy(position)
+
+    def _locate(self, position):
+        """Блок клетки, номер байта и маска бита внутри блока."""
+        y, x = divmod(position, self.width)
+        bit = (y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE
+        return (x // CHUNK_SIZE, y // CHUNK_SIZE), bit >> 3, 1 << (bit & 7)
+
+    def __len__(self):
+        """Число свободных клеток."""
+        return self.width * self.height - self.occupied
+
+    def __contains__(self, position):
+        """Проверяет, свободна ли клетка."""
+        key, index, mask = self._locate(position)
+        chunk = self._chunks.get(key)
+        return chunk is None or not chunk[index] & mask
+
+    def occupy(self, position):
+        """Отмечает клетку занятой ещё одним объектом."""
+        key, index, mask = self._locate(position)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = self._chunks[key] = bytearray(CHUNK_SIZE * CHUNK_SIZE // 8)
+        if chunk[index] & mask:
+            self._extra[position] += 1
+            return
+        chunk[index] |= mask
+        self._counts[key] += 1
+        self.occupied += 1
+
+    def release(self, position):
+        """Снимает одну отметку занятости с клетки."""
+        extra = self._extra.get(position)
+        if extra:
+            if extra > 1:
+                self._extra[position] = extra - 1
+            else:
+                del self._extra[position]
+            return
+        key, index, mask = self._locate(position)
+        self._chunks[key][index] &= ~mask
+        self.occupied -= 1
+        self._counts[key] -= 1
+        if not self._counts[key]:
+            del self._counts[key]
+            del self._chunks[key]
+
+    def choice(self):
+        """Случайная свободная клетка.
+
+        Raises:
+            BoardFull: свободных клеток нет.
+        """
+        if self.occupied >= self.width * self.height:
+            raise BoardFull('На поле не осталось свободных клеток.')
+        randrange = self.rng.randrange
+        area = self.width * self.height
+        for _ in range(RANDOM_PROBES):
+            position = randrange(area)
+            if position in self:
+                return position
+        return self._scan()
+
+    def _scan(self):
+        """Ищет свободную клетку перебором блоков в случайном порядке."""
+        columns = -(-self.width // CHUNK_SIZE)
+        rows = -(-self.height // CHUNK_SIZE)
+        keys = [(column, row) for row in range(rows)
+                for column in range(columns)]
+        self.rng.shuffle(keys)
+        for column, row in keys:
+            cells = [
+                y * self.width + x
+                for y in range(row * CHUNK_SIZE,
+                               min((row + 1) * CHUNK_SIZE, self.height))
+                for x in range(column * CHUNK_SIZE,
+                               min((column + 1) * CHUNK_SIZE, self.width))
+            ]
+            free = [position for position in cells if position in self]
+            if free:
+                return self.rng.choice(free)
+        raise BoardFull('На поле не осталось свободных клеток.')
+
+
+def board_center(width, height):
+    """Индекс центральной клетки поля."""
+    return to_cell(width // 2, height // 2, width)
+
+
+def make_board(width=GRID_WIDTH, height=GRID_HEIGHT, rng=None):
+    """Индекс клеток подходящего для размера поля вида."""
+    board_cls = (FreeCells if width * height <= DENSE_BOARD_LIMIT
+                 else ChunkedCells)
+    return board_cls(width=width, height=height, rng=rng)
+
+
+class GameObject:
+    """Родительский класс, определяющий основные характеристики объектов.
+
+    Если объекту передан общий индекс `free_cells`, объект сам отмечает
+    в нём занятые и освобождённые клетки. Все случайные решения объекта
+    принимаются генератором `rng`, чтобы игру можно было воспроизвести.
+
+    Позиция объекта - индекс клетки поля (`to_cell`). Объекты игры
+    объявляют `__slots__` и не хранят словарь атрибутов.
+    """
+
+    __slots__ = ('position', 'body_color', 'free_cells', 'rng')
+
+    def __init__(self, position=CENTER_POSTITON, body_color=None,
+                 free_cells=None, rng=None) -> None:
+        """Инициализиция объекта."""
+        self.position = position
+        self.body_color = body_color
+        self.free_cells = free_cells
+        self.rng = rng if rng is not None else Random()
+
+    def randomize_position(self, occupied_positions=None):
+        """Переносит объект в случайную свободную клетку за O(1).
+
+        Явно переданные `occupied_positions` учитываются через временный
+        индекс, построенный за время, пропорциональное размеру поля.
+
+        Raises:
+            BoardFull: свободных клеток нет.
+        """
+        self.position = self._free_position(occupied_positions)
+        return self.position
+
+    def _free_position(self, occupied_positions=None):
+        """Случайная свободная клетка без изменения состояния объекта."""
+        free_cells = self.free_cells
+        if free_cells is None or occupied_positions is not None:
+            free_cells = FreeCells(occupied_positions or (), rng=self.rng)
+        return free_cells.choice()
+
+    def _occupy(self, position):
+        """Отмечает клетку занятой в общем индексе."""
+        if self.free_cells is not None:
+            self.free_cells.occupy(position)
+
+    def _release(self, position):
+        """Освобождает клетку в общем индексе."""
+        if self.free_cells is not None:
+            self.free_cells.release(position)
+
+
+class Apple(GameObject):
+    """Модель яблока, увеличивающего длину змейки при столкновении."""
+
+    __slots__ = ()
+
+    def __init__(self, body_color=None, positions=None, free_cells=None,
+                 rng=None):
+        super().__init__(body_color=body_color, free_cells=free_cells,
+                         rng=rng)
+        self.position = None
+        self.randomize_position(positions)
+
+    def place(self, position):
+        """Переносит яблоко в заданную клетку."""
+        if self.position is not None:
+            self._release(self.position)
+        self.position = position
+        if position is not None:
+            self._occupy(position)
+
+    def randomize_position(self, occupied_positions=None):
+        """Переносит яблоко в случайную свободную клетку."""
+        self.place(None)
+        self.place(self._free_position(occupied_positions))
+        return self.position
+
+
+class Stone(GameObject):
+    """Препятствия игры: камни и стены.
+
+    Виды препятствий (`OBSTACLE_*`):
+    - камень появляется по мере роста змейки (`add_new_stone`); при
+      столкновении с камнем змейка сбрасывается, а камни убираются;
+    - стена задаётся уровнем (`add_walls`, см. модуль `levels`) и
+      остаётся на поле всю игру; столкновение сбрасывает только змейку.
+
+    Вид препятствия по клетке хранится в словаре `kinds`, поэтому
+    проверка столкновения (`cell in stone`) выполняется за O(1) при любом
+    числе препятствий. Список `positions` хранит клетки в порядке
+    появления: сначала стены, затем камни; уборка камней оставляет в
+    нём только стены. Всё состояние, включая пройденные уровни и шаг
+    появления камней `every`, хранится в объекте, и игры в одном процессе
+    ничего не делят.
+    """
+
+    __slots__ = ('positions', 'levels', 'kinds', 'walls', 'every')
+
+    def __init__(self, body_color=None, free_cells=None, rng=None):
+        super().__init__(body_color=body_color, free_cells=free_cells,
+                         rng=rng)
+        self.every = STONE_EVERY
+        self.positions = []
+        self.levels = set()
+        self.kinds = {}
+        self.walls = 0
+
+    def __contains__(self, position):
+        """Проверяет, занята ли клетка препятствием."""
+        return position in self.kinds
+
+    def kind(self, position):
+        """Вид препятствия в клетке или `OBSTACLE_NONE`."""
+        return self.kinds.get(position, OBSTACLE_NONE)
+
+    def add_new_stone(self, length):
+        """Добавляет новый камень на карту при выполнении условия.
+
+        Камень появляется один раз на каждые `every` очков; уже
+        пройденные уровни хранятся в самом объекте, а не в общем для всех
+        камней замыкании. Если свободных клеток нет, камень не появляется.
+        """
+        level = length // self.every
+        if level in self.levels:
+            return
+        self.levels.add(level)
+        if length % self.every == 0:
+            try:
+                self.add(self._free_position())
+            except BoardFull:
+                return
+
+    def add(self, position, kind=OBSTACLE_STONE):
+        """Ставит препятствие в заданную клетку."""
+        self.position = position
+        self._occupy(position)
+        self.positions.append(position)
+        self.kinds[position] = kind
+
+    def add_walls(self, positions):
+        """Ставит стены уровня.
+
+        Raises:
+            ValueError: на поле уже есть камни - стены должны идти в
+                `positions` первыми.
+        """
+        if len(self.positions) != self.walls:
+            raise ValueError('Стены ставятся до появления камней.')
+        for position in positions:
+            self.add(position, OBSTACLE_WALL)
+        self.walls = len(self.positions)
+
+    def clear(self):
+        """Убирает все камни с поля, стены остаются."""
+        kinds = self.kinds
+        for position in self.positions[self.walls:]:
+            self._release(position)
+            if kinds.get(position) == OBSTACLE_STONE:
+                del kinds[position]
+        self.positions = self.positions[:self.walls]
+        self.levels.clear()
+
+    def save(self):
+        """Камни (без стен) и пройденные уровни для снимка игры."""
+        return tuple(self.positions[self.walls:]), frozenset(self.levels)
+
+    def restore(self, stones, levels):
+        """Возвращает камни и уровни, сохранённые `save`; стены не
+        меняются. Если камни не изменились, поле не трогается.
+        """
+        if tuple(self.positions[self.walls:]) != stones:
+            self.clear()
+            for position in stones:
+                self.add(position)
+        if self.levels != levels:
+            self.levels = set(levels)
+
+
+class SnakeBody:
+    """Тело змейки: упорядоченные сегменты и счётчик занятых клеток.
+
+    Сегменты хранятся в `deque` (голова слева), поэтому добавление головы
+    и удаление хвоста выполняются за O(1). Словарь занятости (клетка ->
+    число сегментов) позволяет проверять занятость клетки без линейного
+    поиска; это обычный `dict`, а не `Counter`, чтобы такт не платил за
+    методы `Counter`, написанные на Python.
+
+    Объект совместим со списком для чтения: поддерживает индексы, срезы
+    (возвращают `list`), `len`, `in`, итерацию, сравнение и сложение
+    со списками.
+    """
+
+    __slots__ = ('_segments', '_occupancy')
+
+    def __init__(self, positions=()):
+        self._segments = deque(positions)
+        self._occupancy = occupancy = {}
+        for position in self._segments:
+            occupancy[position] = occupancy.get(position, 0) + 1
+
+    def push_head(self, position):
+        """Добавляет новую голову."""
+        self._segments.appendleft(position)
+        occupancy = self._occupancy
+        occupancy[position] = occupancy.get(position, 0) + 1
+
+    def pop_tail(self):
+        """Удаляет и возвращает последний сегмент хвоста."""
+        position = self._segments.pop()
+        occupancy = self._occupancy
+        count = occupancy[position] - 1
+        if count:
+            occupancy[position] = count
+        else:
+            del occupancy[position]
+        return position
+
+    def save(self):
+        """Неизменяемая копия сегментов и занятости клеток для снимка."""
+        return tuple(self._segments), dict(self._occupancy)
+
+    def load(self, segments, occupancy):
+        """Заменяет сегменты и занятость сохранёнными `save`."""
+        self._segments.clear()
+        self._segments.extend(segments)
+        self._occupancy = dict(occupancy)
+
+    def diff(self, segments):
+        """Сегменты, которые нужно снять и добавить, чтобы тело стало
+        `segments`.
+
+        После `k` ходов от снимка тело - это `k` новых голов перед
+        началом сохранённых сегментов, поэтому разница ищется сравнением
+        кортежей (на C) и обходится за O(k). Если тело изменилось
+        иначе (змейка сбросилась), снимаются и добавляются все сегменты.
+
+        Returns:
+            tuple: (снимаемые сегменты, добавляемые сегменты).
+        """
+        current = tuple(self._segments)
+        if segments and segments[0] in self._occupancy:
+            heads = current.index(segments[0])
+            shared = len(current) - heads
+            if (shared <= len(segments)
+                    and current[heads:] == segments[:shared]):
+                return current[:heads], segments[shared:]
+        return current, segments
+
+    def cells(self):
+        """Занятые телом клетки, каждая по одному разу."""
+        return iter(self._occupancy)
+
+    def count(self, position):
+        """Число сегментов, занимающих клетку."""
+        return self._occupancy.get(position, 0)
+
+    def hits_self(self, skip=SELF_HIT_FROM):
+        """Проверяет `head in positions[skip:]` за O(skip)."""
+        segments = self._segments
+        head = segments[0]
+        others = self._occupancy[head] - 1
+        if not others:
+            return False
+        for index in range(1, min(skip, len(segments))):
+            if segments[index] == head:
+                others -= 1
+        return others > 0
+
+    def __getitem__(self, index):
+        """Сегмент по индексу или список сегментов по срезу."""
+        if isinstance(index, slice):
+            return list(self._segments)[index]
+        return self._segments[index]
+
+    def __len__(self):
+        """Число сегментов."""
+        return len(self._segments)
+
+    def __iter__(self):
+        """Итерация от головы к хвосту."""
+        return iter(self._segments)
+
+    def __contains__(self, position):
+        """Проверка занятости клетки за O(1)."""
+        return position in self._occupancy
+
+    def __eq__(self, other):
+        """Сравнение с другим телом или списком."""
+        if isinstance(other, SnakeBody):
+            other = other._segments
+        return list(self._segments) == list(other)
+
+    __hash__ = None
+
+    def __add__(self, other):
+        """Конкатенация со списком, результат - `list`."""
+        return list(self._segments) + list(other)
+
+    def __radd__(self, other):
+        """Конкатенация со списком справа."""
+        return list(other) + list(self._segments)
+
+    def __repr__(self):
+        """Строковое представление для отладки."""
+        return f'{self.__class__.__name__}({list(self._segments)!r})'
+
+
+class Snake(GameObject):
+    """Модель змейки: перемещение, рост и сброс."""
+
+    __slots__ = ('length', 'positions', 'direction', 'last', 'width',
+                 'height', 'cells')
+
+    def __init__(self, body_color=None, free_cells=None, rng=None):
+        super().__init__(body_color=body_color, free_cells=free_cells,
+                         rng=rng)
+        if free_cells is not None:
+            self.position = free_cells.center
+            self.width, self.height = free_cells.width, free_cells.height
+        else:
+            self.width, self.height = GRID_WIDTH, GRID_HEIGHT
+        self.cells = self.width * self.height
+        self.positions = SnakeBody()
+        self.reset()
+
+    def update_direction(self, direction):
+        """Обновляет движение направления змейки"""
+        self.direction = direction
+
+    def move(self):
+        """Обновляет позиции сегментов змейки при перемещении.
+
+        Добавляет новую голову в начало positions. Удаляет последний
+        элемент хвоста, если змейка не увеличивается в длину. Обе операции
+        выполняются за O(1).
+        """
+        positions, free_cells = self.positions, self.free_cells
+        head = self.next_cell()
+        positions.push_head(head)
+        if free_cells is not None:
+            free_cells.occupy(head)
+        if len(positions._segments) > self.length:
+            last = self.last = positions.pop_tail()
+            if free_cells is not None:
+                free_cells.release(last)
+        else:
+            self.last = None
+
+    def next_cell(self, direction=None):
+        """Клетка перед головой в направлении `direction` (по умолчанию -
+        текущем) с переходом через край поля.
+        """
+        direction_x, direction_y = direction or self.direction
+        head = self.positions._segments[0]
+        if direction_x:
+            row = head - head % self.width
+            return row + (head - row + direction_x) % self.width
+        return (head + direction_y * self.width) % self.cells
+
+    def get_head_position(self):
+        """возвращает позицию головы змейки
+        (первый элемент в списке positions).
+        """
+        return self.positions._segments[0]
+
+    def hits_self(self):
+        """Проверяет столкновение головы с телом (`positions[4:]`)."""
+        return self.positions.hits_self()
+
+    def restore(self, segments, occupancy, length, direction, last):
+        """Возвращает змейку в состояние из снимка игры.
+
+        Индекс свободных клеток правится только по сегментам, которыми
+        тела различаются (`SnakeBody.diff`).
+        """
+        if self.free_cells is not None:
+            removed, added = self.positions.diff(segments)
+            for position in removed:
+                self.free_cells.release(position)
+            for position in added:
+                self.free_cells.occupy(position)
+        self.positions.load(segments, occupancy)
+        self.length = length
+        self.direction = direction
+        self.last = last
+
+    def reset(self):
+        """Сброс змейки в исходное состояние."""
+        for position in self.positions:
+            self._release(position)
+        self.length = 1
+        self.positions = SnakeBody([self.position])
+        self._occupy(self.position)
+        self.direction = self.rng.choice(DIRECTIONS)
+        self.last = None
+
+
+class TurnQueue:
+    """Буфер поворотов: не более одного поворота за такт.
+
+    Нажатия, пришедшие внутри одного такта, не теряются, а применяются в
+    следующих тактах по очереди. Поворот проверяется относительно
+    последнего направления в очереди, поэтому два быстрых нажатия не
+    приводят к развороту на 180°.
+
+    Для каждого применённого поворота измеряется задержка от нажатия до
+    хода змейки (в миллисекундах), см. `latencies` и `latency_report`.
+    """
+
+    def __init__(self, maxlen=3, clock=perf_counter):
+        self.maxlen = maxlen
+        self.clock = clock
+        self.latencies = []
+        self._turns = deque()
+        self._pressed_at = None
+
+    def __len__(self):
+        """Число ожидающих поворотов."""
+        return len(self._turns)
+
+    def push(self, direction, current_direction):
+        """Ставит поворот в очередь; возвращает `False`, если он отброшен."""
+        last = self._turns[-1][0] if self._turns else current_direction
+        if (direction in (last, OPPOSITE[last])
+                or len(self._turns) >= self.maxlen):
+            return False
+        self._turns.append((direction, self.clock()))
+        return True
+
+    def pop(self):
+        """Поворот для очередного такта или `None`."""
+        if not self._turns:
+            return None
+        direction, self._pressed_at = self._turns.popleft()
+        return direction
+
+    def moved(self):
+        """Отмечает, что змейка сделала ход с полученным поворотом."""
+        if self._pressed_at is not None:
+            self.latencies.append((self.clock() - self._pressed_at) * 1000)
+            self._pressed_at = None
+
+    def clear(self):
+        """Сбрасывает ожидающие повороты."""
+        self._turns.clear()
+        self._pressed_at = None
+
+    def latency_report(self):
+        """Медиана, 99-й перцентиль и максимум задержки в мс или `None`."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        last = len(ordered) - 1
+        return {'p50': ordered[last // 2],
+                'p99': ordered[last * 99 // 100],
+                'max': ordered[last],
+                'count': len(ordered)}
+
+
+class State(namedtuple(
+        'State', ('head', 'last', 'direction', 'length', 'apple', 'stones'))):
+    """Компактное состояние игры после такта.
+
+    Полное тело змейки доступно через `SnakeSimulation.snake.positions`,
+    здесь хранятся только величины, не требующие копирования. Используется
+    `collections.namedtuple`, а не `typing.NamedTuple`, чтобы импорт ядра
+    не тянул модуль `typing`.
+    """
+
+    __slots__ = ()
+
+
+class Snapshot(namedtuple(
+        'Snapshot', ('header', 'segments', 'occupancy', 'stones', 'levels',
+                     'rng'))):
+    """Снимок игры для возврата к нему (`SnakeSimulation.restore`).
+
+    Числа - длина и направление змейки, снятый хвост, яблоко, такты,
+    последнее действие и причина окончания - упакованы в `header`
+    (`SNAPSHOT_HEADER`, `NO_CELL` вместо `None`). Тело, камни и уровни
+    хранятся неизменяемыми кортежами, занятость клеток телом - словарём,
+    который восстановление только читает. Снимок не меняется, поэтому
+    один снимок восстанавливается сколько угодно раз без копирования.
+    Состояние генератора `rng` сохраняется по запросу: оно в несколько
+    раз дороже остального снимка.
+    """
+
+    __slots__ = ()
+
+
+class SnakeSimulation:
+    """Движок игровых правил, не зависящий от Pygame.
+
+    Один вызов `step` соответствует одному такту игры: применить действие,
+    сдвинуть змейку, обработать столкновения и появление камней.
+    Столкновение завершает эпизод (`done=True`), при этом змейка (и камни,
+    если причина - камень) сбрасываются так же, как в интерактивной игре.
+
+    Если змейка заняла всё поле и яблоку некуда встать, игра выиграна:
+    эпизод завершается с наградой за яблоко и начинается заново.
+
+    Все случайные решения игры принимает собственный генератор,
+    инициализированный `seed`, поэтому игра с тем же зерном и теми же
+    действиями повторяется бит в бит. Индекс направления, с которым
+    змейка сделала последний ход, хранится в `last_action`, причина
+    окончания эпизода на последнем такте - в `outcome` (`OUTCOME_*`).
+
+    Размер поля в клетках (`width` x `height`) не связан с размером окна.
+    Для больших полей используется разреженный `ChunkedCells`, и стоимость
+    такта не зависит от площади поля.
+
+    Уровень `level` (см. модуль `levels`) задаёт размер поля и стены.
+    Камни появляются по событию роста счёта: съеденное яблоко вызывает
+    обработчики `score_listeners` с новой длиной змейки, по умолчанию -
+    `Stone.add_new_stone` с шагом `stone_every` очков.
+
+    Снимок `snapshot` и возврат к нему `restore` заменяют глубокое
+    копирование объектов игры при переборе будущих ходов: возврат после
+    `k` тактов правит индекс свободных клеток за O(k). Порядок клеток в
+    индексе после возврата может отличаться от исходного, поэтому
+    случайные места яблок и камней после `restore` выбираются из того же
+    множества клеток, но не совпадают бит в бит с игрой без возврата;
+    перебор, не влияющий на игру, ведётся на копии `fork`.
+
+    Классы объектов можно подменить, например, на отрисовываемые
+    наследники из модуля `the_snake`. Для замеров фаз такта вместо
+    `profiler` можно подставить `profiler.FrameProfiler`.
+    """
+
+    def __init__(self, snake_cls=Snake, apple_cls=Apple, stone_cls=Stone,
+                 seed=None, width=GRID_WIDTH, height=GRID_HEIGHT,
+                 level=None, stone_every=STONE_EVERY):
+        if seed is None:
+            seed = Random().getrandbits(64)
+        if level is not None:
+            width, height = level.width, level.height
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.rng = Random(seed)
+        self.free_cells = make_board(width, height, self.rng)
+        self.snake = snake_cls(free_cells=self.free_cells, rng=self.rng)
+        self.apple = apple_cls(free_cells=self.free_cells, rng=self.rng)
+        self.stone = stone_cls(free_cells=self.free_cells, rng=self.rng)
+        self.stone.every = stone_every
+        if level is not None:
+            self.stone.add_walls(level.walls)
+            if self.apple.position in self.stone:
+                self.apple.randomize_position()
+        self.score_listeners = [self.stone.add_new_stone]
+        self.ticks = 0
+        self.last_action = None
+        self.outcome = OUTCOME_NONE
+        self.profiler = NULL_PROFILER
+
+    def snapshot(self, rng=True):
+        """Снимок полного состояния игры (`Snapshot`).
+
+        Args:
+            rng: сохранить и состояние генератора случайных чисел.
+        """
+        snake, apple = self.snake, self.apple
+        segments, occupancy = snake.positions.save()
+        stones, levels = self.stone.save()
+        return Snapshot(
+            SNAPSHOT_HEADER.pack(
+                snake.length, DIRECTION_INDEX[snake.direction],
+                NO_CELL if snake.last is None else snake.last,
+                NO_CELL if apple.position is None else apple.position,
+                self.ticks,
+                NO_CELL if self.last_action is None else self.last_action,
+                self.outcome,
+            ),
+            segments, occupancy, stones, levels,
+            self.rng.getstate() if rng else None,
+        )
+
+    def restore(self, snapshot, rng=True):
+        """Возвращает игру к снимку и возвращает её состояние.
+
+        Снимок должен быть снят с этой игры или с игры с тем же полем и
+        стенами (`fork`).
+
+        Args:
+            rng: вернуть и состояние генератора, если оно есть в снимке.
+        """
+        (length, direction, last, apple, ticks, last_action,
+         outcome) = SNAPSHOT_HEADER.unpack(snapshot.header)
+        self.snake.restore(snapshot.segments, snapshot.occupancy, length,
+                           DIRECTIONS[direction],
+                           None if last == NO_CELL else last)
+        apple = None if apple == NO_CELL else apple
+        if self.apple.position != apple:
+            self.apple.place(apple)
+        self.stone.restore(snapshot.stones, snapshot.levels)
+        self.ticks = ticks
+        self.last_action = None if last_action == NO_CELL else last_action
+        self.outcome = outcome
+        if rng and snapshot.rng is not None:
+            self.rng.setstate(snapshot.rng)
+        return self.state()
+
+    def fork(self):
+        """Независимая копия игры из моделей без отрисовки.
+
+        Копия получает то же поле, стены, шаг камней и состояние, включая
+        генератор, но не обработчики `score_listeners` сверх
+        стандартного.
+        """
+        stone = self.stone
+        game = SnakeSimulation(seed=self.seed, width=self.width,
+                               height=self.height, stone_every=stone.every)
+        game.stone.add_walls(stone.positions[:stone.walls])
+        game.restore(self.snapshot())
+        return game
+
+    def _hit_obstacle(self, kind):
+        """Сбрасывает змейку (и камни, если это камень); возвращает
+        причину окончания эпизода.
+        """
+        self.snake.reset()
+        if kind == OBSTACLE_WALL:
+            return OUTCOME_WALL_HIT
+        self.stone.clear()
+        return OUTCOME_STONE_HIT
+
+    def reset(self):
+        """Начинает новую игру и возвращает начальное состояние."""
+        self.stone.clear()
+        self.snake.reset()
+        self.apple.randomize_position()
+        self.ticks = 0
+        return self.state()
+
+    def state(self):
+        """Возвращает текущее состояние игры."""
+        snake = self.snake
+        return State(snake.get_head_position(), snake.last, snake.direction,
+                     snake.length, self.apple.position,
+                     len(self.stone.positions))
+
+    def step(self, action=None):
+        """Выполняет один такт игры.
+
+        Args:
+            action: новое направление (`UP`, `DOWN`, `LEFT`, `RIGHT`) или
+                его индекс в `DIRECTIONS`. `None` сохраняет текущее
+                направление, разворот на 180° игнорируется.
+
+        Returns:
+            tuple: (состояние, награда, флаг окончания эпизода).
+        """
+        snake, apple, stone = self.snake, self.apple, self.stone
+        if action is not None:
+            if isinstance(action, int):
+                action = DIRECTIONS[action]
+            if action != OPPOSITE[snake.direction]:
+                snake.update_direction(action)
+        self.last_action = DIRECTION_INDEX[snake.direction]
+        snake.move()
+        self.profiler.lap('move')
+        self.ticks += 1
+        reward, done = 0, False
+        self.outcome = OUTCOME_NONE
+        head = snake.get_head_position()
+        if apple.position == head:
+            snake.length += 1
+            reward = REWARD_APPLE
+            try:
+                apple.randomize_position()
+            except BoardFull:
+                self.reset()
+                self.outcome = OUTCOME_BOARD_FULL
+                return self.state(), reward, True
+            for listener in self.score_listeners:
+                listener(snake.length)
+        elif snake.hits_self():
+            snake.reset()
+            reward, done = REWARD_DEATH, True
+            self.outcome = OUTCOME_SELF_HIT
+        elif head in stone:
+            self.outcome = self._hit_obstacle(stone.kinds[head])
+            reward, done = REWARD_DEATH, True
+        self.profiler.lap('collisions')
+        return self.state(), reward, done
@@ -0,0 +1,267 @@
+"""
+Постоянная таблица рекордов и статистика сыгранных игр.
+
+Итоги игр хранятся в SQLite в режиме WAL. Игровой поток только ставит
+итог в очередь (`StatsStore.record` не ждёт диска), а запись идёт в
+фоновом потоке пачками: всё, что накопилось в очереди, пишется одной
+транзакцией. После фиксации транзакции итоги переживают падение
+процесса; при падении теряются только итоги, ещё не дошедшие до диска.
+
+Чтение (`leaderboard`, `deaths_by_cause`, `summary`) идёт через
+отдельное соединение: в режиме WAL читатели не ждут писателя. Таблица
+рекордов читается по индексу очков, без сортировки всей таблицы.
+
+Запуск: `python stats.py snake_stats.db` - печать рекордов и сводки.
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+from queue import Empty, Queue
+
+from simulation import (OUTCOME_BOARD_FULL, OUTCOME_NONE, OUTCOME_SELF_HIT,
+                        OUTCOME_STONE_HIT, OUTCOME_WALL_HIT)
+
+STATS_VERSION = 1
+DEFAULT_BATCH_SIZE = 256
+POLL_SECONDS = 0.1
+LEADERBOARD_SIZE = 10
+CAUSE_NAMES = {
+    OUTCOME_NONE: 'выход',
+    OUTCOME_SELF_HIT: 'столкновение с собой',
+    OUTCOME_STONE_HIT: 'камень',
+    OUTCOME_BOARD_FULL: 'поле заполнено',
+    OUTCOME_WALL_HIT: 'стена',
+}
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS games ('
+    ' id INTEGER PRIMARY KEY,'
+    ' finished REAL NOT NULL,'
+    ' score INTEGER NOT NULL,'
+    ' ticks INTEGER NOT NULL,'
+    ' cause INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS games_score ON games (score DESC, ticks)',
+    'CREATE INDEX IF NOT EXISTS games_cause ON games (cause)',
+)
+INSERT = 'INSERT INTO games (finished, score, ticks, cause) VALUES (?,?,?,?)'
+
+
+def connect(path):
+    """Открывает базу в режиме WAL.
+
+    `synchronous=NORMAL` в режиме WAL не теряет согласованность базы
+    при падении, но не ждёт сброса на диск на каждой транзакции.
+    """
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+def create_schema(connection):
+    """Создаёт таблицы и индексы, если их ещё нет.
+
+    Raises:
+        ValueError: база создана несовместимой версией модуля.
+    """
+    version = connection.execute('PRAGMA user_version').fetchone()[0]
+    if version not in (0, STATS_VERSION):
+        raise ValueError('Неизвестная версия базы статистики.')
+    with connection:
+        connection.execute('BEGIN IMMEDIATE')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.execute(f'PRAGMA user_version={STATS_VERSION}')
+
+
+class StatsStore:
+    """Хранилище итогов игр с записью в фоновом потоке.
+
+    Атрибуты:
+        recorded (int): итогов поставлено в очередь.
+        written (int): итогов записано в базу.
+        batches (int): транзакций записи.
+        error (Exception | None): последняя ошибка фонового потока; пачка
+            с ошибкой теряется, а `flush` и `close` её поднимают.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, clock=time.time):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.clock = clock
+        self.recorded = self.written = self.batches = 0
+        self.error = None
+        connection = connect(self.path)
+        try:
+            create_schema(connection)
+        finally:
+            connection.close()
+        self._reader = None
+        self._queue = Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, score, ticks, cause):
+        """Ставит итог игры в очередь записи, не дожидаясь диска.
+
+        Args:
+            score: счёт (длина змейки) в конце игры.
+            ticks: длина игры в тактах.
+            cause: причина окончания, `OUTCOME_*`.
+        """
+        self._queue.put((self.clock(), score, ticks, cause))
+        self.recorded += 1
+
+    def flush(self):
+        """Ждёт, пока все поставленные итоги будут записаны.
+
+        Raises:
+            RuntimeError: фоновый поток не смог записать итоги.
+        """
+        done = self._queue.all_tasks_done
+        with done:
+            while self._queue.unfinished_tasks and self._thread.is_alive():
+                done.wait(POLL_SECONDS)
+        self._raise_error()
+
+    def close(self):
+        """Дописывает очередь и закрывает базу.
+
+        Raises:
+            RuntimeError: фоновый поток не смог записать итоги.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self._raise_error()
+
+    def _raise_error(self):
+        """Поднимает ошибку фонового потока, если она была."""
+        if self.error is not None:
+            raise RuntimeError(
+                'Не удалось записать итоги игр.') from self.error
+        if self._queue.unfinished_tasks and not self._thread.is_alive():
+            raise RuntimeError('Поток записи итогов завершился.')
+
+    def _run(self):
+        """Фоновый поток: пишет итоги пачками по транзакции.
+
+        Ошибка записи не останавливает поток: она сохраняется в `error`,
+        а очередь разбирается дальше, чтобы `flush` и `close` не ждали
+        вечно.
+        """
+        try:
+            connection = connect(self.path)
+        except Exception as error:
+            self.error, connection = error, None
+        try:
+            while True:
+                batch, item = self._take_batch()
+                if batch and connection is not None:
+                    try:
+                        self._write(connection, batch)
+                    except Exception as error:
+                        self.error = error
+                for _ in range(len(batch) + (item is None)):
+                    self._queue.task_done()
+                if item is None:
+                    return
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _take_batch(self):
+        """Пачка итогов из очереди и последний взятый элемент.
+
+        Returns:
+            tuple: (список итогов, последний элемент); элемент `None`
+            означает, что поток пора завершать.
+        """
+        item = self._queue.get()
+        batch = []
+        while item is not None:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                break
+        return batch, item
+
+    def _write(self, connection, batch):
+        """Записывает пачку итогов одной транзакцией."""
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(INSERT, batch)
+        self.written += len(batch)
+        self.batches += 1
+
+    def _query(self, sql, parameters=()):
+        """Выполняет запрос чтения через отдельное соединение."""
+        if self._reader is None:
+            self._reader = connect(self.path)
+        return self._reader.execute(sql, parameters).fetchall()
+
+    def leaderboard(self, limit=LEADERBOARD_SIZE):
+        """Лучшие игры.
+
+        Returns:
+            list[tuple]: (счёт, такты, причина, время окончания) по
+            убыванию счёта, при равном счёте - более короткие игры выше.
+        """
+        return self._query(
+            'SELECT score, ticks, cause, finished FROM games'
+            ' ORDER BY score DESC, ticks LIMIT ?', (limit,)
+        )
+
+    def best_score(self):
+        """Рекорд или 0, если игр ещё не было."""
+        rows = self.leaderboard(1)
+        return rows[0][0] if rows else 0
+
+    def deaths_by_cause(self):
+        """Число игр по причине окончания `OUTCOME_*`."""
+        return dict(self._query(
+            'SELECT cause, COUNT(*) FROM games GROUP BY cause'
+        ))
+
+    def summary(self):
+        """Сводка: число игр, сумма тактов, средний и лучший счёт."""
+        games, ticks, mean, best = self._query(
+            'SELECT COUNT(*), TOTAL(ticks), AVG(score), MAX(score)'
+            ' FROM games'
+        )[0]
+        return {'games': games, 'ticks': int(ticks), 'mean': mean or 0.0,
+                'best': best or 0}
+
+
+def main():
+    """Печать рекордов и сводки из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('path')
+    parser.add_argument('--top', type=int, default=LEADERBOARD_SIZE)
+    args = parser.parse_args()
+    store = StatsStore(args.path)
+    try:
+        for place, (score, ticks, cause, finished) in enumerate(
+                store.leaderboard(args.top), 1):
+            when = time.strftime('%Y-%m-%d %H:%M', time.localtime(finished))
+            print(f'{place:>3}. {score:>5} очков, {ticks:>7} тактов, '
+                  f'{CAUSE_NAMES.get(cause, cause)}, {when}')
+        summary = store.summary()
+        print('Игр: {games}, тактов: {ticks}, средний счёт {mean:.2f}, '
+              'рекорд {best}'.format(**summary))
+        for cause, count in sorted(store.deaths_by_cause().items()):
+            print(f'  {CAUSE_NAMES.get(cause, cause)}: {count}')
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Бенчмарки горячих путей игры.
+
+По умолчанию замеры отключены (`--benchmark-disable` в `pytest.ini`) и
+каждый бенчмарк выполняется один раз как обычный тест; пороги времени
+проверяются только при включённых замерах. Запуск замеров и сравнение с
+базовой линией описаны в README.
+"""
+from random import Random
+
+import numpy as np
+import pytest
+
+import simulation
+from autopilot import Autopilot, measure_latency
+from batch_env import BatchSnakeEnv
+from levels import border_level
+from lookahead import Lookahead
+from observation import SnakeEnv
+
+SNAKE_BOARD = 400
+BATCH_ENVS = 4096
+
+
+@pytest.fixture
+def rng():
+    return Random(0)
+
+
+@pytest.mark.parametrize('length', (10, 1_000, 100_000))
+def test_snake_move(benchmark, rng, length):
+    board = simulation.make_board(SNAKE_BOARD, SNAKE_BOARD, rng=rng)
+    snake = simulation.Snake(free_cells=board, rng=rng)
+    snake.length = length
+    # Тело укладывается построчно и не пересекает само себя.
+    for step in range(length):
+        last_in_row = step % SNAKE_BOARD == SNAKE_BOARD - 1
+        snake.update_direction(simulation.DOWN if last_in_row
+                               else simulation.RIGHT)
+        snake.move()
+    assert len(set(snake.positions)) == length
+    benchmark(snake.move)
+
+
+def _filled_board(rng, fill):
+    free_cells = simulation.make_board(rng=rng)
+    cells = [position
+             for position in range(free_cells.width * free_cells.height)
+             if position in free_cells]
+    rng.shuffle(cells)
+    for position in cells[:int(len(cells) * fill)]:
+        free_cells.occupy(position)
+    return free_cells
+
+
+@pytest.mark.parametrize('fill', (0.1, 0.9, 0.99))
+def test_randomize_position(benchmark, rng, fill):
+    apple = simulation.Apple(free_cells=_filled_board(rng, fill), rng=rng)
+    benchmark(apple.randomize_position)
+
+
+def test_add_new_stone_growth(benchmark, rng):
+    def grow():
+        stone = simulation.Stone(free_cells=simulation.FreeCells(rng=rng),
+                                 rng=rng)
+        for level in range(1, 101):
+            stone.add_new_stone(level * simulation.STONE_EVERY)
+        return stone
+
+    stone = benchmark(grow)
+    assert len(stone.positions) == 100
+
+
+def test_simulation_step(benchmark):
+    game = simulation.SnakeSimulation(seed=0)
+    benchmark(game.step)
+
+
+def test_simulation_step_many_obstacles(benchmark):
+    game = simulation.SnakeSimulation(seed=0, level=border_level(200, 200))
+    for _ in range(5_000):
+        game.stone.add(game.free_cells.choice())
+    benchmark(game.step)
+
+
+@pytest.mark.parametrize('length', (1, 50))
+def test_restore_and_step(benchmark, length):
+    game = simulation.SnakeSimulation(seed=0)
+    game.snake.length = length
+    for action in (0, 2) * (length // 2):
+        game.step(action)
+    root = game.snapshot(rng=False)
+
+    def clone_step():
+        game.restore(root, rng=False)
+        game.step()
+
+    benchmark(clone_step)
+
+
+def test_lookahead_decision(benchmark):
+    game = simulation.SnakeSimulation(seed=0)
+    planner = Lookahead(game, rollouts=64, depth=16, seed=0)
+    benchmark(planner)
+
+
+def test_batch_env_step(benchmark):
+    env = BatchSnakeEnv(BATCH_ENVS, seed=0)
+    actions = np.random.default_rng(0).integers(-1, 4, size=BATCH_ENVS)
+    benchmark.extra_info['num_envs'] = BATCH_ENVS
+    benchmark(env.step, actions)
+
+
+@pytest.mark.parametrize('options', ({}, {'stack': 4, 'crop': 5}))
+def test_observation_step(benchmark, options):
+    env = SnakeEnv(seed=0, **options)
+    env.reset()
+    benchmark(env.step, None)
+
+
+def test_autopilot_decision_100x100(benchmark):
+    game = simulation.SnakeSimulation(seed=0, width=100, height=100)
+    pilot = Autopilot(game)
+
+    def decide():
+        action = pilot()
+        game.step(action)
+        return action
+
+    benchmark(decide)
+    if benchmark.disabled:
+        return
+    report = measure_latency(game, pilot, 5_000)
+    assert report['p99'] < 1.0, (
+        f'p99 решения автопилота {report["p99"]:.3f} мс, ожидается < 1 мс.'
+    )
+
+
+@pytest.fixture
+def frontend(_the_snake):
+    _the_snake.pg.init()
+    _the_snake.init_display()
+    game = _the_snake.SnakeSimulation(
+        snake_cls=_the_snake.Snake, apple_cls=_the_snake.Apple,
+        stone_cls=_the_snake.Stone, seed=0,
+    )
+    _the_snake.redraw_board(game)
+    _the_snake.update_display()
+    return _the_snake, game
+
+
+def test_full_frame_render(benchmark, frontend):
+    the_snake, game = frontend
+
+    def frame():
+        the_snake.redraw_board(game)
+        the_snake.draw_text(game.snake.length, game)
+        the_snake.update_display()
+
+    benchmark(frame)
+
+
+def test_tick_render(benchmark, frontend):
+    the_snake, game = frontend
+    state = game.state()
+
+    def tick():
+        nonlocal state
+        before = state
+        state, _, done = game.step()
+        the_snake.draw_changes(game, before, state, done)
+        the_snake.update_display()
+
+    benchmark(tick)
+
+
+@pytest.mark.parametrize('changing', (False, True), ids=('same', 'changing'))
+def test_draw_text(benchmark, frontend, changing):
+    the_snake, game = frontend
+    score = iter(range(10 ** 9))
+
+    def hud():
+        the_snake.draw_text(next(score) if changing else 1, game)
+        the_snake.dirty_rects.clear()
+
+    benchmark(hud)
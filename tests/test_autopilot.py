@@ -0,0 +1,48 @@
+from autopilot import Autopilot
+from simulation import SnakeSimulation
+
+
+def _is_walk(pilot, start, path):
+    cells = [start] + list(path)
+    return all(following in pilot.neighbours(cell)
+               for cell, following in zip(cells, cells[1:]))
+
+
+def test_autopilot_eats_apples():
+    game = SnakeSimulation(seed=5)
+    pilot = Autopilot(game)
+    score = 0
+    for _ in range(3000):
+        _, reward, _ = game.step(pilot())
+        score += reward > 0
+    assert score > 50, 'Автопилот должен уверенно собирать яблоки.'
+    assert pilot.searches < 3000 // 5, 'Путь должен переиспользоваться.'
+
+
+def test_stone_on_path_is_repaired_locally():
+    game = SnakeSimulation(seed=2, width=40, height=40)
+    pilot = Autopilot(game)
+    game.apple.place(game.snake.positions[0] + 10 * 40 + 10)
+    game.step(pilot())
+    head = game.snake.positions[0]
+    stone = pilot.path[len(pilot.path) // 2]
+    game.stone.add(stone)
+    pilot.decide()
+    assert pilot.repairs == 1 and pilot.searches == 1
+    assert stone not in pilot.path
+    assert pilot.path[-1] == game.apple.position
+    assert _is_walk(pilot, head, pilot.path), 'Путь должен быть непрерывным.'
+
+
+def test_hamiltonian_cycle_visits_every_cell():
+    for width, height in ((6, 4), (5, 4), (4, 5)):
+        pilot = Autopilot(SnakeSimulation(seed=0, width=width, height=height))
+        cycle = pilot.hamiltonian_cycle()
+        cell, seen = 0, set()
+        for _ in range(width * height):
+            assert cycle[cell] in pilot.neighbours(cell)
+            seen.add(cell)
+            cell = cycle[cell]
+        assert cell == 0 and len(seen) == width * height
+    odd = Autopilot(SnakeSimulation(seed=0, width=5, height=5))
+    assert odd.hamiltonian_cycle() is None
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import batch_env
+from batch_env import BatchSnakeEnv
+from simulation import (DIRECTIONS, LEFT, OUTCOME_BOARD_FULL,
+                        REWARD_APPLE, REWARD_DEATH, SnakeSimulation)
+
+
+@pytest.fixture
+def env():
+    return BatchSnakeEnv(8, seed=0)
+
+
+def _next_cells(env):
+    x = (env.head % env.width + batch_env._DX[env.direction]) % env.width
+    y = (env.head // env.width + batch_env._DY[env.direction]) % env.height
+    return y * env.width + x
+
+
+def test_apple_gives_reward_and_growth(env):
+    env.apple[:] = _next_cells(env)
+    _, rewards, dones = env.step()
+    assert (rewards == REWARD_APPLE).all() and not dones.any()
+    assert (env.length == 2).all()
+    assert (env.apple != env.head).all(), (
+        'После съедания яблоко должно переместиться.'
+    )
+
+
+def test_stone_hit_resets_game(env):
+    env.apple[:] = -1
+    cells = _next_cells(env)
+    env.stones[np.arange(env.num_envs), cells] = 1
+    _, rewards, dones = env.step()
+    assert dones.all() and (rewards == REWARD_DEATH).all()
+    assert env.stones.sum() == 0 and (env.head == env.center).all()
+
+
+def test_occupancy_matches_body_after_random_play(env):
+    actions = np.random.default_rng(1).integers(-1, 4, size=(500, 8))
+    for action in actions:
+        env.step(action)
+    assert (env.body_occupancy.sum(axis=1) == env.body_len).all()
+    assert (env.body_len <= env.length).all()
+
+
+def test_full_board_ends_episode_like_simulation():
+    game = SnakeSimulation(seed=0, width=2, height=1)
+    env = BatchSnakeEnv(3, width=2, height=1, seed=0)
+    left = DIRECTIONS.index(LEFT)
+    for _ in range(3):
+        state, reward, done = game.step(left)
+        batch, rewards, dones = env.step(np.full(env.num_envs, left))
+        assert (rewards == reward).all() and (dones == done).all()
+        assert game.outcome == OUTCOME_BOARD_FULL
+        assert (env.outcome == OUTCOME_BOARD_FULL).all()
+        assert (batch.length == state.length).all()
+        assert (batch.apple == state.apple).all(), (
+            'После заполнения поля игра начинается заново с яблоком.'
+        )
@@ -0,0 +1,76 @@
+import sys
+import types
+
+import pytest
+
+import config
+import simulation
+
+
+def test_layers_override_in_order(tmp_path):
+    path = tmp_path / 'snake.toml'
+    path.write_text(
+        'speed = 20\nstone_every = 3\nturbo = true\n'
+        'snake_color = [0, 0, 255]\n', encoding='utf-8'
+    )
+    settings = config.load_config(
+        ['--config', str(path), '--speed', '30', '--no-turbo'],
+        environ={'SNAKE_BOARD': '100x50', 'SNAKE_AUTOPILOT': '1'},
+    )
+    assert settings.speed == 30, 'Ключ командной строки перекрывает TOML.'
+    assert settings.turbo is False
+    assert settings.stone_every == 3
+    assert settings.snake_color == (0, 0, 255)
+    assert (settings.width, settings.height) == (100, 50)
+    assert settings.autopilot is True
+    with pytest.raises(AttributeError):
+        settings.speed = 1
+
+
+@pytest.mark.parametrize('text', (
+    'sped = 20\n',
+    'speed = 0\n',
+    'snake_color = [0, 0]\n',
+))
+def test_bad_settings_are_rejected(tmp_path, text):
+    path = tmp_path / 'snake.toml'
+    path.write_text(text, encoding='utf-8')
+    with pytest.raises(ValueError):
+        config.load_config(['--config', str(path)], environ={})
+
+
+def test_tick_ladder_speeds_up_with_score():
+    settings = config.Config(speed=10, speed_step=5, speed_every=4,
+                             max_speed=22)
+    ladder = settings.tick_ladder()
+    assert [round(1 / seconds) for seconds in ladder] == [10, 15, 20, 22]
+    assert settings.speed_at(1) == 10 and settings.speed_at(5) == 15
+    assert settings.speed_at(100) == 22, 'Скорость не выше max_speed.'
+    assert config.Config().tick_ladder() == (1 / 15,)
+
+
+def test_games_in_one_process_use_own_settings():
+    games = [config.make_game(config.Config(seed=0, stone_every=every))
+             for every in (2, 5)]
+    for game in games:
+        for length in range(2, 11):
+            for listener in game.score_listeners:
+                listener(length)
+    stones = [len(game.stone.positions) for game in games]
+    assert stones == [5, 2], (
+        'Каждая игра должна ставить камни со своим шагом stone_every.'
+    )
+    assert simulation.Stone().every == simulation.STONE_EVERY
+
+
+def test_toml_falls_back_to_tomli(tmp_path, monkeypatch):
+    path = tmp_path / 'snake.toml'
+    path.write_text('speed = 20\n', encoding='utf-8')
+    monkeypatch.setitem(sys.modules, 'tomllib', None)
+    tomli = types.ModuleType('tomli')
+    tomli.load = lambda file: {'speed': 25}
+    monkeypatch.setitem(sys.modules, 'tomli', tomli)
+    assert config.load_config(['--config', str(path)], environ={}).speed == 25
+    monkeypatch.setitem(sys.modules, 'tomli', None)
+    with pytest.raises(ValueError, match='tomli'):
+        config.load_config(['--config', str(path)], environ={})
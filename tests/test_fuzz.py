@@ -0,0 +1,43 @@
+import pytest
+
+import fuzz
+import simulation
+
+
+@pytest.mark.parametrize('queue', (True, False))
+def test_random_scenarios_keep_invariants(queue):
+    report = fuzz.fuzz(20_000, seed=1, episode_ticks=2_000, queue=queue)
+    assert not report.failures, str(report)
+
+
+def _grows_to_three(game, previous, done):
+    if game.snake.length >= 3:
+        return 'длина 3'
+    return None
+
+
+def test_shrink_keeps_failure_and_cuts_presses():
+    case = fuzz.Case(7, 8, 6, bytes([0x5f]) * 400)
+    options = {'invariants': (_grows_to_three,)}
+    failure = fuzz.run_case(case, **options)
+    assert failure is not None
+    shrunk = fuzz.shrink(failure, **options)
+    assert shrunk.invariant == '_grows_to_three'
+    assert len(shrunk.case.presses) == shrunk.tick <= failure.tick
+    assert sum(map(bool, shrunk.case.presses)) < sum(
+        map(bool, case.presses[:failure.tick])
+    ), 'Уменьшение должно убрать лишние нажатия.'
+    assert fuzz.run_case(shrunk.case, **options) == shrunk, (
+        'Уменьшенный сценарий должен воспроизводить падение.'
+    )
+
+
+def test_two_presses_in_one_tick_do_not_reverse(_the_snake):
+    game = simulation.SnakeSimulation(seed=0)
+    snake = game.snake
+    snake.update_direction(simulation.LEFT)
+    game.step()
+    assert _the_snake.press_direction(snake, simulation.UP)
+    assert not _the_snake.press_direction(snake, simulation.RIGHT), (
+        'Два нажатия за такт не должны развернуть змейку.'
+    )
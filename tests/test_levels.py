@@ -0,0 +1,64 @@
+import pytest
+
+import levels
+import simulation
+
+
+def test_level_text_round_trip():
+    text = '\n'.join([
+        'snake-level 1', '; комментарий', '10x6',
+        '10#', '#8.#', '', '3.2#',
+    ])
+    level = levels.parse_level(text)
+    assert (level.width, level.height) == (10, 6)
+    assert len(level.walls) == 10 + 2 + 2
+    assert 30 + 3 in level.walls and 30 + 5 not in level.walls
+    assert levels.parse_level(levels.format_level(level)) == level
+
+
+@pytest.mark.parametrize('text', (
+    'snake-level 1\n4x4\n4x\n',
+    'snake-level 1\n4x4\n5.\n',
+    'snake-level 1\n4x4\n\n\n2.#\n',
+    'snake-level 2\n4x4\n',
+))
+def test_broken_level_is_rejected(text):
+    with pytest.raises(ValueError):
+        levels.parse_level(text)
+
+
+def test_wall_hit_keeps_walls_and_stones():
+    level = levels.border_level(12, 10)
+    game = simulation.SnakeSimulation(seed=0, level=level)
+    assert game.apple.position not in game.stone
+    game.stone.add(game.free_cells.choice())
+    walls = len(level.walls)
+    snake = game.snake
+    snake.update_direction(simulation.UP)
+    for _ in range(game.height):
+        state, reward, done = game.step()
+        if done:
+            break
+    assert done and game.outcome == simulation.OUTCOME_WALL_HIT
+    assert state.stones == walls + 1, (
+        'Удар о стену не должен убирать стены и камни.'
+    )
+    game.stone.clear()
+    assert game.stone.positions == level.walls
+    assert all(game.stone.kind(cell) == simulation.OBSTACLE_WALL
+               for cell in level.walls)
+
+
+def test_stones_spawn_on_score_events_per_game():
+    first = simulation.SnakeSimulation(seed=1)
+    second = simulation.SnakeSimulation(seed=1)
+    scores = []
+    first.score_listeners.append(scores.append)
+    for _ in range(simulation.STONE_EVERY - 1):
+        first.apple.place(first.snake.next_cell())
+        first.step()
+    assert scores == [2, 3, 4, 5]
+    assert len(first.stone.positions) == 1
+    assert not second.stone.positions and not second.stone.levels, (
+        'Игры в одном процессе не должны делить состояние камней.'
+    )
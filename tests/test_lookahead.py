@@ -0,0 +1,27 @@
+import simulation
+from lookahead import Lookahead
+
+
+def test_planning_does_not_change_game():
+    game = simulation.SnakeSimulation(seed=5)
+    planner = Lookahead(game, rollouts=16, depth=8, seed=0)
+    actions, states = [], []
+    for _ in range(100):
+        actions.append(planner())
+        states.append(game.step(actions[-1]))
+    replay = simulation.SnakeSimulation(seed=5)
+    assert [replay.step(action) for action in actions] == states, (
+        'Перебор должен идти на копии и не менять ход самой игры.'
+    )
+    assert planner.rollouts_done == 100 * 16
+
+
+def test_planner_avoids_stone_ahead():
+    game = simulation.SnakeSimulation(seed=0)
+    snake = game.snake
+    game.stone.add(snake.next_cell())
+    planner = Lookahead(game, rollouts=30, depth=4, seed=0)
+    action = planner()
+    assert snake.next_cell(simulation.DIRECTIONS[action]) not in game.stone, (
+        'Планировщик не должен вести змейку в камень.'
+    )
@@ -1,3 +1,7 @@
+import subprocess
+import sys
+from pathlib import Path
+
 import pytest
 
 from conftest import StopInfiniteLoop
@@ -16,3 +20,39 @@ def test_main_run_without_exceptions(_the_snake):
             f'`{type(error).__name__}: {error}`\n\n'
             'Убедитесь, что функция работает корректно.'
         )
+
+
+def test_import_does_not_open_window():
+    code = (
+        'import sys, the_snake; '
+        'print("pygame" in sys.modules, "screen" in vars(the_snake), '
+        '"argparse" in sys.modules)'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True,
+        cwd=Path(__file__).resolve().parent.parent, check=True,
+    )
+    assert result.stdout.split() == ['False', 'False', 'False'], (
+        'Импорт модуля `the_snake` не должен импортировать pygame и '
+        'argparse и создавать окно.'
+    )
+
+
+def test_lazy_module_reports_missing_attribute(_the_snake):
+    module = _the_snake.LazyModule('math')
+    assert module.pi > 3
+    assert not hasattr(module, 'no_such_attribute'), (
+        'Отсутствующий атрибут должен вызывать AttributeError.'
+    )
+
+
+def test_session_follows_config_speed_ladder(_the_snake):
+    settings = _the_snake.Config(speed=10, speed_step=5, speed_every=4,
+                                 max_speed=22)
+    session = _the_snake.Session(settings)
+    ladder = settings.tick_ladder()
+    assert session.tick_seconds == ladder[0]
+    for length, rung in ((4, 0), (5, 1), (9, 2), (100, 3)):
+        assert session.speed_up(length) == ladder[rung], (
+            'Длина такта должна совпадать со ступенью Config.tick_ladder.'
+        )
@@ -0,0 +1,181 @@
+import asyncio
+from random import Random
+
+import pytest
+
+import multiplayer
+from simulation import DIRECTION_INDEX, LEFT, RIGHT, UP
+
+
+def test_deltas_rebuild_server_board():
+    game = multiplayer.MultiplayerGame(seed=3, width=12, height=10)
+    slots = [game.join() for _ in range(3)]
+    mirror = multiplayer.BoardMirror(game.snapshot(slots[0]))
+    rng = Random(0)
+    for tick in range(500):
+        for slot in slots:
+            game.submit(slot, game.tick + 1, rng.randrange(4))
+        if tick == 250:
+            game.leave(slots.pop())
+        data = multiplayer.encode_delta(game.step())
+        mirror.apply(multiplayer.decode_delta(data))
+    assert mirror.desyncs == 0
+    assert {slot: list(body) for slot, body in mirror.snakes.items()} == {
+        slot: list(snake.positions)
+        for slot, snake in game.snakes.items()}, (
+        'Копия поля по изменениям должна совпадать с полем сервера.'
+    )
+    assert mirror.apple == game.apple.position
+    assert mirror.stones == game.stone.positions
+
+
+def test_head_into_other_snake_kills_it():
+    game = multiplayer.MultiplayerGame(seed=1, width=10, height=10)
+    first, second = game.join(), game.join()
+    for slot, head, direction in ((first, 0, RIGHT), (second, 2, LEFT)):
+        snake = game.snakes[slot]
+        snake.position = head
+        snake.reset()
+        snake.update_direction(direction)
+    game.snakes[second].length = 3
+    deaths = {slot: event for slot, _, _, event in game.step().snakes
+              if event & multiplayer.EVENT_DEATH}
+    assert deaths == {
+        first: multiplayer.EVENT_DEATH | multiplayer.OUTCOME_SNAKE_HIT,
+        second: multiplayer.EVENT_DEATH | multiplayer.OUTCOME_SNAKE_HIT,
+    }, 'При лобовом столкновении гибнут обе змейки.'
+
+
+def test_inputs_wait_for_their_tick():
+    game = multiplayer.MultiplayerGame(seed=2)
+    slot = game.join()
+    snake = game.snakes[slot]
+    turn = UP if snake.direction in (LEFT, RIGHT) else LEFT
+    assert game.submit(slot, 3, DIRECTION_INDEX[turn])
+    assert not game.submit(slot, multiplayer.INPUT_WINDOW + 1, 0)
+    game.step()
+    game.step()
+    assert snake.direction != turn, 'Ввод не должен применяться раньше.'
+    game.step()
+    assert snake.direction == turn
+
+
+@pytest.mark.timeout(10)
+def test_load_test_client_stays_in_sync():
+    report = asyncio.run(multiplayer.load_test(
+        games=5, players=3, seconds=0.5, tick_rate=50,
+    ))
+    assert report.deltas > 0
+    assert report.desyncs == 0
+
+
+def test_crowded_board_keeps_dead_snakes_waiting():
+    game = multiplayer.MultiplayerGame(seed=4, width=4, height=3,
+                                       max_players=11)
+    slots = []
+    with pytest.raises(multiplayer.BoardFull):
+        for _ in range(11):
+            slots.append(game.join())
+    mirror = multiplayer.BoardMirror(game.snapshot(slots[0]))
+    rng = Random(1)
+    waited = 0
+    for _ in range(300):
+        for slot in slots:
+            game.submit(slot, game.tick + 1, rng.randrange(4))
+        data = multiplayer.encode_delta(game.step())
+        mirror.apply(multiplayer.decode_delta(data))
+        waited += bool(game.waiting)
+    assert waited, 'На заполненном поле змейки должны ждать появления.'
+    assert mirror.desyncs == 0
+    assert mirror.apple == game.apple.position
+    assert {slot: list(body) for slot, body in mirror.snakes.items()} == {
+        slot: list(snake.positions)
+        for slot, snake in game.snakes.items()}, (
+        'Змейка, которой негде появиться, должна ждать вне поля.'
+    )
+    taken = {cell for snake in game.snakes.values()
+             for cell in snake.positions}
+    assert len(game.free_cells) == 12 - len(
+        taken | {game.free_cells.center}
+        | ({game.apple.position} - {None}) | set(game.stone.positions)
+    )
+
+
+def test_stones_follow_single_player_rule():
+    game = multiplayer.MultiplayerGame(seed=6, width=20, height=20,
+                                       stone_every=3)
+    first, second = game.join(), game.join()
+    stones = []
+    for slot in (first, second, first, first):
+        snake = game.snakes[slot]
+        snake.length = 2
+        game.apple.place(snake.next_cell())
+        stones.append(len(game.step().stones))
+    assert stones == [1, 1, 0, 0], (
+        'Камень ставится раз на уровень каждой змейки, как в одиночной игре.'
+    )
+    assert game.stone.every == 3
+
+
+def test_large_board_snapshot_fits_one_message():
+    game = multiplayer.MultiplayerGame(seed=7, width=300, height=300)
+    slot = game.join()
+    for _ in range(20_000):
+        game.stone.add(game.free_cells.choice())
+    message = multiplayer.frame(multiplayer.MSG_WELCOME, game.snapshot(slot))
+    kind, size = multiplayer.HEADER.unpack_from(message)
+    assert size == len(message) - multiplayer.HEADER.size > 1 << 16
+    mirror = multiplayer.BoardMirror(message[multiplayer.HEADER.size:])
+    assert mirror.stones == game.stone.positions
+
+
+class _SlowWriter:
+    def __init__(self, buffered):
+        self.buffered = buffered
+        self.closed = False
+        self.written = 0
+        self.transport = self
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+    def write(self, data):
+        self.written += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_slow_client_is_removed_on_tick():
+    server = multiplayer.GameServer(seed=0)
+    game = server.games[0] = multiplayer.MultiplayerGame(seed=0)
+    slow, fast = _SlowWriter(multiplayer.MAX_WRITE_BUFFER + 1), _SlowWriter(0)
+    server.clients[0] = {game.join(): slow, game.join(): fast}
+    server.tick()
+    server.tick()
+    assert slow.closed and list(server.clients[0].values()) == [fast]
+    assert len(game.snakes) == 1 and fast.written == 2
+    server._disconnect(0, 0, slow)
+    assert list(server.clients[0].values()) == [fast], (
+        'Повторное отключение медленного клиента не должно трогать других.'
+    )
+
+
+@pytest.mark.timeout(10)
+def test_oversized_client_message_drops_connection():
+    async def run():
+        server = multiplayer.GameServer(seed=0)
+        host, port = await server.start(port=0)
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(multiplayer.HEADER.pack(multiplayer.MSG_JOIN,
+                                                 1 << 31))
+            closed = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return closed, server.games
+        finally:
+            await server.stop()
+
+    closed, games = asyncio.run(run())
+    assert closed == b'', 'Сервер должен закрыть соединение.'
+    assert not games, 'Комната не должна создаваться.'
@@ -0,0 +1,68 @@
+from random import Random
+
+import numpy as np
+import pytest
+
+import observation
+from selfplay import greedy_policy
+
+
+def _planes_from_lists(game):
+    planes = np.zeros((len(observation.PLANES), game.height, game.width),
+                      dtype=np.uint8)
+    flat = planes.reshape(len(observation.PLANES), -1)
+    flat[observation.PLANE_BODY, list(game.snake.positions)] = 1
+    flat[observation.PLANE_HEAD, game.snake.get_head_position()] = 1
+    if game.apple.position is not None:
+        flat[observation.PLANE_APPLE, game.apple.position] = 1
+    flat[observation.PLANE_STONES, game.stone.positions] = 1
+    return planes
+
+
+def test_incremental_planes_match_rebuilt_planes():
+    env = observation.SnakeEnv(width=8, height=6)
+    obs, _ = env.reset(seed=5)
+    rng = Random(1)
+    dones = stones = 0
+    for _ in range(3000):
+        action = greedy_policy(env.game)
+        if rng.random() < 0.1:
+            action = rng.randrange(4)
+        obs, _, done, _, _ = env.step(action)
+        dones += done
+        stones = max(stones, len(env.game.stone.positions))
+        assert (obs == _planes_from_lists(env.game)).all(), (
+            'Плоскости после обновления по изменениям должны совпадать '
+            'с построенными заново.'
+        )
+    assert dones and stones, (
+        'Тест должен пройти через камни и окончание эпизода.'
+    )
+
+
+def test_observation_is_read_only_view():
+    env = observation.SnakeEnv()
+    first, _ = env.reset(seed=0)
+    second, *_ = env.step(0)
+    assert not second.flags.writeable
+    assert np.shares_memory(second, env.encoder.planes)
+    with pytest.raises(ValueError):
+        second[0, 0, 0] = 1
+    assert first is second, 'Наблюдение не должно копироваться.'
+
+
+def test_stacked_crops_keep_frame_order():
+    env = observation.SnakeEnv(stack=3, crop=2, seed=4)
+    obs, _ = env.reset()
+    assert obs.shape == (3, len(observation.PLANES), 5, 5)
+    history = []
+    for _ in range(5):
+        obs, *_ = env.step(None)
+        assert obs[-1, observation.PLANE_HEAD, 2, 2] == 1, (
+            'Голова должна быть в центре окна.'
+        )
+        history.append(np.array(obs[-1]))
+    assert not obs.flags.writeable
+    assert np.shares_memory(obs, env.encoder._frames)
+    assert all((obs[index] == history[index - 3]).all()
+               for index in range(3))
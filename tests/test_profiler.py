@@ -0,0 +1,47 @@
+import json
+
+from profiler import FRAME, NULL_PROFILER, FrameProfiler
+from simulation import SnakeSimulation
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 0.001
+        return self.now
+
+
+def test_ring_buffer_keeps_last_frames():
+    profiler = FrameProfiler(phases=('move',), capacity=4, clock=FakeClock())
+    for _ in range(10):
+        profiler.begin_frame()
+        profiler.lap('move')
+        profiler.end_frame()
+    assert profiler.frames == 10
+    assert len(profiler.samples['move']) == 4, (
+        'Буферы замеров должны иметь фиксированный размер.'
+    )
+    p50, p99 = profiler.percentiles('move')
+    assert round(p50, 6) == round(p99, 6) == 1.0
+
+
+def test_dump_formats(tmp_path):
+    profiler = FrameProfiler(capacity=8)
+    game = SnakeSimulation(seed=0)
+    game.profiler = profiler
+    for _ in range(5):
+        profiler.begin_frame()
+        game.step()
+        profiler.end_frame()
+    profiler.dump(tmp_path / 'trace.json')
+    trace = json.loads((tmp_path / 'trace.json').read_text())
+    assert trace['frames'] == 5 and len(trace['samples'][FRAME]) == 5
+    profiler.dump(tmp_path / 'trace.csv')
+    lines = (tmp_path / 'trace.csv').read_text().splitlines()
+    assert len(lines) == 6
+
+
+def test_null_profiler_is_default():
+    assert SnakeSimulation().profiler is NULL_PROFILER
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pygame
+import pytest
+
+import recorder
+
+SNAKE = (0, 255, 0)
+
+
+def _surface():
+    surface = pygame.Surface((60, 40), 0, 32)
+    surface.fill((0, 0, 0))
+    return surface
+
+
+def test_gif_first_frame_is_readable(tmp_path):
+    path = tmp_path / 'game.gif'
+    surface = _surface()
+    record = recorder.Recorder(path, surface.get_size(), colors=[SNAKE],
+                               fps=0)
+    surface.fill(SNAKE, pygame.Rect(20, 20, 20, 20))
+    assert record.capture(surface)
+    surface.fill((0, 0, 0), pygame.Rect(20, 20, 20, 20))
+    record.capture(surface, [pygame.Rect(20, 20, 20, 20)])
+    record.close()
+    assert record.written == 2
+    image = pygame.image.load(str(path))
+    assert image.get_size() == (60, 40)
+    assert image.get_at((25, 25))[:3] == SNAKE
+    assert image.get_at((5, 5))[:3] == (0, 0, 0)
+
+
+def test_raw_frames_keep_changed_regions(tmp_path):
+    path = tmp_path / 'game.raw'
+    surface = _surface()
+    record = recorder.Recorder(path, surface.get_size(), fps=0)
+    record.capture(surface)
+    surface.fill(SNAKE, pygame.Rect(0, 20, 20, 20))
+    record.capture(surface, [pygame.Rect(0, 20, 20, 20)])
+    record.close()
+    width, height, frames = recorder.read_raw(path)
+    assert (width, height) == (60, 40) and len(frames) == 2
+    _, regions = frames[1]
+    x, y, pixels = regions[0]
+    assert (x, y, pixels.shape) == (0, 20, (20, 20, 3))
+    assert tuple(pixels[5, 5]) == SNAKE
+
+
+def test_full_queue_drops_frames_instead_of_blocking(tmp_path):
+    surface = _surface()
+    record = recorder.Recorder(tmp_path / 'game.raw', surface.get_size(),
+                               fps=0, queue_size=1)
+    gate = threading.Event()
+    write = record.encoder.write
+
+    def slow_write(*args):
+        gate.wait()
+        write(*args)
+
+    record.encoder.write = slow_write
+    cell = [pygame.Rect(0, 0, 20, 20)]
+    results = [record.capture(surface, cell) for _ in range(5)]
+    assert not all(results) and record.dropped, (
+        'Отстающий кодировщик не должен останавливать игру.'
+    )
+    gate.set()
+    while not record.capture(surface, cell):
+        time.sleep(0.001)
+    record.close()
+    _, _, frames = recorder.read_raw(tmp_path / 'game.raw')
+    assert frames[-1][1][0][2].shape[:2] == (40, 60), (
+        'После пропуска кадра записывается полный кадр.'
+    )
+
+
+def test_encoder_error_does_not_hang_close(tmp_path):
+    surface = _surface()
+    record = recorder.Recorder(tmp_path / 'game.raw', surface.get_size(),
+                               fps=0, queue_size=1)
+
+    def broken_write(*args):
+        raise OSError('No space left on device')
+
+    record.encoder.write = broken_write
+    cell = [pygame.Rect(0, 0, 20, 20)]
+    for _ in range(20):
+        record.capture(surface, cell)
+    with pytest.raises(RuntimeError):
+        record.close()
+    assert isinstance(record.error, OSError)
+    assert not record._thread.is_alive()
+    assert not record.capture(surface, cell), (
+        'После ошибки кодировщика кадры не снимаются.'
+    )
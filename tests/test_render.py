@@ -0,0 +1,29 @@
+def test_camera_follows_head_on_large_board(_the_snake):
+    camera = _the_snake.Camera(200, 200)
+    head = 199
+    camera.center(head)
+    assert camera.to_screen(head) is not None
+    assert camera.to_world(camera.to_screen(head)) == head
+    assert not camera.follow(head)
+    far = (199 + 30) % 200
+    assert camera.to_screen(far) is None
+    assert camera.follow(far), 'Камера должна сдвинуться за головой.'
+    assert camera.to_screen(far) is not None
+
+
+def test_cells_are_batched_from_atlas(_the_snake, monkeypatch):
+    screen = _the_snake.init_display()
+    camera = _the_snake.Camera()
+    camera.center(_the_snake.CENTER_POSTITON)
+    monkeypatch.setattr(_the_snake, 'camera', camera)
+    monkeypatch.setattr(_the_snake, 'blit_queue', [])
+    apple = _the_snake.Apple()
+    apple.make_rect(apple.position, _the_snake.APPLE_COLOR)
+    assert len(_the_snake.blit_queue) == 1, (
+        'Клетка должна ставиться в очередь, а не рисоваться сразу.'
+    )
+    rect = _the_snake.blit_queue[0][1]
+    _the_snake.flush_blits()
+    assert not _the_snake.blit_queue
+    assert tuple(screen.get_at(rect.center))[:3] == _the_snake.APPLE_COLOR
+    assert tuple(screen.get_at(rect.topleft))[:3] == _the_snake.SLATEGRAY
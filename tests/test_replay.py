@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+import replay
+from simulation import SnakeSimulation
+
+
+def _play(seed, ticks=2000):
+    game = SnakeSimulation(seed=seed)
+    recorder = replay.ReplayRecorder(game)
+    rng = random.Random(seed)
+    for _ in range(ticks):
+        game.step(rng.choice((None, 0, 1, 2, 3)))
+        recorder.record()
+    return game, recorder.finish()
+
+
+def test_same_seed_gives_same_game():
+    first, _ = _play(7)
+    second, _ = _play(7)
+    assert replay.state_digest(first) == replay.state_digest(second), (
+        'Игры с одинаковым зерном и действиями должны совпадать.'
+    )
+
+
+def test_replay_roundtrip_is_bit_exact(tmp_path):
+    _, record = _play(42)
+    path = tmp_path / 'game.snkr'
+    record.save(path)
+    assert path.stat().st_size == replay.REPLAY_HEADER.size + 2000 // 4
+    loaded = replay.Replay.load(path)
+    assert list(loaded) == list(record)
+    assert replay.verify(loaded), 'Повтор должен совпадать с живой игрой.'
+
+
+def test_corrupted_replay_is_rejected():
+    _, record = _play(1, ticks=10)
+    with pytest.raises(ValueError):
+        replay.Replay.from_bytes(b'XXXX' + record.to_bytes()[4:])
+
+
+def test_replay_keeps_level_walls():
+    from levels import border_level
+
+    game = SnakeSimulation(seed=3, level=border_level(12, 10))
+    recorder = replay.ReplayRecorder(game)
+    rng = random.Random(3)
+    for _ in range(500):
+        game.step(rng.choice((None, 0, 1, 2, 3)))
+        recorder.record()
+    loaded = replay.Replay.from_bytes(recorder.finish().to_bytes())
+    assert sorted(loaded.level.walls) == sorted(border_level(12, 10).walls)
+    assert replay.verify(loaded), (
+        'Игра на уровне со стенами должна повторяться на том же уровне.'
+    )
+
+
+def test_replay_keeps_stone_cadence():
+    game = SnakeSimulation(seed=4, width=6, height=5, stone_every=2)
+    recorder = replay.ReplayRecorder(game)
+    rng = random.Random(4)
+    for _ in range(2000):
+        game.step(rng.choice((None, 0, 1, 2, 3)))
+        recorder.record()
+    loaded = replay.Replay.from_bytes(recorder.finish().to_bytes())
+    assert loaded.stone_every == 2
+    assert replay.verify(loaded), (
+        'Повтор должен ставить камни с тем же шагом, что и живая игра.'
+    )
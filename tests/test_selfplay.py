@@ -0,0 +1,36 @@
+import selfplay
+from simulation import OUTCOME_NONE, SnakeSimulation
+
+
+def test_farm_results_do_not_depend_on_workers():
+    single = selfplay.run_farm(6, workers=1, seed=3, max_ticks=500)
+    pooled = selfplay.run_farm(6, workers=2, seed=3, max_ticks=500)
+    assert single.scores == pooled.scores and single.ticks == pooled.ticks, (
+        'Результаты эпизодов должны зависеть только от зерна.'
+    )
+    assert OUTCOME_NONE not in single.outcomes
+
+
+def test_farm_returns_boards_through_shared_memory():
+    report = selfplay.run_farm(3, workers=1, max_ticks=200, keep_boards=True)
+    board = report.board(2)
+    assert len(board) == selfplay.CELLS
+    assert board.count(selfplay.CELL_HEAD) == 1
+    assert board.count(selfplay.CELL_APPLE) <= 1
+
+
+def test_board_is_taken_before_last_tick():
+    seed, episodes = 5, 4
+    report = selfplay.run_farm(episodes, workers=1, seed=seed,
+                               max_ticks=300, keep_boards=True)
+    for episode in range(episodes):
+        game = SnakeSimulation(seed=seed + episode)
+        for _ in range(report.ticks[episode] - 1):
+            game.step(selfplay.greedy_policy(game))
+        expected = bytearray(selfplay.CELLS)
+        selfplay.encode_board(tuple(game.snake.positions),
+                              game.apple.position,
+                              tuple(game.stone.positions), expected, 0)
+        assert report.board(episode) == bytes(expected), (
+            'Доска эпизода должна совпадать с игрой перед последним тактом.'
+        )
@@ -0,0 +1,186 @@
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import simulation
+
+
+def test_simulation_does_not_import_pygame():
+    code = 'import simulation, sys; print("pygame" in sys.modules)'
+    result = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True,
+        cwd=Path(simulation.__file__).parent, check=True,
+    )
+    assert result.stdout.strip() == 'False', (
+        'Модуль `simulation` не должен импортировать pygame.'
+    )
+
+
+@pytest.fixture
+def game():
+    return simulation.SnakeSimulation()
+
+
+def test_step_returns_state_reward_done(game):
+    state, reward, done = game.step()
+    assert isinstance(state, simulation.State)
+    assert reward == 0 and done is False
+    assert state.head == game.snake.get_head_position()
+
+
+def test_step_ignores_reverse_action(game):
+    direction = game.snake.direction
+    game.step(simulation.OPPOSITE[direction])
+    assert game.snake.direction == direction, (
+        'Разворот на 180° должен игнорироваться.'
+    )
+
+
+def test_eating_apple_gives_reward(game):
+    game.apple.place(game.snake.next_cell())
+    state, reward, done = game.step()
+    assert reward == simulation.REWARD_APPLE and not done
+    assert state.length == 2
+
+
+def test_stone_collision_ends_episode(game):
+    target = game.snake.next_cell()
+    game.apple.place(None)
+    game.stone.add(target)
+    state, reward, done = game.step()
+    assert done and reward == simulation.REWARD_DEATH
+    assert state.stones == 0 and state.length == 1
+
+
+def test_snake_body_is_list_compatible():
+    body = simulation.SnakeBody([(0, 0), (20, 0), (40, 0)])
+    assert body == [(0, 0), (20, 0), (40, 0)]
+    assert body[0] == (0, 0) and body[1:] == [(20, 0), (40, 0)]
+    assert body + [(60, 0)] == [(0, 0), (20, 0), (40, 0), (60, 0)]
+    assert (20, 0) in body and (60, 0) not in body
+    body.push_head((0, 20))
+    assert body.pop_tail() == (40, 0)
+    assert (40, 0) not in body and len(body) == 3
+
+
+def test_hits_self_matches_slice_rule():
+    loop = [(0, 0), (20, 0), (20, 20), (0, 20), (0, 0)]
+    assert simulation.SnakeBody(loop).hits_self()
+    assert not simulation.SnakeBody(loop[:4]).hits_self()
+    assert sorted(simulation.SnakeBody(loop).cells()) == sorted(loop[:4]), (
+        'Каждая занятая клетка должна встречаться один раз.'
+    )
+
+
+def test_free_cells_swap_remove():
+    free_cells = simulation.FreeCells(reserved=())
+    total = len(free_cells)
+    free_cells.occupy(0)
+    free_cells.occupy(0)
+    free_cells.release(0)
+    assert 0 not in free_cells and len(free_cells) == total - 1
+    free_cells.release(0)
+    assert 0 in free_cells and len(free_cells) == total
+
+
+def test_full_board_is_reported():
+    free_cells = simulation.FreeCells(reserved=())
+    for cell in list(free_cells._cells):
+        free_cells.occupy(cell)
+    apple_object = simulation.GameObject(free_cells=free_cells)
+    with pytest.raises(simulation.BoardFull):
+        apple_object.randomize_position()
+
+
+def test_free_cells_track_game_objects(game):
+    rng = random.Random(0)
+    for _ in range(300):
+        game.step(rng.randrange(4))
+    taken = (set(game.snake.positions) | set(game.stone.positions)
+             | {game.apple.position, simulation.CENTER_POSTITON})
+    assert len(game.free_cells) == (
+        simulation.GRID_WIDTH * simulation.GRID_HEIGHT - len(taken)
+    )
+    assert not any(position in game.free_cells for position in taken)
+
+
+def test_turn_queue_applies_one_turn_per_tick():
+    turns = simulation.TurnQueue()
+    assert turns.push(simulation.LEFT, simulation.UP)
+    assert not turns.push(simulation.RIGHT, simulation.UP), (
+        'Поворот проверяется относительно последнего в очереди.'
+    )
+    assert turns.push(simulation.DOWN, simulation.UP)
+    assert turns.pop() == simulation.LEFT
+    turns.moved()
+    assert turns.pop() == simulation.DOWN
+    turns.moved()
+    assert turns.pop() is None
+    assert turns.latency_report()['count'] == 2
+
+
+def test_large_board_uses_sparse_chunks():
+    game = simulation.SnakeSimulation(seed=3, width=10_000, height=10_000)
+    assert isinstance(game.free_cells, simulation.ChunkedCells)
+    assert game.snake.get_head_position() == game.free_cells.center
+    rng = random.Random(1)
+    for _ in range(500):
+        game.step(rng.randrange(4))
+    taken = (set(game.snake.positions) | set(game.stone.positions)
+             | {game.apple.position, game.free_cells.center})
+    assert game.free_cells.occupied == len(taken)
+    assert not any(position in game.free_cells for position in taken)
+    assert len(game.free_cells._chunks) <= len(taken), (
+        'Память должна расти с числом занятых клеток, а не с полем.'
+    )
+
+
+def test_chunked_cells_find_last_free_cell():
+    free_cells = simulation.ChunkedCells(width=70, height=3, reserved=(),
+                                         rng=random.Random(0))
+    cells = list(range(70 * 3))
+    for position in cells[:-1]:
+        free_cells.occupy(position)
+    free_cells.occupy(cells[0])
+    assert free_cells.choice() == cells[-1]
+    free_cells.occupy(cells[-1])
+    with pytest.raises(simulation.BoardFull):
+        free_cells.choice()
+    free_cells.release(cells[0])
+    assert cells[0] not in free_cells, 'Клетка занята дважды.'
+
+
+@pytest.mark.parametrize('size', ((6, 5), (32, 24), (300, 300)))
+def test_restore_returns_to_snapshot(size):
+    game = simulation.SnakeSimulation(seed=1, width=size[0],
+                                      height=size[1], stone_every=2)
+    rng = random.Random(0)
+    for _ in range(500):
+        for _ in range(rng.randrange(30)):
+            game.step(rng.randrange(4))
+        snapshot = game.snapshot(rng=False)
+        expected = (game.state(), list(game.snake.positions),
+                    list(game.stone.positions), game.ticks)
+        for _ in range(rng.randrange(40)):
+            game.step(rng.randrange(4))
+        state = game.restore(snapshot)
+        assert (state, list(game.snake.positions),
+                list(game.stone.positions), game.ticks) == expected
+        taken = (set(game.snake.positions) | set(game.stone.positions)
+                 | {game.apple.position, game.free_cells.center})
+        assert len(game.free_cells) == size[0] * size[1] - len(taken), (
+            'После возврата к снимку индекс свободных клеток должен '
+            'совпадать с объектами игры.'
+        )
+
+
+def test_snapshot_restores_random_generator(game):
+    snapshot = game.snapshot()
+    expected = game.rng.random()
+    game.restore(snapshot)
+    assert game.rng.random() == expected
+    fork = game.fork()
+    assert fork.state() == game.state() and fork.rng is not game.rng
@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+
+import pytest
+
+import stats
+from simulation import OUTCOME_SELF_HIT, OUTCOME_STONE_HIT
+
+
+def test_leaderboard_and_causes(tmp_path):
+    store = stats.StatsStore(tmp_path / 'stats.db')
+    store.record(5, 120, OUTCOME_SELF_HIT)
+    store.record(9, 300, OUTCOME_STONE_HIT)
+    store.record(9, 200, OUTCOME_SELF_HIT)
+    store.flush()
+    assert [row[:2] for row in store.leaderboard(2)] == [(9, 200), (9, 300)]
+    assert store.deaths_by_cause() == {OUTCOME_SELF_HIT: 2,
+                                       OUTCOME_STONE_HIT: 1}
+    summary = store.summary()
+    assert summary['games'] == 3 and summary['ticks'] == 620
+    store.close()
+    with sqlite3.connect(tmp_path / 'stats.db') as connection:
+        mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+    assert mode == 'wal', 'База должна работать в режиме WAL.'
+
+
+def test_records_are_batched_and_survive_reopen(tmp_path):
+    path = tmp_path / 'stats.db'
+    store = stats.StatsStore(path)
+    gate = threading.Event()
+    original = store._write
+
+    def slow_write(connection, batch):
+        gate.wait(1)
+        original(connection, batch)
+
+    store._write = slow_write
+    for score in range(100):
+        store.record(score, score, OUTCOME_SELF_HIT)
+    assert store.recorded == 100, 'Запись не должна ждать диска.'
+    gate.set()
+    store.close()
+    assert store.written == 100
+    assert store.batches < 100, 'Итоги должны писаться пачками.'
+    reopened = stats.StatsStore(path)
+    assert reopened.best_score() == 99
+    reopened.close()
+
+
+def test_write_error_does_not_hang_flush_or_close(tmp_path):
+    store = stats.StatsStore(tmp_path / 'stats.db', batch_size=1)
+    original = store._write
+
+    def failing_write(connection, batch):
+        if batch[0][1] == 1:
+            raise sqlite3.OperationalError('disk I/O error')
+        original(connection, batch)
+
+    store._write = failing_write
+    for score in range(3):
+        store.record(score, score, OUTCOME_SELF_HIT)
+    with pytest.raises(RuntimeError):
+        store.flush()
+    assert isinstance(store.error, sqlite3.OperationalError)
+    assert store._thread.is_alive(), 'Ошибка записи не должна убивать поток.'
+    assert store.written == 2
+    with pytest.raises(RuntimeError):
+        store.close()
+    assert not store._thread.is_alive()
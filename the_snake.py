@@ -3,29 +3,39 @@
 
 Этот модуль предоставляет функционал для создания базового графического
 интерфейса змейки с использованием библиотеки Pygame, а также вспомогательные
-функции для работы со случайными числами.
+функции отрисовки игровых объектов. Игровые правила находятся в модуле
+`simulation` и не зависят от Pygame; здесь они только отображаются.
+
+Импорт модуля не загружает Pygame и не открывает окно: Pygame
+импортируется при первом обращении к `pg`, а окно `screen` и часы `clock`
+создаются функцией `init_display` (её вызывает `main`) или при первом
+обращении к ним как к атрибутам модуля.
+
+Настройки игры - размер поля и клетки, скорость, цвета, режимы - берутся
+из неизменяемого объекта `config.Config` (файл TOML, переменные
+окружения `SNAKE_*`, ключи командной строки, см. модуль `config`).
+Размер поля не связан с размером окна: если поле больше окна, его
+показывает камера `Camera`, следующая за головой змейки, и отрисовываются
+только видимые клетки.
 
 Доступные импортируемые объекты:
 - sys: модуль для работы с системными параметрами и функциями
-- choice: функция выбора случайного элемента из последовательности
-- randint: функция генерации случайного целого числа в заданном диапазоне
 - pg (pygame): модуль для работы с графикой и создания интерфейса
+- simulation: безголовое ядро игры (`SnakeSimulation` и модели объектов)
 """
 
 import sys
-from random import choice, randint
-
-import pygame as pg
-
-SCREEN_WIDTH, SCREEN_HEIGHT = 640, 480
-GRID_SIZE = 20
-GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
-GRID_HEIGHT = SCREEN_HEIGHT // GRID_SIZE
-CENTER_POSTITON = ((SCREEN_WIDTH // 2), (SCREEN_HEIGHT // 2))
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
+from functools import lru_cache, partial
+from importlib import import_module
+
+import simulation
+from config import Config, load_config, make_game
+from profiler import NULL_PROFILER, FrameProfiler
+from simulation import (  # noqa: F401
+    CENTER_POSTITON, DOWN, GRID_HEIGHT, GRID_SIZE, GRID_WIDTH, LEFT, OPPOSITE,
+    RIGHT, SCREEN_HEIGHT, SCREEN_WIDTH, UP, SnakeSimulation, TurnQueue,
+)
+
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
@@ -38,13 +48,163 @@ BOARD_BACKGROUND_COLOR = BLACK
 BORDER_COLOR = CYAN
 APPLE_COLOR = RED
 SNAKE_COLOR = GREEN
-SPEED = 15
-PAUSED = False
-screen = pg.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32)
+MAX_FRAME_SECONDS = 0.25
+PROFILE_POSITION = (10, SCREEN_HEIGHT - 30)
+PROFILE_REFRESH_FRAMES = 30
+HUD_POSITION = (10, 10)
+HUD_SIZE = (75, 70)
+HUD_BACKGROUND = (0, 0, 0, 60)
+FONT_NAME, FONT_SIZE = 'Arial', 20
+TEXT_CACHE_SIZE = 64
+WALL_COLOR = SLATEGRAY
+RECORD_COLORS = (BOARD_BACKGROUND_COLOR, SLATEGRAY, GRAY, APPLE_COLOR,
+                 SNAKE_COLOR, WHITE, CYAN)
+CAMERA_MARGIN = 5
+TILES = {
+    'snake': (SNAKE_COLOR, SLATEGRAY),
+    'head': (SNAKE_COLOR, None),
+    'apple': (APPLE_COLOR, SLATEGRAY),
+    'stone': (GRAY, GRAY),
+    'wall': (WALL_COLOR, CYAN),
+}
+
+
+class LazyModule:
+    """Модуль, который импортируется при первом обращении к атрибуту."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        """Импортирует модуль и копирует его атрибуты в объект.
+
+        Raises:
+            AttributeError: в модуле нет такого атрибута.
+        """
+        self.__dict__.update(vars(import_module(self._name)))
+        try:
+            return self.__dict__[attribute]
+        except KeyError:
+            raise AttributeError(
+                f'Модуль {self._name} не содержит атрибута {attribute}.'
+            ) from None
+
+
+pg = LazyModule('pygame')
+
+
+def init_display():
+    """Создаёт окно игры и часы, если они ещё не созданы."""
+    global screen, clock
+    if 'screen' not in globals():
+        screen = pg.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32)
+        pg.display.set_caption('Змейка')
+    if 'clock' not in globals():
+        clock = pg.time.Clock()
+    return screen
+
+
+def __getattr__(name):
+    """Создаёт `screen` и `clock` при первом обращении к ним извне."""
+    if name in ('screen', 'clock'):
+        init_display()
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+@lru_cache(maxsize=None)
+def key_directions():
+    """Соответствие клавиш-стрелок направлениям движения."""
+    return {pg.K_UP: UP, pg.K_DOWN: DOWN, pg.K_LEFT: LEFT, pg.K_RIGHT: RIGHT}
+
+
+class Camera:
+    """Окно просмотра поля, следующее за головой змейки.
+
+    Камера переводит индексы клеток поля в пиксели экрана - это
+    единственное место, где модель встречается с пикселями. Поле замкнуто
+    в тор, поэтому смещение окна `offset` (в клетках) берётся по модулю
+    размера поля. По оси, на которой поле помещается в окно, камера
+    неподвижна. Размер клетки в пикселях - `cell`; остальная отрисовка
+    берёт его у камеры.
+    """
 
-pg.display.set_caption('Змейка')
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT,
+                 margin=CAMERA_MARGIN, cell=GRID_SIZE):
+        self.world = (width, height)
+        self.cell = cell
+        self.view = (min(SCREEN_WIDTH // cell, width),
+                     min(SCREEN_HEIGHT // cell, height))
+        self.margin = margin
+        self.offset = (0, 0)
+
+    def _follow_axis(self, head, offset, world, view):
+        """Смещение по одной оси, при котором голова не у края окна."""
+        if world <= view:
+            return 0
+        relative = (head - offset) % world
+        if relative < self.margin:
+            return (head - self.margin) % world
+        if relative >= view - self.margin:
+            return (head - view + self.margin + 1) % world
+        return offset
+
+    def _column_row(self, cell):
+        """Столбец и строка клетки поля."""
+        row, column = divmod(cell, self.world[0])
+        return column, row
+
+    def follow(self, cell):
+        """Сдвигает окно за клеткой; `True`, если окно сдвинулось."""
+        offset = tuple(
+            self._follow_axis(*axis) for axis in
+            zip(self._column_row(cell), self.offset, self.world, self.view)
+        )
+        moved = offset != self.offset
+        self.offset = offset
+        return moved
+
+    def center(self, cell):
+        """Ставит клетку в середину окна."""
+        self.offset = tuple(
+            0 if world <= view else (head - view // 2) % world
+            for head, world, view in zip(self._column_row(cell), self.world,
+                                         self.view)
+        )
 
-clock = pg.time.Clock()
+    def to_screen(self, cell):
+        """Экранная позиция клетки в пикселях или `None`, если не видна."""
+        column, row = self._column_row(cell)
+        screen_x = (column - self.offset[0]) % self.world[0]
+        screen_y = (row - self.offset[1]) % self.world[1]
+        if screen_x >= self.view[0] or screen_y >= self.view[1]:
+            return None
+        return screen_x * self.cell, screen_y * self.cell
+
+    def to_world(self, position):
+        """Индекс клетки поля по экранной позиции в пикселях."""
+        column = (position[0] // self.cell + self.offset[0]) % self.world[0]
+        row = (position[1] // self.cell + self.offset[1]) % self.world[1]
+        return row * self.world[0] + column
+
+    def visible(self):
+        """Пары (экранная позиция, клетка поля) для видимых клеток."""
+        for y in range(self.view[1]):
+            for x in range(self.view[0]):
+                position = (x * self.cell, y * self.cell)
+                yield position, self.to_world(position)
+
+
+camera = Camera()
+background = None
+atlas = None
+tile_areas = {}
+blit_queue = []
+dirty_rects = []
+hud_key = None
+stats = None
+head_overlay = None
+profile_overlay = None
 
 
 def draw_screen():
@@ -52,25 +212,230 @@ def draw_screen():
     screen.fill((0, 0, 0))
 
 
-def draw_grid(border=SLATEGRAY):
+def draw_grid(border=SLATEGRAY, surface=None):
     """Отрисовка сетки в игре."""
-    for x in range(0, screen.get_width(), GRID_SIZE):
-        pg.draw.line(screen, border, (x, 0), (x, screen.get_height()))
-    for y in range(0, screen.get_height(), GRID_SIZE):
-        pg.draw.line(screen, border, (0, y), (screen.get_width(), y))
+    if surface is None:
+        surface = screen
+    width, height = surface.get_size()
+    for x in range(0, width, camera.cell):
+        pg.draw.line(surface, border, (x, 0), (x, height))
+    for y in range(0, height, camera.cell):
+        pg.draw.line(surface, border, (0, y), (width, y))
 
 
-def draw_text(length):
-    """Отрисовка текста."""
-    font = pg.font.SysFont('Arial', 20)
-    text_surface = font.render(f'Счет: {length}', True, WHITE)
-    text_bg = pg.Surface((75, 70), pg.SRCALPHA)
-    text_bg.fill((0, 0, 0, 60))
-    text_bg.blit(text_surface, (5, 5))
-    if PAUSED:
-        pause_text = font.render("ПАУЗА", True, WHITE)
-        text_bg.blit(pause_text, (10, 40))
-    screen.blit(text_bg, (10, 10))
+def bake_background(color=BOARD_BACKGROUND_COLOR):
+    """Один раз рисует фон с сеткой в отдельную поверхность."""
+    global background
+    background = pg.Surface(screen.get_size()).convert()
+    background.fill(color)
+    draw_grid(surface=background)
+    return background
+
+
+def build_atlas():
+    """Один раз рисует плитки клеток в атлас в формате экрана.
+
+    Плитка - клетка заданного цвета с рамкой (`TILES`). Плитки других
+    цветов дорисовываются в атлас при первом запросе, см. `tile_area`.
+    """
+    global atlas
+    size = camera.cell
+    tiles = list(dict.fromkeys(list(TILES.values()) + list(tile_areas)))
+    atlas = pg.Surface((size * len(tiles), size)).convert()
+    tile_areas.clear()
+    for index, (body_color, border) in enumerate(tiles):
+        area = pg.Rect(index * size, 0, size, size)
+        atlas.fill(body_color, area)
+        if border is not None:
+            pg.draw.rect(atlas, border, area, 1)
+        tile_areas[body_color, border] = area
+    return atlas
+
+
+def tile_area(body_color, border=SLATEGRAY):
+    """Область плитки в атласе, при необходимости дорисовывает её."""
+    area = tile_areas.get((body_color, border))
+    if area is None or atlas is None:
+        tile_areas.setdefault((body_color, border), None)
+        build_atlas()
+        area = tile_areas[body_color, border]
+    return area
+
+
+def queue_tile(position, body_color, border=SLATEGRAY):
+    """Ставит плитку в экранную позицию в очередь отрисовки."""
+    rect = pg.Rect(position, (camera.cell, camera.cell))
+    area = tile_area(body_color, border)
+    blit_queue.append((atlas, rect, area))
+    dirty_rects.append(rect)
+    return rect
+
+
+def flush_blits():
+    """Рисует все плитки из очереди одним вызовом `Surface.blits`."""
+    if blit_queue:
+        screen.blits(blit_queue, doreturn=False)
+        blit_queue.clear()
+
+
+def clear_cell(position):
+    """Восстанавливает фон клетки из закэшированной поверхности."""
+    position = camera.to_screen(position)
+    if position is None:
+        return
+    rect = pg.Rect(position, (camera.cell, camera.cell))
+    blit_queue.append((background or bake_background(), rect, rect))
+    dirty_rects.append(rect)
+
+
+def redraw_board(game):
+    """Полностью перерисовывает видимую часть поля: фон и объекты.
+
+    Перебираются только клетки в окне камеры, а занятость проверяется по
+    индексу клеток игры, поэтому цена перерисовки не зависит от площади
+    поля.
+    """
+    blit_queue.clear()
+    screen.blit(background or bake_background(), (0, 0))
+    snake, apple, stone = game.snake, game.apple, game.stone
+    free_cells = game.free_cells
+    for _, position in camera.visible():
+        if position in free_cells:
+            continue
+        if position in snake.positions:
+            snake.make_rect(position, snake.body_color)
+        elif position == apple.position:
+            apple.draw()
+        elif position in stone:
+            stone.draw_cell(position)
+    dirty_rects[:] = [screen.get_rect()]
+
+
+def draw_changes(game, before, after, done):
+    """Отрисовывает только клетки, изменившиеся за такт.
+
+    Голова и освобождённый хвост рисуются методом `Snake.draw`, яблоко -
+    только если оно переместилось, камни - только новые. Сброс игры,
+    уборка камней или сдвиг камеры приводят к полной перерисовке поля.
+    """
+    head = game.snake.get_head_position()
+    if done:
+        camera.center(head)
+    if camera.follow(head) or done or after.stones < before.stones:
+        redraw_board(game)
+        return
+    game.snake.draw()
+    if after.apple != before.apple:
+        game.apple.draw()
+    stone = game.stone
+    for position in stone.positions[len(stone.positions)
+                                    - (after.stones - before.stones):]:
+        stone.draw_cell(position)
+
+
+def draw_interpolated_head(game, alpha):
+    """Рисует голову между текущей и следующей клеткой.
+
+    `alpha` - доля такта, прошедшая с последнего хода. Предыдущее
+    положение промежуточной головы стирается восстановлением области.
+    При переходе через край поля промежуточная голова не рисуется.
+    """
+    global head_overlay
+    if head_overlay is not None:
+        restore_region(head_overlay, game)
+        head_overlay = None
+    snake = game.snake
+    head = camera.to_screen(snake.get_head_position())
+    direction_x, direction_y = snake.direction
+    size = camera.cell
+    shift = round(alpha * size)
+    if not shift or head is None:
+        return
+    head_x, head_y = head
+    rect = pg.Rect(head_x + direction_x * shift, head_y + direction_y * shift,
+                   size, size)
+    if screen.get_rect().contains(rect):
+        head_overlay = queue_tile(rect.topleft, snake.body_color, None)
+
+
+def draw_profile(game, profiler):
+    """Показывает p50/p99 времени кадра раз в `PROFILE_REFRESH_FRAMES`."""
+    global profile_overlay
+    if profiler.frames % PROFILE_REFRESH_FRAMES:
+        return
+    percentiles = profiler.percentiles()
+    if percentiles is None:
+        return
+    if profile_overlay is not None:
+        restore_region(profile_overlay, game)
+    text = get_font().render(
+        'кадр p50 {:.2f} / p99 {:.2f} мс'.format(*percentiles), True, WHITE
+    )
+    flush_blits()
+    profile_overlay = screen.blit(text, PROFILE_POSITION)
+    dirty_rects.append(profile_overlay)
+
+
+def update_display():
+    """Отправляет на экран только изменившиеся области."""
+    flush_blits()
+    pg.display.update(dirty_rects)
+    dirty_rects.clear()
+
+
+@lru_cache(maxsize=None)
+def get_font(name=FONT_NAME, size=FONT_SIZE):
+    """Загружает системный шрифт один раз."""
+    return pg.font.SysFont(name, size)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, color=WHITE):
+    """Отрисованная строка; последние `TEXT_CACHE_SIZE` строк в кэше."""
+    return get_font().render(text, True, color)
+
+
+def restore_region(rect, game):
+    """Восстанавливает фон и клетки игровых объектов внутри области."""
+    blit_queue.append((background or bake_background(), rect, rect))
+    snake, apple, stone = game.snake, game.apple, game.stone
+    size = camera.cell
+    left = rect.left // size * size
+    top = rect.top // size * size
+    for x in range(left, rect.right, size):
+        for y in range(top, rect.bottom, size):
+            position = camera.to_world((x, y))
+            if position in snake.positions:
+                snake.make_rect(position, snake.body_color)
+            elif position == apple.position:
+                apple.draw()
+            elif position in stone:
+                stone.draw_cell(position)
+
+
+def draw_text(length, game=None, paused=False):
+    """Отрисовка текста.
+
+    Панель пересобирается только при изменении счёта или паузы, а также
+    если под ней перерисовались клетки поля. Если передана игра, клетки
+    под панелью восстанавливаются, чтобы полупрозрачный фон не
+    накапливался.
+    """
+    global hud_key
+    hud_rect = pg.Rect(HUD_POSITION, HUD_SIZE)
+    key = (length, paused)
+    if key == hud_key and hud_rect.collidelist(dirty_rects) == -1:
+        return
+    hud_key = key
+    if game is not None:
+        restore_region(hud_rect, game)
+    text_bg = pg.Surface(HUD_SIZE, pg.SRCALPHA)
+    text_bg.fill(HUD_BACKGROUND)
+    text_bg.blit(render_text(f'Счет: {length}'), (5, 5))
+    if paused:
+        text_bg.blit(render_text('ПАУЗА'), (10, 40))
+    flush_blits()
+    dirty_rects.append(screen.blit(text_bg, HUD_POSITION))
 
 
 def call_once(func):
@@ -85,40 +450,10 @@ def call_once(func):
     return wrapper
 
 
-def call_once_per_key(key_func):
-    """Декоратор. При срабатанывании условия вызывает раз в цикле функцию."""
-    called_keys = set()
-
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            key = key_func(*args, **kwargs)
-            if key not in called_keys:
-                called_keys.add(key)
-                return func(*args, **kwargs)
-            return None
-        wrapper.reset = lambda: called_keys.clear()
-        return wrapper
-    return decorator
-
-
-class GameObject:
+class GameObject(simulation.GameObject):
     """Родительский класс, определяющий основные характеристики объектов."""
 
-    def __init__(self, position=CENTER_POSTITON, body_color=None) -> None:
-        """Инициализиция объекта."""
-        self.position = position
-        self.body_color = body_color
-
-    def randomize_position(self, occupied_positions=None):
-        """Случайным образом определяет позицию объекта."""
-        if occupied_positions is None:
-            occupied_positions = set()
-        while True:
-            self.position = (randint(0, GRID_WIDTH - 1) * GRID_SIZE,
-                             randint(0, GRID_HEIGHT - 1) * GRID_SIZE)
-            if self.position not in occupied_positions:
-                break
-        return self.position
+    __slots__ = ()
 
     def draw(self) -> None:
         """Отрисовка объекта. Должен быть переопределён в дочерних классах."""
@@ -127,13 +462,16 @@ class GameObject:
         )
 
     def make_rect(self, position, body_color, border=SLATEGRAY):
-        """Создает квадрат для отрисовки."""
-        rect = (pg.Rect(position, (GRID_SIZE, GRID_SIZE)))
-        pg.draw.rect(screen, body_color, rect)
-        pg.draw.rect(screen, border, rect, 1)
+        """Ставит плитку клетки в очередь отрисовки, если клетка видна.
+
+        Плитка берётся из атласа; сами блиты выполняет `flush_blits`.
+        """
+        position = camera.to_screen(position)
+        if position is not None:
+            queue_tile(position, body_color, border)
 
 
-class Apple(GameObject):
+class Apple(simulation.Apple, GameObject):
     """Объект яблока, увеличивающий длину змейки при столкновении.
 
     При столкновении со змейкой:
@@ -141,22 +479,27 @@ class Apple(GameObject):
     - Переопределяется позиция на новую, случайную.
 
     Атрибуты:
-        position (tuple[int, int]): Координаты (x, y) на игровом поле
+        position (int): Индекс клетки на игровом поле (`y * width + x`)
         body_color (str): Цвет яблока (по умолчанию 'RED')
-        occupied_postions (tuple[int, int]): Занятые позиции на поле.
     """
 
-    def __init__(self, body_color=APPLE_COLOR, positions=None):
+    __slots__ = ()
+
+    def __init__(self, body_color=APPLE_COLOR, positions=None,
+                 free_cells=None, rng=None):
         """Инициализирует объект яблока.
 
         Args:
-            position (tuple, optional): Начальная позиция яблока.
-                По умолчанию None (случайная позиция).
-            color (tuple, optional): Цвет яблока.
+            body_color (tuple, optional): Цвет яблока.
                 По умолчанию APPLE_COLOR (красный).
+            positions (Iterable[int], optional): Занятые клетки поля
+                (индексы `y * width + x`), в которые яблоко не ставится.
+                По умолчанию None (учитывается `free_cells`).
+            free_cells (FreeCells, optional): Общий индекс свободных клеток.
+            rng (random.Random, optional): Генератор случайных чисел игры.
         """
-        super().__init__(body_color=body_color)
-        super().randomize_position(positions)
+        super().__init__(body_color=body_color, positions=positions,
+                         free_cells=free_cells, rng=rng)
 
     def draw(self):
         """Отрисовка яблока."""
@@ -164,32 +507,34 @@ class Apple(GameObject):
                        body_color=self.body_color)
 
 
-class Stone(GameObject):
-    """Объект камня, случайно расположенный на экране.
+class Stone(simulation.Stone, GameObject):
+    """Препятствия на экране: камни и стены уровня.
 
     Класс реализует поведения препятствия в игре:
     - При столкновении с камнем - сбросить змейку в исходное.
+    - Стены рисуются цветом `WALL_COLOR`.
     """
 
-    def __init__(self, body_color=GRAY):
-        super().__init__(body_color=body_color)
-        self.positions = [(-20, -20)]
+    __slots__ = ()
+
+    def __init__(self, body_color=GRAY, free_cells=None, rng=None):
+        super().__init__(body_color=body_color, free_cells=free_cells,
+                         rng=rng)
+
+    def draw_cell(self, position):
+        """Отрисовка препятствия в клетке по его виду."""
+        if self.kind(position) == simulation.OBSTACLE_WALL:
+            self.make_rect(position, WALL_COLOR, border=CYAN)
+        else:
+            self.make_rect(position, self.body_color, border=GRAY)
 
     def draw(self):
-        """Отрисовка камня."""
+        """Отрисовка камней и стен."""
         for pos in self.positions:
-            self.make_rect(position=pos,
-                           body_color=self.body_color,
-                           border=GRAY)
-
-    @call_once_per_key(lambda self, length: length // 5)
-    def add_new_stone(self, length):
-        """Добавляет новый камень на карту при выполнении условия."""
-        if length % 5 == 0:
-            self.positions.append(super().randomize_position())
+            self.draw_cell(pos)
 
 
-class Snake(GameObject):
+class Snake(simulation.Snake, GameObject):
     """Игровой объект змейки, управляемый пользователем.
 
     Класс реализует поведение змейки в игре:
@@ -198,116 +543,242 @@ class Snake(GameObject):
     - проверку столкновений с границами и самой собой
     """
 
-    def __init__(self, body_color=SNAKE_COLOR):
-        super().__init__(body_color=body_color)
-        self.reset()
+    __slots__ = ()
 
-    def update_direction(self, direction):
-        """Обновляет движение направления змейки"""
-        self.direction = direction
+    def __init__(self, body_color=SNAKE_COLOR, free_cells=None, rng=None):
+        super().__init__(body_color=body_color, free_cells=free_cells,
+                         rng=rng)
 
-    def move(self):
-        """Обновляет позиции сегментов змейки при перемещении.
+    def draw(self):
+        """Отрисовка змейки."""
+        self.make_rect(self.get_head_position(), self.body_color)
+        if self.last is not None:
+            clear_cell(self.last)
 
-        Добавляет новую голову в начало списка positions. Удаляет последний
-        элемент хвоста, если змейка не увеличивается в длину
-        """
-        head_x, head_y = self.get_head_position()
-        direction_x, direction_y = self.direction
 
-        future_x = (head_x + direction_x * GRID_SIZE) % SCREEN_WIDTH
-        future_y = (head_y + direction_y * GRID_SIZE) % SCREEN_HEIGHT
+def press_direction(game_object, direction, turns=None):
+    """Обрабатывает нажатие стрелки: ставит поворот в очередь `turns` или,
+    без очереди, сразу меняет направление змейки.
 
-        coordinate = (future_x, future_y)
+    Без очереди разворот проверяется и по клетке, из которой голова
+    пришла последним ходом (шея `positions[1]`, а у змейки из одной
+    клетки - снятый хвост `last`): два нажатия за один такт не должны
+    развернуть змейку через поворот, ещё не сделанный ходом.
 
-        self.positions.insert(0, coordinate)
-        self.last = (
-            self.positions.pop()
-            if len(self.positions) > self.length
-            else None
-        )
+    Returns:
+        bool: `True`, если поворот принят.
+    """
+    if turns is not None:
+        return turns.push(direction, game_object.direction)
+    positions = game_object.positions
+    came_from = positions[1] if len(positions) > 1 else game_object.last
+    if (direction == OPPOSITE[game_object.direction]
+            or came_from is not None
+            and game_object.next_cell(direction) == came_from):
+        return False
+    game_object.update_direction(direction)
+    return True
 
-    def draw(self):
-        """Отрисовка змейки."""
-        self.make_rect(self.get_head_position(), self.body_color)
-        if self.last:
-            last_rect = pg.Rect(self.last, (GRID_SIZE, GRID_SIZE))
-            pg.draw.rect(screen, BOARD_BACKGROUND_COLOR, last_rect)
 
-    def get_head_position(self):
-        """возвращает позицию головы змейки
-        (первый элемент в списке positions).
-        """
-        return self.positions[0]
+class Session:
+    """Изменяемое состояние идущей игры при неизменных настройках.
+
+    Атрибуты:
+        config (Config): настройки игры.
+        tick_seconds (float): длина такта при текущей длине змейки
+            (`Config.speed_at`).
+        paused (bool): игра на паузе.
+        ticks (int): тактов в текущей игре (для статистики).
+    """
+
+    __slots__ = ('config', 'tick_seconds', 'paused', 'ticks')
 
-    def reset(self):
-        """Сброс змейки в исходное состояние."""
-        self.length = 1
-        self.positions = [self.position]
-        directions = (UP, DOWN, LEFT, RIGHT)
-        self.direction = choice(directions)
-        self.last = None
-        screen.fill(BOARD_BACKGROUND_COLOR)
+    def __init__(self, config=Config()):
+        self.config = config
+        self.tick_seconds = 1 / config.speed_at(1)
+        self.paused = False
+        self.ticks = 0
 
+    def speed_up(self, length):
+        """Длина такта для ступени сложности при длине `length`."""
+        self.tick_seconds = 1 / self.config.speed_at(length)
+        return self.tick_seconds
 
-def handle_keys(game_object):
+
+def handle_keys(game_object, turns=None, session=None):
     """Функция, принимает указание направления для объекта и устанавливает
     значения в соответсвующую переменную.
+
+    Если передана очередь `turns`, повороты не применяются сразу, а
+    ставятся в очередь и выполняются по одному за такт. Пробел ставит
+    на паузу игру `session`, если она передана.
     """
     for event in pg.event.get():
-        global PAUSED
         if event.type == pg.QUIT:
             pg.quit()
             sys.exit()
         elif event.type == pg.KEYDOWN:
-            if event.key == pg.K_UP and game_object.direction != DOWN:
-                game_object.update_direction(UP)
-            elif event.key == pg.K_DOWN and game_object.direction != UP:
-                game_object.direction = DOWN
-            elif event.key == pg.K_LEFT and game_object.direction != RIGHT:
-                game_object.direction = LEFT
-            elif event.key == pg.K_RIGHT and game_object.direction != LEFT:
-                game_object.direction = RIGHT
+            direction = key_directions().get(event.key)
+            if direction is not None:
+                press_direction(game_object, direction, turns)
             elif event.key == pg.K_ESCAPE:
                 pg.quit()
                 sys.exit()
-            elif event.key == pg.K_SPACE:
-                PAUSED = not PAUSED
+            elif event.key == pg.K_SPACE and session is not None:
+                session.paused = not session.paused
 
 
-def main():
+def run_ticks(game, state, turns, accumulator, session, pilot=None):
+    """Выполняет все такты, накопленные за кадр.
+
+    Длина такта `session.tick_seconds` меняется только при изменении
+    длины змейки (лестница сложности), поэтому цикл читает её и методы
+    игры из локальных переменных. На паузе накопленное время
+    сбрасывается.
+
+    Если передан автопилот `pilot`, ход на каждом такте выбирает он, а
+    очередь поворотов с клавиатуры не используется.
+
+    Итог каждой законченной игры уходит в хранилище статистики `stats`,
+    если оно открыто.
+
+    Returns:
+        tuple: (последнее состояние, остаток времени в аккумуляторе).
+    """
+    if session.paused:
+        return state, 0.0
+    tick_seconds = session.tick_seconds
+    step, lap = game.step, game.profiler.lap
+    while accumulator >= tick_seconds:
+        accumulator -= tick_seconds
+        before = state
+        state, reward, done = step(turns.pop() if pilot is None else pilot())
+        turns.moved()
+        session.ticks += 1
+        if done:
+            turns.clear()
+            if stats is not None:
+                stats.record(before.length + (reward > 0), session.ticks,
+                             game.outcome)
+            session.ticks = 0
+        if state.length != before.length:
+            tick_seconds = session.speed_up(state.length)
+        draw_changes(game, before, state, done)
+        lap('draw')
+    return state, accumulator
+
+
+def report_latency(turns):
+    """Печатает измеренную задержку от нажатия клавиши до хода змейки."""
+    report = turns.latency_report()
+    if report is not None:
+        print('Задержка ввода, мс: p50={p50:.1f}, p99={p99:.1f}, '
+              'max={max:.1f} ({count} поворотов)'.format(**report))
+
+
+def open_recorder(config):
+    """Запись игры в файл `config.record` или `None`, если он не задан."""
+    if not config.record:
+        return None
+    from recorder import Recorder
+    colors = RECORD_COLORS + (config.background_color, config.snake_color,
+                              config.apple_color, config.stone_color)
+    return Recorder(config.record, screen.get_size(), colors)
+
+
+def main(config=None):
     """Основной процесс игры, в котором применены и скомпонованы все выше-
     описанные функции и классы в единую логику.
+
+    Настройки `config` (`config.Config`) по умолчанию собираются
+    `load_config` из файла TOML, переменных окружения `SNAKE_*` и ключей
+    командной строки.
+
+    Игра идёт тактами длины `Session.tick_seconds` независимо от частоты
+    кадров: время кадра копится в аккумуляторе, а отрисовка идёт с
+    частотой до `render_fps` с промежуточным положением головы. В режиме
+    `turbo` ожидания `clock.tick` нет: на каждый кадр ровно один такт.
+
+    Если включён автопилот (`autopilot`), змейкой управляет
+    `autopilot.Autopilot`, а клавиатура только ставит паузу и закрывает
+    игру. Если задан файл `record`, игра записывается модулем
+    `recorder`; если задана база `stats`, итоги игр (включая
+    незаконченную при выходе) сохраняются модулем `stats`; если задан
+    файл `profile`, фазы кадра замеряются, на экране показываются
+    p50/p99, а при выходе трасса сохраняется в этот файл (CSV или JSON).
     """
+    global camera, stats
+    if config is None:
+        config = load_config([])
     pg.init()
-    snake = Snake()
-    apple = Apple(positions=snake.positions)
-    stone = Stone()
-    while True:
-        clock.tick(SPEED)
-        # draw_screen()
-        handle_keys(game_object=snake)
-        if not PAUSED:
-            snake.move()
-        if apple.position == snake.get_head_position():
-            apple.randomize_position(snake.positions + stone.positions
-                                     + [CENTER_POSTITON])
-            snake.length += 1
-        elif snake.get_head_position() in snake.positions[4:]:
-            snake.reset()
-        elif snake.get_head_position() in stone.positions:
-            stone.positions = [stone.positions[0]]
-            stone.add_new_stone.reset()
-            snake.reset()
-        apple.draw()
-        stone.draw()
-        snake.draw()
-        draw_grid()
-        draw_text(snake.length)
-        if snake.length % 5 == 0:
-            stone.add_new_stone(snake.length)
-        pg.display.update()
+    init_display()
+    game = make_game(config, snake_cls=partial(Snake, config.snake_color),
+                     apple_cls=partial(Apple, config.apple_color),
+                     stone_cls=partial(Stone, config.stone_color))
+    camera = Camera(game.width, game.height, cell=config.grid_size)
+    camera.center(game.snake.get_head_position())
+    build_atlas()
+    bake_background(config.background_color)
+    profiler = FrameProfiler() if config.profile else NULL_PROFILER
+    game.profiler = profiler
+    turns = TurnQueue()
+    session = Session(config)
+    pilot = None
+    if config.autopilot:
+        from autopilot import Autopilot
+        pilot = Autopilot(game)
+    recorder = open_recorder(config)
+    if config.stats:
+        from stats import StatsStore
+        stats = StatsStore(config.stats)
+    state = game.state()
+    accumulator = 0.0
+    turbo, render_fps = config.turbo, config.render_fps
+    interpolate = config.interpolate and not turbo
+    redraw_board(game)
+    try:
+        while True:
+            if turbo:
+                accumulator = session.tick_seconds
+            else:
+                accumulator += min(clock.tick(render_fps) / 1000,
+                                   MAX_FRAME_SECONDS)
+            profiler.begin_frame()
+            handle_keys(game.snake, turns, session)
+            profiler.lap('input')
+            state, accumulator = run_ticks(game, state, turns, accumulator,
+                                           session, pilot)
+            if interpolate and not session.paused:
+                draw_interpolated_head(game,
+                                       accumulator / session.tick_seconds)
+            profiler.lap('draw')
+            draw_text(state.length, game, session.paused)
+            if profiler.enabled:
+                draw_profile(game, profiler)
+            profiler.lap('hud')
+            flush_blits()
+            if recorder is not None:
+                recorder.capture(screen, dirty_rects)
+            update_display()
+            profiler.lap('display')
+            profiler.end_frame()
+    finally:
+        report_latency(turns)
+        if recorder is not None:
+            recorder.close()
+            print(f'Запись: {recorder.written} кадров, '
+                  f'отброшено {recorder.dropped}')
+        if stats is not None:
+            if session.ticks:
+                stats.record(state.length, session.ticks,
+                             simulation.OUTCOME_NONE)
+            stats.flush()
+            print(f'Рекорд: {stats.best_score()}')
+            stats.close()
+            stats = None
+        if profiler.enabled:
+            profiler.dump(config.profile)
 
 
 if __name__ == '__main__':
-    main()
+    main(load_config())